@@ -2,7 +2,15 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
 import os
-from database import get_database_manager
+from database import (
+    get_database_manager, get_view_projection, clamp_page_size,
+    encode_page_cursor, decode_page_cursor, AnalyticsTimeoutError, STORAGE_BACKEND
+)
+from mongo_connection import get_pool_stats
+from write_buffer import get_write_buffer
+from response_cache import cached_response, get_response_cache
+from live_updates import get_live_updates, init_socketio
+from json_provider import OrjsonProvider
 from gemini_emotion_classifier import classify_emotion_with_gemini
 from dotenv import load_dotenv
 from chat_ticket_routes import chat_ticket_bp
@@ -14,6 +22,7 @@ from historical_sentiment_routes import historical_sentiment_bp
 load_dotenv()
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)  # ObjectId/datetime straight from the cursor, large arrays streamed
 
 # Enable CORS for all routes
 CORS(app, origins=["*"], methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
@@ -22,11 +31,11 @@ app.register_blueprint(historical_sentiment_bp)
 
 # Initialize database manager
 try:
-    # Check if required environment variables exist
-    if not os.getenv('MONGODB_URI'):
-        raise ValueError("MONGODB_URI environment variable is required")
+    # Check if required environment variables exist (the SQLite backend needs no server)
+    if STORAGE_BACKEND == 'mongo' and not os.getenv('MONGODB_URI'):
+        raise ValueError("MONGODB_URI environment variable is required (or set STORAGE_BACKEND=sqlite)")
     if not os.getenv('GEMINI_API_KEY'):
-        raise ValueError("GEMINI_API_KEY environment variable is required")
+        print("⚠️ Warning: GEMINI_API_KEY is not set; messages posted without a sentiment may fail to classify")
     
     db_manager = get_database_manager()
     print("✅ Database connected successfully!")
@@ -34,11 +43,45 @@ except Exception as e:
     print(f"❌ Failed to connect to database: {e}")
     db_manager = None
 
+def data_version(tenant):
+    """Version cached responses are tagged with; None (no database) disables caching"""
+    if not db_manager:
+        return None
+    try:
+        return db_manager.get_data_version(tenant)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not read data version: {e}")
+        return None
+
+def current_hour():
+    """Trend buckets and the 24h comparison window move on the hour even when no data changes"""
+    return datetime.now().strftime('%Y-%m-%d %H')
+
+@app.errorhandler(AnalyticsTimeoutError)
+def analytics_timeout(error):
+    """Analytics queries that exceed their maxTimeMS budget fail fast instead of holding the worker"""
+    print(f"⏱️ {error}")
+    return jsonify({"error": str(error), "query": error.query, "budget_ms": error.budget_ms}), 503
+
+def fetch_page(fetch, limit, cursor):
+    """
+    Run fetch(limit, after) for one keyset page; fetches one extra row to know
+    whether another page exists. Returns (messages, next_cursor or None).
+    """
+    if cursor:
+        decode_page_cursor(cursor)  # raises ValueError for malformed tokens
+    messages = fetch(limit + 1, cursor)
+    if len(messages) > limit:
+        messages = messages[:limit]
+        return messages, encode_page_cursor(messages[-1])
+    return messages, None
+
 @app.route('/')
 def home():
     return "Customer Sentiment Watchdog is running!"
 
 @app.route('/api/email-config', methods=['GET', 'POST'])
+@cached_response('email-config', data_version)
 def email_config():
     """Email configuration endpoint - supports both global and user-specific configs"""
     if not db_manager:
@@ -86,18 +129,7 @@ def email_config():
             if is_new_config:
                 print(f"🔄 New email configuration detected for user {user_id}, resetting all data...")
                 try:
-                    if user_id:
-                        # Reset data for specific user
-                        messages_result = db_manager.messages.delete_many({"user_id": user_id})
-                        db_manager.analytics.delete_many({"user_id": user_id})
-                        db_manager.history.delete_many({"user_id": user_id})
-                        print(f"✅ Reset {messages_result.deleted_count} messages for user {user_id}")
-                    else:
-                        # Reset all data
-                        messages_result = db_manager.messages.delete_many({})
-                        db_manager.analytics.delete_many({})
-                        db_manager.history.delete_many({})
-                        print(f"✅ Reset {messages_result.deleted_count} total messages")
+                    db_manager.reset_tenant_data(user_id)
                 except Exception as reset_error:
                     print(f"⚠️ Warning: Failed to reset data during config change: {reset_error}")
             
@@ -303,32 +335,16 @@ def reset_emotion_data():
         data = request.get_json() or {}
         user_id = data.get('user_id')  # Optional: reset data for specific user only
         
-        print(f"🔄 Starting data reset for {'user ' + user_id if user_id else 'all users'}")
-        
+        # Constant time: hides existing data now, the reaper deletes it in the background
+        epoch = db_manager.reset_tenant_data(user_id)
         if user_id:
-            # Reset data for specific user
-            messages_result = db_manager.messages.delete_many({"user_id": user_id})
-            analytics_result = db_manager.analytics.delete_many({"user_id": user_id})
-            history_result = db_manager.history.delete_many({"user_id": user_id})
-            
-            deleted_count = messages_result.deleted_count
             message = f"Emotion data reset for user {user_id}"
-            
-            print(f"✅ Reset complete for user {user_id}: {deleted_count} messages, {analytics_result.deleted_count} analytics, {history_result.deleted_count} history entries")
         else:
-            # Reset all emotion data
-            messages_result = db_manager.messages.delete_many({})
-            analytics_result = db_manager.analytics.delete_many({})
-            history_result = db_manager.history.delete_many({})
-            
-            deleted_count = messages_result.deleted_count
             message = f"All emotion data reset - starting fresh from zero"
-            
-            print(f"✅ Complete reset: {deleted_count} messages, {analytics_result.deleted_count} analytics, {history_result.deleted_count} history entries")
         
         return jsonify({
             "message": message,
-            "deleted_messages": deleted_count,
+            "epoch": epoch,
             "status": "success",
             "reset_timestamp": datetime.now().isoformat()
         }), 200
@@ -354,18 +370,7 @@ def start_live_monitoring():
         if reset_data:
             print(f"🔄 Resetting data before starting live monitoring...")
             try:
-                if user_id:
-                    # Reset data for specific user
-                    messages_result = db_manager.messages.delete_many({"user_id": user_id})
-                    db_manager.analytics.delete_many({"user_id": user_id})
-                    db_manager.history.delete_many({"user_id": user_id})
-                    print(f"✅ Reset {messages_result.deleted_count} messages for user {user_id}")
-                else:
-                    # Reset all data
-                    messages_result = db_manager.messages.delete_many({})
-                    db_manager.analytics.delete_many({})
-                    db_manager.history.delete_many({})
-                    print(f"✅ Reset {messages_result.deleted_count} total messages - starting from zero")
+                db_manager.reset_tenant_data(user_id)
             except Exception as reset_error:
                 print(f"⚠️ Warning: Failed to reset data before live monitoring: {reset_error}")
         
@@ -447,7 +452,7 @@ def receive_message():
         return jsonify({
             "message": "Message received",
             "message_id": message_id,
-            "sentiment": data.get('sentiment', data.get('emotion', 'unknown')),
+            "sentiment": data.get('sentiment') or 'unknown',
             "total_messages": total_messages
         }), 201
     except Exception as e:
@@ -460,28 +465,72 @@ def get_all_messages():
     
     try:
         # Get query parameters for pagination and filtering
-        limit = request.args.get('limit', type=int)
+        limit = clamp_page_size(request.args.get('limit', type=int))
         skip = request.args.get('skip', type=int)
+        cursor = request.args.get('cursor')
         source = request.args.get('source')
         sender = request.args.get('sender')
         sentiment = request.args.get('sentiment')
         
-        if source:
-            messages = db_manager.get_messages_by_source(source, limit)
-        elif sender:
-            messages = db_manager.get_messages_by_sender(sender, limit)
-        elif sentiment:
-            messages = db_manager.get_messages_by_sentiment(sentiment, limit)
-        else:
-            messages = db_manager.get_all_messages(limit=limit, skip=skip)
+        try:
+            projection = get_view_projection(request.args.get('view'))
+            
+            if source:
+                fetch = lambda n, after: db_manager.get_messages_by_source(source, n, projection=projection, after=after)
+            elif sender:
+                fetch = lambda n, after: db_manager.get_messages_by_sender(sender, n, projection=projection, after=after)
+            elif sentiment:
+                fetch = lambda n, after: db_manager.get_messages_by_sentiment(sentiment, n, projection=projection, after=after)
+            elif skip and not cursor:
+                # Legacy offset paging; prefer `cursor`, whose cost does not grow with depth
+                fetch = lambda n, after: db_manager.get_all_messages(limit=n, skip=skip, projection=projection)
+            else:
+                fetch = lambda n, after: db_manager.get_all_messages(limit=n, projection=projection, after=after)
+            
+            messages, next_cursor = fetch_page(fetch, limit, cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         return jsonify({
             "messages": messages,
-            "total_count": db_manager.get_message_count()
+            "total_count": db_manager.get_message_count(),
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
         })
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve messages: {str(e)}"}), 500
 
+@app.route('/messages/<message_id>/body', methods=['GET'])
+def get_message_body(message_id):
+    """Full message text; list responses carry only a snippet for large bodies"""
+    if not db_manager:
+        return jsonify({"error": "Database connection not available"}), 500
+    
+    try:
+        text = db_manager.get_message_body(message_id)
+        if text is None:
+            return jsonify({"error": "Message not found"}), 404
+        return jsonify({"message_id": message_id, "text": text, "length": len(text)})
+    except Exception as e:
+        return jsonify({"error": f"Failed to retrieve message body: {str(e)}"}), 500
+
+@app.route('/messages/<message_id>/sentiment', methods=['PUT'])
+def reclassify_message(message_id):
+    """Correct a message's sentiment label (dashboard counts follow the change)"""
+    if not db_manager:
+        return jsonify({"error": "Database connection not available"}), 500
+    
+    try:
+        data = request.get_json() or {}
+        if not data.get('sentiment'):
+            return jsonify({"error": "sentiment is required"}), 400
+        if not db_manager.reclassify_message(message_id, data['sentiment'], data.get('confidence_score')):
+            return jsonify({"error": "Message not found"}), 404
+        return jsonify({"message_id": message_id, "sentiment": data['sentiment'].lower()})
+    except Exception as e:
+        return jsonify({"error": f"Failed to reclassify message: {str(e)}"}), 500
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint to verify database connectivity"""
@@ -497,7 +546,12 @@ def health_check():
         return jsonify({
             "status": "healthy",
             "database": "connected",
-            "message_count": count
+            "message_count": count,
+            "connection_pool": get_pool_stats(),
+            "analytics_pool": get_pool_stats('analytics'),
+            "write_buffer": get_write_buffer().get_stats(),
+            "response_cache": get_response_cache().get_stats(),
+            "live_updates": get_live_updates().get_stats()
         }), 200
     except Exception as e:
         return jsonify({
@@ -507,31 +561,27 @@ def health_check():
         }), 503
 
 @app.route('/stats', methods=['GET'])
+@cached_response('stats', data_version)
 def get_stats():
     """Get basic statistics about the messages"""
     if not db_manager:
         return jsonify({"error": "Database connection not available"}), 500
     
     try:
-        total_messages = db_manager.get_message_count()
-        
-        # Get counts by source
-        email_count = len(db_manager.get_messages_by_source('email'))
-        chat_count = len(db_manager.get_messages_by_source('chat'))
-        ticket_count = len(db_manager.get_messages_by_source('ticket'))
-        
-        # Get sentiment distribution
-        sentiment_stats = db_manager.get_sentiment_stats()
+        # Counts by source and sentiment in one aggregation
+        summary = db_manager.get_dashboard_summary(recent_limit=0, negative_limit=0)
         
         return jsonify({
-            "total_messages": total_messages,
+            "total_messages": summary["total_messages"],
             "by_source": {
-                "email": email_count,
-                "chat": chat_count,
-                "ticket": ticket_count
+                "email": summary["by_source"].get('email', 0),
+                "chat": summary["by_source"].get('chat', 0),
+                "ticket": summary["by_source"].get('ticket', 0)
             },
-            "by_sentiment": sentiment_stats
+            "by_sentiment": summary["by_sentiment"]
         })
+    except AnalyticsTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": f"Failed to get stats: {str(e)}"}), 500
 
@@ -542,31 +592,52 @@ def get_messages_by_sentiment(sentiment_type):
         return jsonify({"error": "Database connection not available"}), 500
     
     try:
-        limit = request.args.get('limit', type=int)
-        messages = db_manager.get_messages_by_sentiment(sentiment_type, limit)
+        limit = clamp_page_size(request.args.get('limit', type=int))
+        
+        try:
+            projection = get_view_projection(request.args.get('view'))
+            messages, next_cursor = fetch_page(
+                lambda n, after: db_manager.get_messages_by_sentiment(sentiment_type, n, projection=projection, after=after),
+                limit, request.args.get('cursor')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         return jsonify({
             "sentiment": sentiment_type,
             "messages": messages,
-            "count": len(messages)
+            "count": len(messages),
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
         })
     except Exception as e:
         return jsonify({"error": f"Failed to get messages by sentiment: {str(e)}"}), 500
 
 @app.route('/alerts', methods=['GET'])
+@cached_response('alerts', data_version, etag=True)
 def get_negative_sentiment_alerts():
     """Get messages with negative sentiment for monitoring"""
     if not db_manager:
         return jsonify({"error": "Database connection not available"}), 500
     
     try:
-        limit = request.args.get('limit', 10, type=int)
-        negative_messages = db_manager.get_negative_sentiment_messages(limit)
+        limit = clamp_page_size(request.args.get('limit', type=int), default=10)
+        
+        try:
+            projection = get_view_projection(request.args.get('view'))
+            negative_messages, next_cursor = fetch_page(
+                lambda n, after: db_manager.get_negative_sentiment_messages(n, projection=projection, after=after),
+                limit, request.args.get('cursor')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         return jsonify({
             "alert_type": "negative_sentiment",
             "count": len(negative_messages),
-            "messages": negative_messages
+            "messages": negative_messages,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
         })
     except Exception as e:
         return jsonify({"error": f"Failed to get negative sentiment alerts: {str(e)}"}), 500
@@ -590,21 +661,24 @@ def analyze_text_sentiment():
         return jsonify({"error": f"Failed to analyze sentiment: {str(e)}"}), 500
 
 @app.route('/dashboard', methods=['GET'])
+@cached_response('dashboard', data_version)
 def dashboard():
     """Dashboard endpoint with comprehensive sentiment overview"""
     if not db_manager:
         return jsonify({"error": "Database connection not available"}), 500
     
     try:
-        # Get overall stats
-        total_messages = db_manager.get_message_count()
-        sentiment_stats = db_manager.get_sentiment_stats()
-        
-        # Get recent messages with sentiment
-        recent_messages = db_manager.get_all_messages(limit=10)
+        try:
+            projection = get_view_projection(request.args.get('view'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Get negative sentiment alerts
-        negative_alerts = db_manager.get_negative_sentiment_messages(limit=5)
+        # Overall stats, recent messages and negative sentiment alerts in one round trip
+        summary = db_manager.get_dashboard_summary(recent_limit=10, negative_limit=5, projection=projection)
+        total_messages = summary["total_messages"]
+        sentiment_stats = summary["by_sentiment"]
+        recent_messages = summary["recent_messages"]
+        negative_alerts = summary["negative_alerts"]
         
         # Calculate sentiment distribution percentages
         sentiment_percentages = {}
@@ -626,10 +700,13 @@ def dashboard():
                 }
             }
         })
+    except AnalyticsTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": f"Failed to get dashboard data: {str(e)}"}), 500
 
 @app.route('/api/emotion-overview', methods=['GET'])
+@cached_response('emotion-overview', data_version, vary=current_hour, etag=True)
 def get_emotion_overview():
     """Get emotion overview data for dashboard cards with change percentages"""
     if not db_manager:
@@ -698,10 +775,13 @@ def get_emotion_overview():
             dashboard_emotions[mapped_emotion]['percentage_text'] = f"{current_count}/{total_messages} ({actual_percent}%)"
         
         return jsonify(dashboard_emotions)
+    except AnalyticsTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": f"Failed to get emotion overview: {str(e)}"}), 500
 
 @app.route('/api/emotion-trends', methods=['GET'])
+@cached_response('emotion-trends', data_version, vary=current_hour, etag=True)
 def get_emotion_trends():
     """Get time-series data for emotion trends chart, optionally filtered by user"""
     if not db_manager:
@@ -730,6 +810,8 @@ def get_emotion_trends():
             response_data["user_id"] = user_id
             
         return jsonify(response_data)
+    except AnalyticsTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": f"Failed to get emotion trends: {str(e)}"}), 500
 
@@ -751,6 +833,8 @@ def get_realtime_stats():
             "total": total_stats,
             "timestamp": datetime.now().isoformat()
         })
+    except AnalyticsTimeoutError:
+        raise
     except Exception as e:
         return jsonify({"error": f"Failed to get realtime stats: {str(e)}"}), 500
 
@@ -767,7 +851,9 @@ if __name__ == '__main__':
         port = int(os.getenv('FLASK_PORT', '5000'))
         
         print(f"🚀 Starting server on {host}:{port} (debug={debug})")
-        app.run(debug=debug, host=host, port=port)
+        # Development only: serve live updates from this process too (deployments run live_server.py)
+        socketio = init_socketio(app)
+        socketio.run(app, debug=debug, host=host, port=port, allow_unsafe_werkzeug=True)
     finally:
         if db_manager:
             db_manager.close_connection()
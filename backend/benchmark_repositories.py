@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Run the same workload against each storage backend and compare latencies.
+
+SQLite always runs (in a temporary file). MongoDB runs when MONGODB_URI is set,
+in a separate database (--mongo-database, dropped afterwards) so live data is
+never touched.
+
+Usage:
+    python benchmark_repositories.py                      # 5000 messages, 20 rounds
+    python benchmark_repositories.py --messages 50000 --rounds 50
+    python benchmark_repositories.py --backends sqlite
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SENTIMENTS = ['angry', 'frustrated', 'upset', 'confused', 'happy', 'satisfied', 'neutral', 'grateful']
+SOURCES = ['email', 'chat', 'ticket']
+
+
+def make_messages(count, seed=42):
+    """Synthetic messages spread over the last week"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    return [{
+        "id": f"bench_{i}",
+        "text": f"Benchmark message {i} " + "lorem ipsum " * rng.randint(1, 40),
+        "sender": f"customer{rng.randint(1, 200)}@example.com",
+        "source": rng.choice(SOURCES),
+        "sentiment": rng.choice(SENTIMENTS),
+        "user_id": f"user_{rng.randint(1, 5)}",
+        "timestamp": (now - timedelta(minutes=rng.randint(0, 7 * 24 * 60))).isoformat(),
+    } for i in range(count)]
+
+
+def workload(repo):
+    """(name, callable) pairs covering the read paths the API serves"""
+    return [
+        ("get_all_messages(50)", lambda: repo.get_all_messages(limit=50)),
+        ("get_messages_by_source", lambda: repo.get_messages_by_source('email', limit=50)),
+        ("get_messages_by_sentiment", lambda: repo.get_messages_by_sentiment('angry', limit=50)),
+        ("get_negative_sentiment_messages", lambda: repo.get_negative_sentiment_messages(limit=50)),
+        ("get_message_count", lambda: repo.get_message_count()),
+        ("get_sentiment_stats", lambda: repo.get_sentiment_stats()),
+        ("get_sentiment_stats_comparison", lambda: repo.get_sentiment_stats_comparison()),
+        ("get_hourly_emotion_trends(24)", lambda: repo.get_hourly_emotion_trends(24)),
+        ("get_hourly_emotion_trends(user)", lambda: repo.get_hourly_emotion_trends(24, 'user_1')),
+        ("get_current_hour_stats", lambda: repo.get_current_hour_stats()),
+        ("get_dashboard_summary", lambda: repo.get_dashboard_summary()),
+        ("get_sentiment_history(50)", lambda: repo.get_sentiment_history(limit=50)),
+        ("get_active_alerts(50)", lambda: repo.get_active_alerts(limit=50)),
+    ]
+
+
+def timed(func, rounds):
+    """Median and p95 wall time in ms"""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def run_backend(repo, messages, rounds, single_inserts):
+    results = {}
+    start = time.perf_counter()
+    for offset in range(0, len(messages), 1000):
+        repo.insert_messages_bulk([dict(message) for message in messages[offset:offset + 1000]])
+    results["insert_messages_bulk (total)"] = ((time.perf_counter() - start) * 1000, None)
+
+    singles = [dict(message, id=f"{message['id']}_single") for message in messages[:single_inserts]]
+    results["insert_message"] = timed(lambda: repo.insert_message(singles.pop() if singles else dict(messages[0])), single_inserts)
+
+    # Warm caches once before measuring reads
+    for _, func in workload(repo):
+        func()
+    for name, func in workload(repo):
+        results[name] = timed(func, rounds)
+    return results
+
+
+def open_backends(names, mongo_database):
+    """Yield (name, repository, cleanup) for each requested backend that is available"""
+    if 'sqlite' in names:
+        from sqlite_repository import SQLiteRepository
+        directory = tempfile.mkdtemp(prefix="sentiment_bench_")
+        yield 'sqlite', SQLiteRepository(os.path.join(directory, "bench.db")), lambda repo: repo.close_connection()
+
+    if 'mongo' in names:
+        if not os.getenv('MONGODB_URI'):
+            print("⚠️ MONGODB_URI not set, skipping MongoDB")
+            return
+        os.environ['DATABASE_NAME'] = mongo_database
+        from database import DatabaseManager
+
+        def drop(repo):
+            repo.client.drop_database(mongo_database)
+            repo.close_connection()
+        yield 'mongo', DatabaseManager(), drop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare storage backends on the same workload")
+    parser.add_argument('--messages', type=int, default=5000, help="Messages to load")
+    parser.add_argument('--rounds', type=int, default=20, help="Timed runs per read query")
+    parser.add_argument('--single-inserts', type=int, default=200, help="Timed single-message inserts")
+    parser.add_argument('--backends', default='sqlite,mongo', help="Comma-separated: sqlite,mongo")
+    parser.add_argument('--mongo-database', default='sentiment_benchmark', help="Scratch database, dropped afterwards")
+    args = parser.parse_args()
+
+    # Alerts are part of the insert path for both backends
+    os.environ.setdefault('POST_INSERT_PROCESSING', 'inline')
+    messages = make_messages(args.messages)
+    names = [name.strip() for name in args.backends.split(',')]
+
+    print(f"🏁 BENCHMARK: {args.messages} messages, {args.rounds} rounds per query")
+    print("=" * 50)
+    all_results = {}
+    for name, repo, cleanup in open_backends(names, args.mongo_database):
+        print(f"\n⏱️ Running {name}...")
+        try:
+            all_results[name] = run_backend(repo, messages, args.rounds, args.single_inserts)
+        finally:
+            cleanup(repo)
+
+    if not all_results:
+        print("❌ No backend available")
+        return
+
+    backends = list(all_results)
+    print(f"\n{'query':<36}" + "".join(f"{name + ' p50/p95 ms':>26}" for name in backends))
+    for query in all_results[backends[0]]:
+        row = f"{query:<36}"
+        for name in backends:
+            median, p95 = all_results[name][query]
+            row += f"{median:>16.2f}" + (f" / {p95:>7.2f}" if p95 is not None else " " * 10)
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
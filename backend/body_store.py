@@ -0,0 +1,51 @@
+# body_store.py
+# Large message bodies live in `message_bodies`, keyed by the message _id, so the
+# hot `messages` documents stay small. A detached message keeps the first
+# BODY_SNIPPET_LENGTH characters in `text`, plus `body_ref` and `text_length`;
+# the full text is loaded on demand.
+import os
+import zlib
+from bson import Binary, ObjectId
+
+BODIES_COLLECTION = 'message_bodies'
+BODY_STORE_THRESHOLD = int(os.getenv('BODY_STORE_THRESHOLD', '2000'))
+BODY_SNIPPET_LENGTH = int(os.getenv('BODY_SNIPPET_LENGTH', '500'))
+BODY_COMPRESSION = os.getenv('BODY_COMPRESSION', 'zlib').lower()  # 'zlib' or 'none'
+
+# Message fields copied onto the body so retention and resets can treat both alike
+SHARED_FIELDS = ('user_id', 'epoch', 'occurred_at')
+
+
+def encode_body(text):
+    """Body document fields holding text, compressed if configured"""
+    if BODY_COMPRESSION == 'zlib':
+        return {"text_z": Binary(zlib.compress(text.encode('utf-8'), 6)), "compression": "zlib"}
+    return {"text": text, "compression": None}
+
+
+def decode_body(body_doc):
+    if body_doc.get('compression') == 'zlib':
+        return zlib.decompress(body_doc['text_z']).decode('utf-8')
+    return body_doc.get('text', '')
+
+
+def detach_body(message_data, threshold=None):
+    """
+    Move a text longer than threshold into a body document; returns that document
+    (to be written before the message) or None when the text stays inline.
+    """
+    text = message_data.get('text')
+    threshold = BODY_STORE_THRESHOLD if threshold is None else threshold
+    if not isinstance(text, str) or threshold <= 0 or len(text) <= threshold or 'body_ref' in message_data:
+        return None
+
+    message_data.setdefault('_id', ObjectId())
+    body = {"_id": message_data['_id'], "length": len(text), **encode_body(text)}
+    for field in SHARED_FIELDS:
+        if field in message_data:
+            body[field] = message_data[field]
+
+    message_data['text'] = text[:BODY_SNIPPET_LENGTH]
+    message_data['text_length'] = len(text)
+    message_data['body_ref'] = body['_id']
+    return body
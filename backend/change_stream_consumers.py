@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Change-stream consumers for post-insert processing on the messages collection.
+
+With POST_INSERT_PROCESSING=change_stream, insert_message only writes the message;
+alerts, rollup counts and Telegram notifications are produced here.
+Each consumer here tails the `messages` change stream in its own thread and stores
+its resume token in `change_stream_checkpoints` after every handled event, so a
+restart continues from the last processed insert. Change streams require a replica
+set; for local testing start a single-node one:
+
+    mongod --replSet rs0 --dbpath ./data
+    mongosh --eval "rs.initiate()"
+
+Run the consumers as a separate process (one per deployment, not per web worker):
+
+    python change_stream_consumers.py
+"""
+
+import threading
+import time
+from datetime import datetime
+from pymongo.errors import OperationFailure, PyMongoError
+from database import get_database_manager, canonical_sentiment
+from telegram_alert import send_telegram_alert
+
+CHECKPOINT_COLLECTION = 'change_stream_checkpoints'
+
+# Resume token no longer in the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+# Archive imports (import_email_archive.py) are historical: count them, but never alert on them
+SKIP_IMPORTED = {"fullDocument.imported": {"$ne": True}}
+
+
+class ChangeStreamConsumer:
+    """Base class: subclasses set `name` and implement handle(message); `match` narrows the inserts they see"""
+    name = None
+    match = {}
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def handle(self, message):
+        raise NotImplementedError
+
+
+class AlertConsumer(ChangeStreamConsumer):
+    name = 'alerts'
+    match = SKIP_IMPORTED
+
+    def handle(self, message):
+        self.db_manager._check_and_create_alert(message, str(message['_id']))
+
+
+class RollupConsumer(ChangeStreamConsumer):
+    name = 'rollups'
+
+    def handle(self, message):
+        self.db_manager.add_to_rollups([message])
+        # Cached dashboard responses computed before the counts moved are now stale
+        self.db_manager.bump_data_version([message.get('user_id')])
+
+
+class TelegramConsumer(ChangeStreamConsumer):
+    name = 'telegram'
+    match = SKIP_IMPORTED
+
+    def handle(self, message):
+        emotion = canonical_sentiment(message) or ''
+        if message.get('source') != 'email' or emotion not in ['angry', 'frustrated']:
+            return
+        first_line = (message.get('text') or '').split('\n', 1)[0]
+        subject = first_line[len('Subject: '):] if first_line.startswith('Subject: ') else first_line
+        alert_message = f"🚨 Alert: {emotion.title()} email detected!\nSubject: {subject}\nFrom: {message.get('sender', '')}"
+        send_telegram_alert(alert_message)
+
+
+# Consumers started by run_consumers(); append new consumer classes here
+CONSUMERS = [AlertConsumer, RollupConsumer, TelegramConsumer]
+
+
+class ChangeStreamRunner(threading.Thread):
+    """Tails messages inserts for a single consumer with its own resume token"""
+
+    def __init__(self, db_manager, consumer):
+        super().__init__(name=f"change-stream-{consumer.name}")
+        self.daemon = True
+        self.db_manager = db_manager
+        self.consumer = consumer
+        self.checkpoints = db_manager.db[CHECKPOINT_COLLECTION]
+        self._stop_event = threading.Event()
+        self.processed = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _load_token(self):
+        checkpoint = self.checkpoints.find_one({"_id": self.consumer.name})
+        return checkpoint.get('resume_token') if checkpoint else None
+
+    def _save_token(self, token):
+        self.checkpoints.update_one(
+            {"_id": self.consumer.name},
+            {"$set": {"resume_token": token, "updated_at": datetime.now().isoformat()}},
+            upsert=True
+        )
+
+    def _reset_token(self):
+        self.checkpoints.delete_one({"_id": self.consumer.name})
+
+    def run(self):
+        pipeline = [{"$match": {"operationType": "insert", **self.consumer.match}}]
+        print(f"🔁 Starting change stream consumer '{self.consumer.name}'")
+
+        while not self._stop_event.is_set():
+            try:
+                resume_token = self._load_token()
+                with self.db_manager.messages.watch(pipeline, resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    while stream.alive and not self._stop_event.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        try:
+                            self.consumer.handle(change['fullDocument'])
+                        except Exception as e:
+                            # A failing handler must not stall the stream for this consumer
+                            print(f"❌ Consumer '{self.consumer.name}' failed on {change['documentKey']['_id']}: {e}")
+                        self._save_token(change['_id'])
+                        self.processed += 1
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    print(f"⚠️ Resume token for '{self.consumer.name}' fell off the oplog, restarting from now")
+                    self._reset_token()
+                else:
+                    print(f"❌ Change stream error for '{self.consumer.name}': {e}")
+                    time.sleep(5)
+            except PyMongoError as e:
+                print(f"❌ Change stream connection error for '{self.consumer.name}': {e}")
+                time.sleep(5)
+
+
+def run_consumers(consumer_classes=None, block=True):
+    """Start one runner thread per consumer; returns the runners when block=False"""
+    db_manager = get_database_manager()
+    runners = [ChangeStreamRunner(db_manager, cls(db_manager)) for cls in (consumer_classes or CONSUMERS)]
+    for runner in runners:
+        runner.start()
+
+    if not block:
+        return runners
+
+    try:
+        while any(runner.is_alive() for runner in runners):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("🛑 Stopping change stream consumers...")
+        for runner in runners:
+            runner.stop()
+        for runner in runners:
+            runner.join(timeout=5)
+    return runners
+
+
+if __name__ == "__main__":
+    run_consumers()
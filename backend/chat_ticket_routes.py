@@ -1,15 +1,21 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from pymongo import MongoClient
 import os
+from mongo_connection import get_database
+from classification_worker import get_classification_worker, extract_chat_ticket_text
 
-# MongoDB connection
-MONGODB_URI = os.getenv("MONGODB_URI")
-client = MongoClient(MONGODB_URI)
-db = client["sentiment_customer"]
+# MongoDB connection (shared client pool)
+CHAT_TICKET_DATABASE_NAME = os.getenv("CHAT_TICKET_DATABASE_NAME", "sentiment_customer")
 
-chat_collection = db["chat_messages"]
-ticket_collection = db["tickets"]
+def get_chat_ticket_db():
+    """Database holding the chat_messages and tickets collections"""
+    return get_database(CHAT_TICKET_DATABASE_NAME)
+
+def get_chat_collection():
+    return get_chat_ticket_db()["chat_messages"]
+
+def get_ticket_collection():
+    return get_chat_ticket_db()["tickets"]
 
 # Create Blueprint
 chat_ticket_bp = Blueprint("chat_ticket", __name__)
@@ -25,7 +31,9 @@ def save_chat():
         "timestamp": datetime.utcnow(),
         "sentiment": None
     }
-    chat_collection.insert_one(chat_doc)
+    chat_collection = get_chat_collection()
+    result = chat_collection.insert_one(chat_doc)
+    get_classification_worker().enqueue(chat_collection, result.inserted_id, extract_chat_ticket_text(chat_doc))
     return jsonify({"status": "success", "data": chat_doc}), 201
 
 @chat_ticket_bp.route("/api/ticket", methods=["POST"])
@@ -42,6 +50,8 @@ def save_ticket():
         "timestamp": datetime.utcnow(),
         "sentiment": None
     }
-    ticket_collection.insert_one(ticket_doc)
+    ticket_collection = get_ticket_collection()
+    result = ticket_collection.insert_one(ticket_doc)
+    get_classification_worker().enqueue(ticket_collection, result.inserted_id, extract_chat_ticket_text(ticket_doc))
     return jsonify({"status": "success", "data": ticket_doc}), 201
 
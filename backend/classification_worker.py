@@ -0,0 +1,129 @@
+# classification_worker.py
+# Background classify-on-write pipeline for chat and ticket documents
+import os
+import queue
+import threading
+import time
+from pymongo import UpdateOne
+from chat_ticket_sentiment_analyzer import analyze_chat_ticket_sentiment
+
+
+def extract_chat_ticket_text(doc):
+    """Build the text to classify from a chat or ticket document"""
+    if 'message' in doc:
+        return (doc.get('message') or '').strip()
+    subject = (doc.get('subject') or '').strip()
+    description = (doc.get('description') or '').strip()
+    return f"{subject} {description}".strip()
+
+
+class ClassificationWorkerPool:
+    """
+    Classifies chat/ticket documents off the request thread.
+    Writes enqueue (collection, _id, text); worker threads drain the queue
+    in batches, classify each text and apply the labels with one bulk_write
+    per collection.
+    """
+
+    def __init__(self, num_workers=None, batch_size=None, batch_wait_ms=None, max_queue_size=None):
+        self.num_workers = num_workers or int(os.getenv('CLASSIFY_WORKERS', '2'))
+        self.batch_size = batch_size or int(os.getenv('CLASSIFY_BATCH_SIZE', '20'))
+        self.batch_wait = (batch_wait_ms or int(os.getenv('CLASSIFY_BATCH_WAIT_MS', '500'))) / 1000.0
+        self.queue = queue.Queue(maxsize=max_queue_size or int(os.getenv('CLASSIFY_QUEUE_SIZE', '10000')))
+        self.threads = []
+        self.pid = None
+        self._lock = threading.Lock()
+        self.stats = {"enqueued": 0, "classified": 0, "errors": 0, "dropped": 0}
+
+    def _ensure_started(self):
+        """Start worker threads lazily so each forked Gunicorn worker gets its own"""
+        if self.pid == os.getpid() and self.threads:
+            return
+        with self._lock:
+            if self.pid == os.getpid() and self.threads:
+                return
+            self.pid = os.getpid()
+            self.threads = []
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._run, name=f"classify-worker-{i}")
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+            print(f"🧵 Started {self.num_workers} classification workers (batch size {self.batch_size})")
+
+    def enqueue(self, collection, doc_id, text):
+        """Queue a document for classification; returns False if it was not queued"""
+        if not text:
+            return False
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((collection, doc_id, text))
+            self.stats["enqueued"] += 1
+            return True
+        except queue.Full:
+            # The document keeps sentiment None and is picked up by /api/historical/analyze-missing
+            self.stats["dropped"] += 1
+            print(f"⚠️ Classification queue full, leaving {doc_id} pending")
+            return False
+
+    def _next_batch(self):
+        """Block for the first item, then collect up to batch_size within batch_wait"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._process_batch(batch)
+            except Exception as e:
+                self.stats["errors"] += len(batch)
+                print(f"❌ Error processing classification batch: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _process_batch(self, batch):
+        updates = {}
+        collections = {}
+        for collection, doc_id, text in batch:
+            try:
+                sentiment = analyze_chat_ticket_sentiment(text)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ Error classifying document {doc_id}: {e}")
+                continue
+            collections[collection.full_name] = collection
+            updates.setdefault(collection.full_name, []).append(
+                UpdateOne({"_id": doc_id}, {"$set": {"sentiment": sentiment}})
+            )
+
+        for name, operations in updates.items():
+            collections[name].bulk_write(operations, ordered=False)
+            self.stats["classified"] += len(operations)
+
+        if updates:
+            print(f"✅ Classified {sum(len(ops) for ops in updates.values())} chat/ticket documents")
+
+    def get_stats(self):
+        return {**self.stats, "queued": self.queue.qsize(), "workers": len(self.threads)}
+
+
+# Global worker pool instance
+classification_worker = None
+
+def get_classification_worker():
+    """Get or create the classification worker pool"""
+    global classification_worker
+    if classification_worker is None:
+        classification_worker = ClassificationWorkerPool()
+    return classification_worker
@@ -0,0 +1,55 @@
+# clerk_auth.py
+# Verifies Clerk session tokens, the sign-in the frontend already uses.
+#
+# The React app identifies users by their Clerk user id, which it sends to the
+# REST API as `user_id`. Where a caller must prove that identity (live update
+# subscriptions), it sends its Clerk session token instead: an RS256 JWT whose
+# `sub` is that user id, checked against the instance's JWKS
+# (CLERK_JWKS_URL, https://<frontend-api>/.well-known/jwks.json). Signing keys
+# are cached by PyJWKClient. Without CLERK_JWKS_URL every token is refused.
+import os
+import threading
+import jwt
+
+CLERK_JWKS_URL = os.getenv('CLERK_JWKS_URL') or None
+CLERK_ISSUER = os.getenv('CLERK_ISSUER') or None  # checked against `iss` when set
+# Frontend origins allowed in the token's `azp` claim; empty accepts any
+CLERK_AUTHORIZED_PARTIES = {origin.strip() for origin in os.getenv('CLERK_AUTHORIZED_PARTIES', '').split(',')
+                            if origin.strip()}
+CLERK_LEEWAY_SECONDS = int(os.getenv('CLERK_LEEWAY_SECONDS', '10'))
+
+
+class AuthenticationError(Exception):
+    """Missing, malformed, expired or foreign session token"""
+
+
+def verify_session_token(token):
+    """Clerk user id of a valid session token; raises AuthenticationError otherwise"""
+    if not token or not isinstance(token, str):
+        raise AuthenticationError("missing session token")
+    jwks_client = get_jwks_client()
+    if jwks_client is None:
+        raise AuthenticationError("CLERK_JWKS_URL is not configured")
+    try:
+        signing_key = jwks_client.get_signing_key_from_jwt(token)
+        claims = jwt.decode(token, signing_key.key, algorithms=["RS256"], issuer=CLERK_ISSUER,
+                            leeway=CLERK_LEEWAY_SECONDS, options={"require": ["exp", "sub"]})
+    except jwt.PyJWTError as e:
+        raise AuthenticationError(f"invalid session token: {e}") from e
+    if CLERK_AUTHORIZED_PARTIES and claims.get('azp') not in CLERK_AUTHORIZED_PARTIES:
+        raise AuthenticationError(f"session token issued for {claims.get('azp')}")
+    return claims['sub']
+
+
+# Global JWKS client instance
+jwks_client = None
+_jwks_lock = threading.Lock()
+
+def get_jwks_client():
+    """Get or create the JWKS client, None when CLERK_JWKS_URL is not set"""
+    global jwks_client
+    if jwks_client is None and CLERK_JWKS_URL:
+        with _jwks_lock:
+            if jwks_client is None:
+                jwks_client = jwt.PyJWKClient(CLERK_JWKS_URL)
+    return jwks_client
@@ -0,0 +1,187 @@
+# data_epochs.py
+# Constant-time logical data resets.
+#
+# Every message and analytics document is stamped with `epoch`, the current
+# value of a generation counter kept in `tenant_epochs` and read on every write.
+# A reset $incs the counter and records the new value as the floor for the
+# tenant (user_id, or ALL_TENANTS for a global reset) instead of deleting
+# anything: documents below the floor are hidden from every query by
+# visible_filter() and removed later by a throttled background reaper. Once a
+# tenant is fully reaped its floor no longer adds a filter to queries.
+#
+# Stamps and floors come from the same counter in the database, never from a
+# worker's clock, so clock skew between hosts cannot hide (and reap) documents
+# written after a reset. A write that read the counter before a concurrent
+# reset is hidden along with the data it raced.
+import os
+import threading
+import time
+from datetime import datetime
+from pymongo import ReturnDocument
+
+EPOCHS_COLLECTION = 'tenant_epochs'
+ALL_TENANTS = '__all__'
+GENERATION_ID = '__generation__'  # counter document in tenant_epochs
+TENANT_FIELD = 'user_id'
+
+EPOCH_CACHE_SECONDS = float(os.getenv('EPOCH_CACHE_SECONDS', '1'))
+REAPER_BATCH_SIZE = int(os.getenv('REAPER_BATCH_SIZE', '500'))
+REAPER_PAUSE_MS = int(os.getenv('REAPER_PAUSE_MS', '200'))
+REAPER_LEASE_SECONDS = 60
+
+
+def now_ms():
+    """Wall-clock time for reaper leases only (skew just lets a lease expire early)"""
+    return int(time.time() * 1000)
+
+
+class DataEpochs:
+    def __init__(self, db, collections):
+        self.db = db
+        self.state = db[EPOCHS_COLLECTION]
+        self.collections = collections  # collections reset together, e.g. messages and analytics
+        self._pending = []
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+        self.reaper = None
+        self.reaper_pid = None
+
+    # -- visibility ------------------------------------------------------------
+
+    def _pending_floors(self):
+        """Unreaped reset floors, cached for EPOCH_CACHE_SECONDS"""
+        if time.monotonic() - self._loaded_at > EPOCH_CACHE_SECONDS:
+            self._pending = list(self.state.find({"reaped": False}, {"floor": 1}))
+            self._loaded_at = time.monotonic()
+        return self._pending
+
+    @staticmethod
+    def _stale_condition(tenant, floor):
+        if tenant == ALL_TENANTS:
+            return {"epoch": {"$lt": floor}}
+        return {TENANT_FIELD: tenant, "epoch": {"$lt": floor}}
+
+    def stale_conditions(self):
+        return [self._stale_condition(doc["_id"], doc["floor"]) for doc in self._pending_floors()]
+
+    def visible_filter(self, query=None):
+        """query restricted to documents written after their tenant's last reset"""
+        query = query or {}
+        conditions = self.stale_conditions()
+        if not conditions:
+            return query
+        if "$nor" in query:
+            return {"$and": [query, {"$nor": conditions}]}
+        return {**query, "$nor": conditions}
+
+    def visible_pipeline(self, pipeline):
+        """Aggregation pipeline with the visibility filter merged into its first $match"""
+        conditions = self.stale_conditions()
+        if not conditions:
+            return pipeline
+        if pipeline and "$match" in pipeline[0]:
+            return [{"$match": self.visible_filter(pipeline[0]["$match"])}] + pipeline[1:]
+        return [{"$match": {"$nor": conditions}}] + pipeline
+
+    def has_pending_reset(self):
+        return bool(self._pending_floors())
+
+    # -- generation ------------------------------------------------------------
+
+    def current(self):
+        """Epoch to stamp on documents written now; not cached, so a reset applies to the next write"""
+        doc = self.state.find_one({"_id": GENERATION_ID}, {"value": 1})
+        if doc is None:
+            return self._seed_generation()
+        return doc["value"]
+
+    def _seed_generation(self):
+        """
+        Start the counter above every existing stamp and floor: earlier versions
+        stamped wall-clock milliseconds, and a counter starting lower would hide
+        new writes behind old floors.
+        """
+        highest = 0
+        for collection in self.collections:
+            newest = collection.find_one({"epoch": {"$type": "number"}}, {"epoch": 1}, sort=[("epoch", -1)])
+            highest = max(highest, int(newest["epoch"]) if newest else 0)
+        latest_reset = self.state.find_one({"floor": {"$type": "number"}}, {"floor": 1}, sort=[("floor", -1)])
+        highest = max(highest, int(latest_reset["floor"]) if latest_reset else 0)
+        # $max makes concurrent seeding by several workers harmless
+        doc = self.state.find_one_and_update({"_id": GENERATION_ID}, {"$max": {"value": highest + 1}},
+                                             upsert=True, return_document=ReturnDocument.AFTER)
+        return doc["value"]
+
+    # -- reset -----------------------------------------------------------------
+
+    def reset(self, tenant=None):
+        """Hide all of a tenant's current documents (O(1)); the reaper deletes them later"""
+        tenant = tenant or ALL_TENANTS
+        self.current()  # seeds the counter on first use
+        floor = self.state.find_one_and_update({"_id": GENERATION_ID}, {"$inc": {"value": 1}},
+                                               return_document=ReturnDocument.AFTER)["value"]
+        # $max: of two concurrent resets the later generation wins, whichever lands last
+        self.state.update_one(
+            {"_id": tenant},
+            {"$max": {"floor": floor},
+             "$set": {"reaped": False, "reset_at": datetime.now().isoformat(), "lease_until": 0}},
+            upsert=True
+        )
+        self._loaded_at = 0  # this process sees the reset immediately
+        self.start_reaper()
+        return floor
+
+    # -- reaper ----------------------------------------------------------------
+
+    def start_reaper(self):
+        """Start the reaper thread lazily, once per process"""
+        if self.reaper_pid == os.getpid() and self.reaper and self.reaper.is_alive():
+            return
+        with self._lock:
+            if self.reaper_pid == os.getpid() and self.reaper and self.reaper.is_alive():
+                return
+            self.reaper_pid = os.getpid()
+            self.reaper = threading.Thread(target=self.reap_all, name="epoch-reaper")
+            self.reaper.daemon = True
+            self.reaper.start()
+
+    def _claim(self, now):
+        """Lease one unreaped tenant so concurrent workers do not reap the same one"""
+        return self.state.find_one_and_update(
+            {"reaped": False, "lease_until": {"$lt": now}},
+            {"$set": {"lease_until": now + REAPER_LEASE_SECONDS * 1000}}
+        )
+
+    def reap_all(self):
+        """Delete documents below every pending floor, in throttled batches"""
+        reaped = 0
+        while True:
+            claimed = self._claim(now_ms())
+            if not claimed:
+                break
+            try:
+                reaped += self.reap_tenant(claimed["_id"], claimed["floor"])
+            except Exception as e:
+                print(f"❌ Reaper failed for tenant {claimed['_id']}: {e}")
+                break
+        return reaped
+
+    def reap_tenant(self, tenant, floor):
+        condition = self._stale_condition(tenant, floor)
+        deleted = 0
+        for collection in self.collections:
+            while True:
+                ids = [doc["_id"] for doc in collection.find(condition, {"_id": 1}).limit(REAPER_BATCH_SIZE)]
+                if not ids:
+                    break
+                deleted += collection.delete_many({"_id": {"$in": ids}}).deleted_count
+                # Keep the lease while a large tenant is being reaped
+                self.state.update_one({"_id": tenant, "floor": floor},
+                                      {"$set": {"lease_until": now_ms() + REAPER_LEASE_SECONDS * 1000}})
+                time.sleep(REAPER_PAUSE_MS / 1000.0)
+
+        # A newer reset moves the floor; only mark reaped if ours is still current
+        self.state.update_one({"_id": tenant, "floor": floor}, {"$set": {"reaped": True, "reaped_at": datetime.now().isoformat()}})
+        self._loaded_at = 0
+        print(f"🧹 Reaped {deleted} documents from before the reset of {tenant}")
+        return deleted
@@ -0,0 +1,72 @@
+# data_versions.py
+# Per-tenant data versions for cache invalidation.
+#
+# Every write that changes what the dashboard shows (insert, reset,
+# reclassification, email configuration) increments the version of the tenant
+# (user_id) and of ALL_TENANTS in `data_versions`. A cached response is valid
+# while the versions it was computed under are unchanged: tenant-scoped
+# responses depend on (global, tenant), unscoped ones on the global version.
+#
+# Versions are shared by every worker through MongoDB and cached per tenant
+# for DATA_VERSION_CACHE_SECONDS, so other workers see a write within that time;
+# the writing worker sees it immediately.
+#
+# Versions are read in a causally consistent session and remembered with that
+# read's cluster and operation time. read_after() hands them to the analytics
+# queries of the same thread (DatabaseManager._analytics_session), which then
+# read from a secondary only once it has caught up with the version, so a
+# result is never cached under a version newer than its data.
+import os
+import threading
+import time
+from bson import Timestamp
+from pymongo import UpdateOne
+from data_epochs import ALL_TENANTS
+
+VERSIONS_COLLECTION = 'data_versions'
+DATA_VERSION_CACHE_SECONDS = float(os.getenv('DATA_VERSION_CACHE_SECONDS', '1'))
+
+
+class DataVersions:
+    def __init__(self, db):
+        self.client = db.client
+        self.state = db[VERSIONS_COLLECTION]
+        self._cache = {}  # tenant -> (version, loaded_at, (cluster_time, operation_time))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def bump(self, tenants=None):
+        """Increment the versions of the given tenants (None entries mean no tenant) and the global one"""
+        ids = {ALL_TENANTS} | {tenant for tenant in (tenants or []) if tenant}
+        self.state.bulk_write([UpdateOne({"_id": tenant}, {"$inc": {"version": 1}}, upsert=True) for tenant in ids],
+                              ordered=False)
+        with self._lock:
+            for tenant in ids:
+                self._cache.pop(tenant, None)
+
+    def _load(self, tenants):
+        now = time.monotonic()
+        with self._lock:
+            stale = [tenant for tenant in tenants
+                     if tenant not in self._cache or now - self._cache[tenant][1] > DATA_VERSION_CACHE_SECONDS]
+        if stale:
+            # Every bump this read sees happened at or before its operation time
+            with self.client.start_session(causal_consistency=True) as session:
+                found = {doc["_id"]: doc.get("version", 0)
+                         for doc in self.state.find({"_id": {"$in": stale}}, session=session)}
+                read_at = (session.cluster_time, session.operation_time)
+            with self._lock:
+                for tenant in stale:
+                    self._cache[tenant] = (found.get(tenant, 0), now, read_at)
+        with self._lock:
+            entries = [self._cache[tenant] for tenant in tenants]
+        self._local.read_at = max((entry[2] for entry in entries), key=lambda read_at: read_at[1] or Timestamp(0, 0))
+        return tuple(entry[0] for entry in entries)
+
+    def read_after(self):
+        """(cluster_time, operation_time) of the versions this thread read last; None before any read"""
+        return getattr(self._local, 'read_at', None)
+
+    def version(self, tenant=None):
+        """Version tuple a response for tenant (or for everyone) depends on"""
+        return self._load([ALL_TENANTS, tenant] if tenant else [ALL_TENANTS])
@@ -1,13 +1,367 @@
 import os
-from datetime import datetime, timedelta
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+import base64
+import json
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, ServerSelectionTimeoutError
 from dotenv import load_dotenv
+from mongo_connection import get_mongo_client, close_all_clients
+from indexes import INDEX_MIGRATION_VERSION, apply_index_specs
+from write_buffer import get_write_buffer, ALERTS_WRITE_BEHIND
+from data_epochs import DataEpochs
+from data_versions import DataVersions
+from live_updates import get_live_updates
+from body_store import BODIES_COLLECTION, detach_body, decode_body
+from emotion_taxonomy import (
+    CURRENT_HOUR_EMOTION_MAPPING, TREND_EMOTION_MAPPING, count_emotions, emotion_expression, empty_emotion_counts
+)
+from repository import SentimentRepository
+from rollups import (
+    ROLLUPS_COLLECTION, ROLLUPS_MIGRATION_VERSION, SENTIMENT_ROLLUPS, apply_rollups, hour_bucket, move_rollup
+)
 
 # Load environment variables
 load_dotenv()
 
-class DatabaseManager:
+# 'inline' runs alerts/history on the request thread; 'change_stream' leaves them
+# to the consumers in change_stream_consumers.py
+POST_INSERT_PROCESSING = os.getenv('POST_INSERT_PROCESSING', 'inline').lower()
+
+# 'mongo' (DatabaseManager) or 'sqlite' (embedded single-node SQLiteRepository)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongo').lower()
+
+def utc_now():
+    """Current time as a naive UTC datetime (the form pymongo returns BSON dates in)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def to_utc_datetime(value):
+    """
+    Normalize a timestamp (datetime or date string) to a naive UTC datetime.
+    Naive inputs are treated as server local time, matching how they were produced.
+    Returns None if the value cannot be parsed.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            from dateutil import parser as date_parser
+            value = date_parser.parse(value)
+        except Exception:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def local_to_utc(value):
+    """Convert a naive local datetime (e.g. a local day/hour boundary) to naive UTC"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+# IANA zone for trend bucket boundaries; empty means the server's current UTC offset
+TRENDS_TIMEZONE = os.getenv('TRENDS_TIMEZONE', '')
+
+def trends_timezone():
+    """(tzinfo, $dateTrunc timezone argument) for hourly trend buckets"""
+    if TRENDS_TIMEZONE:
+        return ZoneInfo(TRENDS_TIMEZONE), TRENDS_TIMEZONE
+    local_tz = datetime.now().astimezone().tzinfo
+    offset = datetime.now(local_tz).strftime('%z')
+    return local_tz, f"{offset[:3]}:{offset[3:]}"
+
+def hourly_buckets(hours, tz, now=None):
+    """
+    Naive UTC start and label of each local clock hour from `hours` ago through
+    the current hour. Labels are "HH:MM", or "MM-DD HH:MM" for windows of a day or more.
+    """
+    now = (now or datetime.now(timezone.utc)).astimezone(tz)
+    first = (now - timedelta(hours=hours)).replace(minute=0, second=0, microsecond=0)
+    first_utc = first.astimezone(timezone.utc)
+    label_format = "%m-%d %H:%M" if hours >= 24 else "%H:%M"
+    buckets = []
+    for index in range(hours + 1):
+        start = first_utc + timedelta(hours=index)
+        buckets.append((start.replace(tzinfo=None), start.astimezone(tz).strftime(label_format)))
+    return buckets
+
+# maxTimeMS budget per analytics query, overridable with ANALYTICS_BUDGET_<NAME>_MS
+ANALYTICS_BUDGETS_MS = {
+    "sentiment_stats": 3000,
+    "sentiment_stats_comparison": 3000,
+    "hourly_trends": 5000,  # whole window, one aggregation
+    "current_hour": 2000,
+    "weekly_analytics": 15000,
+    "daily_analytics": 10000,
+    "dashboard_summary": 5000,
+}
+
+def analytics_budget_ms(name):
+    return int(os.getenv(f"ANALYTICS_BUDGET_{name.upper()}_MS", ANALYTICS_BUDGETS_MS[name]))
+
+class AnalyticsTimeoutError(Exception):
+    """An analytics query ran past its maxTimeMS budget and was aborted by the server"""
+    def __init__(self, query, budget_ms):
+        self.query = query
+        self.budget_ms = budget_ms
+        super().__init__(f"Analytics query '{query}' exceeded its {budget_ms} ms budget")
+
+# Length of the text snippet returned by summary (list) views
+SNIPPET_LENGTH = 140
+
+# Projection for view=summary list responses: one line per message
+SUMMARY_PROJECTION = {
+    "id": 1,
+    "sender": 1,
+    "source": 1,
+    "timestamp": 1,
+    "occurred_at": 1,
+    "category": "$sentiment",
+    "snippet": {"$substrCP": [{"$ifNull": ["$text", ""]}, 0, SNIPPET_LENGTH]}
+}
+
+# Fields needed to count a message into an emotion bucket
+LABEL_PROJECTION = {"_id": 0, "sentiment": 1}
+
+MESSAGE_VIEWS = {
+    "full": None,
+    "summary": SUMMARY_PROJECTION
+}
+
+# Server-enforced page sizes for list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '200'))
+
+# Newest first, _id breaks ties so every position is unique
+KEYSET_SORT = [("occurred_at", -1), ("_id", -1)]
+
+def clamp_page_size(limit, default=DEFAULT_PAGE_SIZE):
+    """Apply the default page size and cap requested sizes at MAX_PAGE_SIZE"""
+    if not limit or limit < 1:
+        return default
+    return min(limit, MAX_PAGE_SIZE)
+
+def encode_page_cursor(message):
+    """Opaque cursor pointing just past a message in KEYSET_SORT order"""
+    occurred_at = message.get('occurred_at')
+    payload = {
+        "t": occurred_at.isoformat() if isinstance(occurred_at, datetime) else None,
+        "i": str(message['_id'])
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_page_cursor(token):
+    """Decode a cursor into (occurred_at, _id); raises ValueError if it is malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        occurred_at = datetime.fromisoformat(payload["t"]) if payload.get("t") else None
+        return occurred_at, ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError(f"Invalid page cursor: {e}")
+
+def keyset_filter(query, after):
+    """Restrict query to messages that sort after the decoded cursor position"""
+    if not after:
+        return query
+    occurred_at, last_id = decode_page_cursor(after)
+    if occurred_at is None:
+        # Messages without occurred_at sort last (null < date in descending order)
+        position = {"occurred_at": None, "_id": {"$lt": last_id}}
+    else:
+        position = {"$or": [
+            {"occurred_at": {"$lt": occurred_at}},
+            {"occurred_at": occurred_at, "_id": {"$lt": last_id}}
+        ]}
+    return {"$and": [query, position]} if query else position
+
+# Sentiment history is derived from messages: one row per classified message,
+# built from the message fields plus its `classification` metadata subdocument.
+CLASSIFIER_MODEL_VERSION = os.getenv('CLASSIFIER_MODEL_VERSION', 'gemini-1.5')
+HISTORY_VIEW = 'sentiment_history_view'
+HISTORY_FILTER = {"classification": {"$exists": True}}
+HISTORY_PROJECTION = {
+    "_id": 1,
+    "message_id": {"$ifNull": ["$id", None]},
+    "timestamp": "$classification.classified_at",
+    "original_text": {"$substrCP": [{"$ifNull": ["$text", ""]}, 0, 200]},
+    "sentiment": 1,
+    "confidence_score": {"$ifNull": ["$classification.confidence_score", 0.85]},
+    "source": {"$ifNull": ["$source", "unknown"]},
+    "sender": {"$ifNull": ["$sender", "unknown"]},
+    "model_version": "$classification.model_version",
+    "processing_time_ms": {"$ifNull": ["$classification.processing_time_ms", 1200]},
+    "created_at": "$classification.classified_at",
+}
+HISTORY_VIEW_PIPELINE = [{"$match": HISTORY_FILTER}, {"$project": HISTORY_PROJECTION}]
+
+def canonical_sentiment(message_data):
+    """The single label stored in `sentiment`: sentiment, else the legacy emotion field, lowercased"""
+    label = message_data.get('sentiment') or message_data.get('emotion')
+    if isinstance(label, str):
+        label = label.strip().lower()
+    return label or None
+
+def get_view_projection(view):
+    """Projection for a list view name ('full' or 'summary'); raises ValueError otherwise"""
+    if not view:
+        return None
+    if view not in MESSAGE_VIEWS:
+        raise ValueError(f"Unknown view '{view}', expected one of: {', '.join(MESSAGE_VIEWS)}")
+    return MESSAGE_VIEWS[view]
+
+def utc_to_local(utc_value):
+    """Convert a stored naive UTC datetime to naive server local time"""
+    return utc_value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+NEGATIVE_SENTIMENTS = ['angry', 'frustrated', 'upset', 'disappointed', 'furious', 'irritated']
+# Labels listed by get_negative_sentiment_messages and the dashboard's negative alerts
+NEGATIVE_MESSAGE_SENTIMENTS = ["angry", "frustrated", "upset", "disappointed", "annoyed", "furious", "irritated"]
+
+def build_alert(message_data, message_id):
+    """Alert document for a negative message, or None"""
+    sentiment = canonical_sentiment(message_data) or ''
+    if sentiment not in NEGATIVE_SENTIMENTS:
+        return None
+    return {
+        "message_id": message_data.get('id', message_id),
+        "alert_type": "negative_sentiment",
+        "severity": "high" if sentiment in ['angry', 'furious'] else "medium",
+        "sentiment": sentiment,
+        "description": f"Negative sentiment detected: {sentiment}",
+        "status": "active",
+        "created_at": datetime.now().isoformat()
+    }
+
+def prepare_message(message_data):
+    """Fill in derived fields (timestamps, status, priority) before a message is stored"""
+    # Add created_at timestamp if not present
+    if 'created_at' not in message_data:
+        message_data['created_at'] = message_data.get('timestamp')
+    
+    # Canonical UTC datetime used for every time-range query and sort
+    occurred_at = to_utc_datetime(message_data.get('timestamp'))
+    if occurred_at is None:
+        if message_data.get('timestamp'):
+            print(f"⚠️ Could not parse timestamp: {message_data.get('timestamp')}")
+        occurred_at = utc_now()
+    message_data['occurred_at'] = occurred_at
+    message_data.pop('timestamp_parsed', None)
+    message_data.pop('timestamp_iso', None)
+    
+    # One canonical, indexed label; `emotion` is left as sent for older readers
+    message_data['sentiment'] = canonical_sentiment(message_data)
+    
+    # Classification metadata; sentiment history is derived from it
+    if message_data['sentiment'] and 'classification' not in message_data:
+        message_data['classification'] = {
+            "classified_at": datetime.now().isoformat(),
+            "model_version": CLASSIFIER_MODEL_VERSION
+        }
+    
+    # Add status if not present
+    if 'status' not in message_data:
+        message_data['status'] = 'new'
+    
+    # Set priority based on sentiment
+    if 'priority' not in message_data:
+        sentiment = message_data['sentiment'] or ''
+        if sentiment in NEGATIVE_SENTIMENTS:
+            message_data['priority'] = 'high'
+        elif sentiment in ['confused', 'concerned', 'worried']:
+            message_data['priority'] = 'medium'
+        else:
+            message_data['priority'] = 'low'
+    
+    return message_data
+
+def default_week_start():
+    """Monday 00:00 (local) of the current week"""
+    today = datetime.now()
+    week_start = today - timedelta(days=today.weekday())
+    return week_start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def build_weekly_report(week_messages, week_alerts, week_start_date, week_end_date):
+    """Weekly summary document from the week's messages and alert severities"""
+    # Calculate analytics
+    total_messages = len(week_messages)
+    sentiment_counts = {}
+    source_counts = {}
+    daily_counts = {}
+    priority_counts = {}
+    
+    for msg in week_messages:
+        # Sentiment breakdown
+        sentiment = msg.get('sentiment') or 'unknown'
+        sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
+        
+        # Source breakdown
+        source = msg.get('source', 'unknown')
+        source_counts[source] = source_counts.get(source, 0) + 1
+        
+        # Priority breakdown
+        priority = msg.get('priority', 'low')
+        priority_counts[priority] = priority_counts.get(priority, 0) + 1
+        
+        # Daily breakdown (local date)
+        msg_date = utc_to_local(msg['occurred_at']).date().isoformat()
+        daily_counts[msg_date] = daily_counts.get(msg_date, 0) + 1
+    
+    weekly_analytics = {
+        "week_start": week_start_date.isoformat(),
+        "week_end": week_end_date.isoformat(),
+        "total_messages": total_messages,
+        "sentiment_breakdown": sentiment_counts,
+        "source_breakdown": source_counts,
+        "priority_breakdown": priority_counts,
+        "daily_message_counts": daily_counts,
+        "total_alerts": len(week_alerts),
+        "alert_breakdown": {
+            "high_priority": len([a for a in week_alerts if a.get('severity') == 'high']),
+            "medium_priority": len([a for a in week_alerts if a.get('severity') == 'medium'])
+        },
+        "average_messages_per_day": round(total_messages / 7, 2),
+        "negative_sentiment_ratio": round(
+            sum(sentiment_counts.get(s, 0) for s in ['angry', 'frustrated', 'upset', 'disappointed']) / total_messages * 100, 2
+        ) if total_messages > 0 else 0,
+        "created_at": datetime.now().isoformat(),
+        "report_type": "weekly_summary"
+    }
+    return weekly_analytics
+
+def build_daily_report(day_messages, target_date):
+    """Daily summary document from the day's messages"""
+    # Calculate daily analytics similar to weekly
+    total_messages = len(day_messages)
+    sentiment_counts = {}
+    source_counts = {}
+    hourly_counts = {}
+    
+    for msg in day_messages:
+        sentiment = msg.get('sentiment') or 'unknown'
+        sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
+        
+        source = msg.get('source', 'unknown')
+        source_counts[source] = source_counts.get(source, 0) + 1
+        
+        # Hourly breakdown (local hour)
+        hour = utc_to_local(msg['occurred_at']).strftime("%H")
+        hourly_counts[hour] = hourly_counts.get(hour, 0) + 1
+    
+    daily_analytics = {
+        "date": target_date.date().isoformat(),
+        "total_messages": total_messages,
+        "sentiment_breakdown": sentiment_counts,
+        "source_breakdown": source_counts,
+        "hourly_breakdown": hourly_counts,
+        "created_at": datetime.now().isoformat(),
+        "report_type": "daily_summary"
+    }
+    return daily_analytics
+
+
+class DatabaseManager(SentimentRepository):
+    """MongoDB repository (the default STORAGE_BACKEND)"""
     def __init__(self):
         self.client = None
         self.db = None
@@ -30,8 +384,9 @@ class DatabaseManager:
             if not mongodb_uri:
                 raise ValueError("MONGODB_URI not found in environment variables")
             
-            # Create MongoDB client
-            self.client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=5000)
+            # Use the process-wide shared clients: one pool for the write path, one for analytics
+            self.client = get_mongo_client(mongodb_uri)
+            self.analytics_client = get_mongo_client(mongodb_uri, profile='analytics')
             
             # Test the connection
             self.client.admin.command('ping')
@@ -39,19 +394,46 @@ class DatabaseManager:
             
             # Get database and collections
             self.db = self.client[database_name]
+            self.write_db = self.db
+            # Dashboard/report reads: secondaryPreferred, separate pool, maxTimeMS budgets
+            self.analytics_db = self.analytics_client[database_name]
+            self.messages_analytics = self.analytics_db['messages']
             self.messages = self.db['messages']
             self.alerts = self.db['alerts']
             self.analytics = self.db['sentiment_analytics'] 
             self.users = self.db['users']
             self.settings = self.db['settings']
-            self.history = self.db['sentiment_history']
+            self.history = self.db[HISTORY_VIEW]  # read-only view over messages
             self.email_configs = self.db['email_configs']  # New collection for email configurations
+            self.bodies = self.db[BODIES_COLLECTION]  # full text of large messages
+            self.rollups = self.db[ROLLUPS_COLLECTION]  # hourly counts maintained on insert/reclassify
+            self.rollups_analytics = self.analytics_db[ROLLUPS_COLLECTION]
             
             # Maintain backward compatibility
             self.collection = self.messages
             
-            # Create indexes for better performance
-            self.create_indexes()
+            # Per-tenant reset floors; resumes reaping left unfinished by a restart
+            self.epochs = DataEpochs(self.db, [self.messages, self.analytics, self.bodies])
+            if self.epochs.has_pending_reset():
+                self.epochs.start_reaper()
+            
+            # Per-tenant versions that invalidate cached dashboard responses
+            self.data_versions = DataVersions(self.db)
+            
+            # Apply the declared indexes once per index spec version
+            self.ensure_indexes()
+            
+            # Dashboard counts come from the rollups once they have been built
+            self.rollups_ready = SENTIMENT_ROLLUPS and bool(self.db['schema_migrations'].find_one(
+                {"_id": ROLLUPS_MIGRATION_VERSION, "status": "applied"}))
+            
+            # Finish inserts buffered by a process that died before flushing
+            get_write_buffer().replay_spool(self.client)
+            
+            # Test mode: explain() every query and fail on collection scans
+            if os.getenv('DB_EXPLAIN_CHECK', 'false').lower() == 'true':
+                from query_plan_check import enable_explain_check
+                enable_explain_check(self)
             
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
             print(f"❌ Failed to connect to MongoDB: {e}")
@@ -61,88 +443,163 @@ class DatabaseManager:
             raise
     
     def create_indexes(self):
-        """Create indexes for better query performance"""
-        try:
-            # Messages collection indexes
-            self.messages.create_index("timestamp")
-            self.messages.create_index("source")
-            self.messages.create_index("sender")
-            self.messages.create_index("sentiment")
-            self.messages.create_index("emotion")
-            self.messages.create_index([("source", 1), ("timestamp", -1)])
-            self.messages.create_index([("sentiment", 1), ("timestamp", -1)])
-            
-            # Alerts collection indexes (if not already created)
-            self.alerts.create_index("message_id")
-            self.alerts.create_index("alert_type")
-            self.alerts.create_index("status")
-            
+        """Create the indexes declared in indexes.INDEX_SPECS"""
+        return apply_index_specs(self.db)
+    
+    def ensure_indexes(self):
+        """Apply the index spec if this version has not been recorded in schema_migrations"""
+        try:
+            migrations = self.db['schema_migrations']
+            if migrations.find_one({"_id": INDEX_MIGRATION_VERSION, "status": "applied"}):
+                return
+            print(f"🔧 Applying index spec {INDEX_MIGRATION_VERSION}")
+            summary = self.create_indexes()
+            migrations.update_one(
+                {"_id": INDEX_MIGRATION_VERSION},
+                {"$set": {"status": "applied", "description": "Apply declarative index spec",
+                          "result": summary, "applied_at": utc_now()}},
+                upsert=True
+            )
             print("✅ Database indexes verified successfully")
         except Exception as e:
             print(f"⚠️ Warning: Could not create indexes: {e}")
     
+    def prepare_message(self, message_data, epoch=None):
+        """Fill in derived fields (timestamps, status, priority, reset epoch) before a message is stored"""
+        prepare_message(message_data)
+        # Reset epoch: documents below their tenant's reset floor are hidden and reaped
+        message_data['epoch'] = epoch if epoch is not None else self.epochs.current()
+        return message_data
+    
     def insert_message(self, message_data):
         """Insert a single message into the database"""
         try:
-            # Add created_at timestamp if not present
-            if 'created_at' not in message_data:
-                message_data['created_at'] = message_data.get('timestamp')
-            
-            # Add normalized timestamp for better querying
-            if 'timestamp' in message_data and isinstance(message_data['timestamp'], str):
-                try:
-                    from dateutil import parser as date_parser
-                    parsed_time = date_parser.parse(message_data['timestamp'])
-                    message_data['timestamp_parsed'] = parsed_time
-                    message_data['timestamp_iso'] = parsed_time.isoformat()
-                except Exception as e:
-                    print(f"⚠️ Could not parse timestamp: {e}")
-                    message_data['timestamp_parsed'] = datetime.now()
-                    message_data['timestamp_iso'] = datetime.now().isoformat()
-            else:
-                message_data['timestamp_parsed'] = datetime.now()
-                message_data['timestamp_iso'] = datetime.now().isoformat()
-            
-            # Add status if not present
-            if 'status' not in message_data:
-                message_data['status'] = 'new'
-            
-            # Set priority based on sentiment
-            if 'priority' not in message_data:
-                sentiment = message_data.get('sentiment', message_data.get('emotion', '')).lower()
-                negative_sentiments = ['angry', 'frustrated', 'upset', 'disappointed', 'furious', 'irritated']
-                if sentiment in negative_sentiments:
-                    message_data['priority'] = 'high'
-                elif sentiment in ['confused', 'concerned', 'worried']:
-                    message_data['priority'] = 'medium'
-                else:
-                    message_data['priority'] = 'low'
+            self.prepare_message(message_data)
             
-            result = self.messages.insert_one(message_data)
+            # Large bodies go to the body store first so a message never points at a missing body
+            body = detach_body(message_data)
+            if body:
+                self.bodies.insert_one(body)
             
-            # Create alert if negative sentiment
-            self._check_and_create_alert(message_data, str(result.inserted_id))
+            result = self.messages.insert_one(message_data)
+            self.bump_data_version([message_data.get('user_id')])
+            get_live_updates().publish_messages([message_data])
             
-            # Save sentiment history for tracking
-            sentiment = message_data.get('sentiment', message_data.get('emotion'))
-            if sentiment:
-                try:
-                    self.save_sentiment_history(message_data, sentiment)
-                except Exception as e:
-                    print(f"⚠️ Warning: Could not save sentiment history: {e}")
+            if POST_INSERT_PROCESSING == 'inline':
+                self.process_inserted_message(message_data, str(result.inserted_id))
             
             return str(result.inserted_id)
         except Exception as e:
             print(f"❌ Error inserting message: {e}")
             raise
     
-    def get_all_messages(self, limit=None, skip=None, sort_by="timestamp", sort_order=-1):
-        """Retrieve messages from database with optional pagination and sorting"""
+    def process_inserted_message(self, message_data, message_id):
+        """Post-insert side effects: rollup counts, alert creation for negative sentiment"""
+        self.add_to_rollups([message_data])
+        self._check_and_create_alert(message_data, message_id)
+    
+    def add_to_rollups(self, messages):
+        """Count newly stored messages into sentiment_rollups"""
+        if not SENTIMENT_ROLLUPS:
+            return
         try:
-            cursor = self.messages.find()
+            apply_rollups(self.rollups, messages)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not update sentiment rollups: {e}")
+    
+    def bump_data_version(self, user_ids=None):
+        """Invalidate cached responses for these tenants (and global ones)"""
+        try:
+            self.data_versions.bump(user_ids)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not bump data version: {e}")
+    
+    def get_data_version(self, user_id=None):
+        """Version tuple cached responses for user_id (or for everyone) are tagged with"""
+        return self.data_versions.version(user_id)
+    
+    def reclassify_message(self, message_id, sentiment, confidence_score=None):
+        """Replace a message's sentiment label, moving its rollup count; returns False if not found"""
+        try:
+            label = canonical_sentiment({"sentiment": sentiment})
+            classification = {"classified_at": datetime.now().isoformat(), "model_version": CLASSIFIER_MODEL_VERSION}
+            if confidence_score is not None:
+                classification["confidence_score"] = confidence_score
+            previous = self.messages.find_one_and_update(
+                self.epochs.visible_filter({"_id": ObjectId(message_id)}),
+                {"$set": {"sentiment": label, "classification": classification}},
+                projection={"user_id": 1, "source": 1, "occurred_at": 1, "sentiment": 1}
+            )
+            if not previous:
+                return False
+            if SENTIMENT_ROLLUPS:
+                move_rollup(self.rollups, previous, previous.get('sentiment'), label)
+            self.bump_data_version([previous.get('user_id')])
+            return True
+        except InvalidId:
+            return False
+        except Exception as e:
+            print(f"❌ Error reclassifying message: {e}")
+            raise
+    
+    def insert_messages_bulk(self, messages):
+        """
+        Insert many messages with one unordered insert_many (used for backfills).
+        Alerts are not generated for bulk-loaded messages.
+        Returns (inserted_count, duplicate_count).
+        """
+        if not messages:
+            return 0, 0
+        bodies = []
+        epoch = self.epochs.current()
+        for message_data in messages:
+            self.prepare_message(message_data, epoch)
+            body = detach_body(message_data)
+            if body:
+                bodies.append(body)
+        if bodies:
+            try:
+                self.bodies.insert_many(bodies, ordered=False)
+            except BulkWriteError as e:
+                # Re-imported messages already have their body stored under the same _id
+                if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                    raise
+        try:
+            result = self.messages.insert_many(messages, ordered=False)
+            inserted, duplicates = messages, []
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            duplicates = [err for err in write_errors if err.get('code') == 11000]
+            if len(duplicates) != len(write_errors):
+                print(f"❌ Error bulk inserting messages: {write_errors[0].get('errmsg')}")
+                raise
+            failed = {err['index'] for err in duplicates}
+            inserted = [message_data for index, message_data in enumerate(messages) if index not in failed]
+        
+        # In change-stream mode RollupConsumer counts the inserts instead
+        if POST_INSERT_PROCESSING == 'inline':
+            self.add_to_rollups(inserted)
+        if inserted:
+            self.bump_data_version({message_data.get('user_id') for message_data in inserted})
+            get_live_updates().publish_messages(inserted)
+        return len(inserted), len(duplicates)
+    
+    def get_all_messages(self, limit=None, skip=None, sort_by="occurred_at", sort_order=-1, projection=None, after=None):
+        """
+        Retrieve messages from database with optional pagination, sorting and projection.
+        Pass `after` (a cursor from encode_page_cursor) for keyset pagination in KEYSET_SORT order.
+        """
+        try:
+            # 'timestamp' is stored as the original string; sort on the canonical datetime
+            if sort_by in ("timestamp", "created_at"):
+                sort_by = "occurred_at"
+            cursor = self.messages.find(self.epochs.visible_filter(keyset_filter({}, after)), projection)
             
             # Apply sorting
-            cursor = cursor.sort(sort_by, sort_order)
+            if after or (sort_by == "occurred_at" and sort_order == -1):
+                cursor = cursor.sort(KEYSET_SORT)
+            else:
+                cursor = cursor.sort(sort_by, sort_order)
             
             # Apply pagination
             if skip:
@@ -150,79 +607,71 @@ class DatabaseManager:
             if limit:
                 cursor = cursor.limit(limit)
             
-            # Convert to list and handle ObjectId serialization
-            messages = []
-            for message in cursor:
-                message['_id'] = str(message['_id'])  # Convert ObjectId to string
-                messages.append(message)
-            
-            return messages
+            return list(cursor)
         except Exception as e:
             print(f"❌ Error retrieving messages: {e}")
             raise
     
+    def get_message_body(self, message_id):
+        """Full text of a message, loading it from the body store if it was detached"""
+        try:
+            message = self.messages.find_one(self.epochs.visible_filter({"_id": ObjectId(message_id)}),
+                                             {"text": 1, "body_ref": 1})
+            if not message:
+                return None
+            if not message.get('body_ref'):
+                return message.get('text', '')
+            body = self.bodies.find_one({"_id": message['body_ref']})
+            return decode_body(body) if body else message.get('text', '')
+        except InvalidId:
+            return None
+        except Exception as e:
+            print(f"❌ Error loading message body: {e}")
+            raise
+    
     def get_message_count(self):
-        """Get total count of messages in database"""
+        """Get total count of messages (collection metadata, O(1), unless a reset is still being reaped)"""
         try:
-            return self.messages.count_documents({})
+            if self.epochs.has_pending_reset():
+                return self.messages.count_documents(self.epochs.visible_filter())
+            return self.messages.estimated_document_count()
         except Exception as e:
             print(f"❌ Error getting message count: {e}")
             raise
     
-    def get_messages_by_source(self, source, limit=None):
+    def get_messages_by_source(self, source, limit=None, projection=None, after=None):
         """Get messages filtered by source (email, chat, ticket)"""
         try:
-            cursor = self.messages.find({"source": source}).sort("timestamp", -1)
+            cursor = self.messages.find(self.epochs.visible_filter(keyset_filter({"source": source}, after)), projection).sort(KEYSET_SORT)
             if limit:
                 cursor = cursor.limit(limit)
             
-            messages = []
-            for message in cursor:
-                message['_id'] = str(message['_id'])
-                messages.append(message)
-            
-            return messages
+            return list(cursor)
         except Exception as e:
             print(f"❌ Error getting messages by source: {e}")
             raise
     
-    def get_messages_by_sender(self, sender, limit=None):
+    def get_messages_by_sender(self, sender, limit=None, projection=None, after=None):
         """Get messages filtered by sender"""
         try:
-            cursor = self.messages.find({"sender": sender}).sort("timestamp", -1)
+            cursor = self.messages.find(self.epochs.visible_filter(keyset_filter({"sender": sender}, after)), projection).sort(KEYSET_SORT)
             if limit:
                 cursor = cursor.limit(limit)
             
-            messages = []
-            for message in cursor:
-                message['_id'] = str(message['_id'])
-                messages.append(message)
-            
-            return messages
+            return list(cursor)
         except Exception as e:
             print(f"❌ Error getting messages by sender: {e}")
             raise
     
-    def get_messages_by_sentiment(self, sentiment, limit=None):
-        """Get messages filtered by sentiment/emotion"""
+    def get_messages_by_sentiment(self, sentiment, limit=None, projection=None, after=None):
+        """Get messages filtered by the canonical sentiment label"""
         try:
-            # Search both 'sentiment' and 'emotion' fields for compatibility
-            cursor = self.messages.find({
-                "$or": [
-                    {"sentiment": sentiment},
-                    {"emotion": sentiment}
-                ]
-            }).sort("timestamp", -1)
+            cursor = self.messages.find(self.epochs.visible_filter(keyset_filter({"sentiment": sentiment}, after)), projection).sort(KEYSET_SORT)
             
             if limit:
                 cursor = cursor.limit(limit)
             
-            messages = []
-            for message in cursor:
-                message['_id'] = str(message['_id'])
-                messages.append(message)
-            
-            return messages
+            return list(cursor)
         except Exception as e:
             print(f"❌ Error getting messages by sentiment: {e}")
             raise
@@ -230,20 +679,26 @@ class DatabaseManager:
     def get_sentiment_stats(self):
         """Get sentiment distribution statistics"""
         try:
+            if self.rollups_ready:
+                results = self._rollup_counts("sentiment_stats", {}, "$sentiment")
+                return {result["_id"]: result["count"] for result in results if result["_id"] is not None}
+            
             pipeline = [
                 {
                     "$group": {
-                        "_id": {"$ifNull": ["$sentiment", "$emotion"]},
+                        "_id": "$sentiment",
                         "count": {"$sum": 1}
                     }
                 },
                 {"$match": {"_id": {"$ne": None}}}
             ]
             
-            results = list(self.messages.aggregate(pipeline))
+            results = self._analytics_aggregate("sentiment_stats", pipeline)
             sentiment_counts = {result["_id"]: result["count"] for result in results}
             
             return sentiment_counts
+        except AnalyticsTimeoutError:
+            raise
         except Exception as e:
             print(f"❌ Error getting sentiment stats: {e}")
             return {}
@@ -251,137 +706,81 @@ class DatabaseManager:
     def get_sentiment_stats_comparison(self, hours_ago=24):
         """Get sentiment stats from previous period for comparison"""
         try:
-            from datetime import datetime, timedelta
-            
             # Calculate timestamp for comparison period
-            cutoff_time = datetime.now() - timedelta(hours=hours_ago)
+            cutoff_time = utc_now() - timedelta(hours=hours_ago)
+            
+            if self.rollups_ready:
+                # Hour granularity: buckets that started before the cutoff's hour
+                results = self._rollup_counts("sentiment_stats_comparison", {"hour": {"$lt": hour_bucket(cutoff_time)}}, "$sentiment")
+                return {result["_id"]: result["count"] for result in results if result["_id"] is not None}
             
             pipeline = [
                 {
                     "$match": {
-                        "created_at": {"$lt": cutoff_time.isoformat()}
+                        "occurred_at": {"$lt": cutoff_time}
                     }
                 },
                 {
                     "$group": {
-                        "_id": {"$ifNull": ["$sentiment", "$emotion"]},
+                        "_id": "$sentiment",
                         "count": {"$sum": 1}
                     }
                 },
                 {"$match": {"_id": {"$ne": None}}}
             ]
             
-            results = list(self.messages.aggregate(pipeline))
+            results = self._analytics_aggregate("sentiment_stats_comparison", pipeline)
             sentiment_counts = {result["_id"]: result["count"] for result in results}
             
             return sentiment_counts
+        except AnalyticsTimeoutError:
+            raise
         except Exception as e:
             print(f"❌ Error getting sentiment stats comparison: {e}")
             return {}
 
     def get_hourly_emotion_trends(self, hours=6, user_id=None):
-        """Get hourly emotion trends for the specified number of hours, optionally filtered by user"""
+        """
+        Hourly emotion counts for the last `hours` clock hours, optionally filtered by user.
+        One aggregation groups by ($dateTrunc hour, emotion); hours without messages are filled here.
+        """
         try:
-            from datetime import datetime, timedelta
+            tz, tz_name = trends_timezone()
+            buckets = hourly_buckets(hours, tz)
+            match = {
+                "occurred_at": {"$gte": buckets[0][0], "$lt": buckets[-1][0] + timedelta(hours=1)}
+            }
             
-            # Calculate start time
-            end_time = datetime.now()
-            start_time = end_time - timedelta(hours=hours)
+            # Add user filter if specified
+            if user_id:
+                match["user_id"] = user_id
             
-            # Generate hourly buckets
-            hourly_data = {}
-            current_time = start_time
+            # Rollup hours are UTC hours, which are local clock hours unless the offset has minutes
+            if self.rollups_ready and all(start.minute == 0 for start, _ in buckets):
+                rollup_match = {"hour": match.pop("occurred_at"), **match}
+                counts = {}
+                for row in self._rollup_counts("hourly_trends", rollup_match,
+                                               {"hour": "$hour", "emotion": emotion_expression(TREND_EMOTION_MAPPING)}):
+                    counts.setdefault(row["_id"]["hour"], empty_emotion_counts())[row["_id"]["emotion"]] = row["count"]
+                return {label: counts.get(start, empty_emotion_counts()) for start, label in buckets}
             
-            while current_time <= end_time:
-                hour_key = current_time.strftime("%H:%M")
-                next_hour = current_time + timedelta(hours=1)
-                
-                # Build query for this hour
-                query = {
-                    "$or": [
-                        {"timestamp_parsed": {"$gte": current_time, "$lt": next_hour}},
-                        {"timestamp_iso": {"$gte": current_time.isoformat(), "$lt": next_hour.isoformat()}}
-                    ]
-                }
-                
-                # Add user filter if specified
-                if user_id:
-                    query["user_id"] = user_id
-                
-                # Try to use optimized query first
-                try:
-                    hour_messages = list(self.messages.find(query))
-                except Exception:
-                    # Fallback to Python filtering for backward compatibility
-                    print(f"⚠️ Using fallback filtering for hour {hour_key}")
-                    hour_messages = []
-                    
-                    # Get all messages and filter by timestamp in Python
-                    base_query = {"user_id": user_id} if user_id else {}
-                    all_messages_cursor = self.messages.find(base_query)
-                    
-                    for msg in all_messages_cursor:
-                        msg_timestamp_str = msg.get('timestamp_iso') or msg.get('timestamp') or msg.get('created_at')
-                        if msg_timestamp_str:
-                            try:
-                                # Parse timestamp string to datetime object
-                                if isinstance(msg_timestamp_str, str):
-                                    from dateutil import parser as date_parser
-                                    msg_timestamp = date_parser.parse(msg_timestamp_str)
-                                else:
-                                    msg_timestamp = msg_timestamp_str
-                                
-                                # Check if message falls within current hour
-                                if current_time <= msg_timestamp < next_hour:
-                                    hour_messages.append(msg)
-                            except Exception:
-                                # Skip messages with invalid timestamps
-                                continue
-                
-                # Count emotions for this hour using improved mapping
-                emotion_counts = {'anger': 0, 'confusion': 0, 'joy': 0, 'neutral': 0}
-                
-                emotion_mapping = {
-                    'angry': 'anger',
-                    'frustrated': 'anger',
-                    'furious': 'anger',
-                    'irritated': 'anger',
-                    'disgusted': 'anger',
-                    'upset': 'anger',
-                    'livid': 'anger',
-                    'mad': 'anger',
-                    'confused': 'confusion',
-                    'uncertain': 'confusion',
-                    'puzzled': 'confusion',
-                    'bewildered': 'confusion',
-                    'unclear': 'confusion',
-                    'happy': 'joy',
-                    'joy': 'joy',
-                    'grateful': 'joy',
-                    'thrilled': 'joy',
-                    'delighted': 'joy',
-                    'pleased': 'joy',
-                    'satisfied': 'joy',
-                    'excellent': 'joy',
-                    'amazing': 'joy',
-                    'wonderful': 'joy',
-                    'fantastic': 'joy',
-                    'great': 'joy',
-                    'outstanding': 'joy',
-                    'neutral': 'neutral',
-                    'unknown': 'neutral',
-                    'informational': 'neutral'
-                }
-                
-                for msg in hour_messages:
-                    emotion = msg.get('sentiment', msg.get('emotion', 'neutral')).lower()
-                    mapped_emotion = emotion_mapping.get(emotion, 'neutral')
-                    emotion_counts[mapped_emotion] += 1
-                
-                hourly_data[hour_key] = emotion_counts
-                current_time = next_hour
+            pipeline = [
+                {"$match": match},
+                {"$group": {
+                    "_id": {
+                        "hour": {"$dateTrunc": {"date": "$occurred_at", "unit": "hour", "timezone": tz_name}},
+                        "emotion": emotion_expression(TREND_EMOTION_MAPPING)
+                    },
+                    "count": {"$sum": 1}
+                }}
+            ]
+            counts = {}
+            for row in self._analytics_aggregate("hourly_trends", pipeline):
+                counts.setdefault(row["_id"]["hour"], empty_emotion_counts())[row["_id"]["emotion"]] = row["count"]
             
-            return hourly_data
+            return {label: counts.get(start, empty_emotion_counts()) for start, label in buckets}
+        except AnalyticsTimeoutError:
+            raise
         except Exception as e:
             print(f"❌ Error getting hourly emotion trends: {e}")
             return {}
@@ -389,59 +788,150 @@ class DatabaseManager:
     def get_current_hour_stats(self):
         """Get emotion statistics for the current hour"""
         try:
-            from datetime import timedelta
-            
-            now = datetime.now()
+            now = utc_now()
             current_hour_start = now.replace(minute=0, second=0, microsecond=0)
             next_hour = current_hour_start + timedelta(hours=1)
             
+            if self.rollups_ready:
+                rows = self._rollup_counts("current_hour", {"hour": current_hour_start}, "$sentiment")
+                return count_emotions([row["_id"] for row in rows], CURRENT_HOUR_EMOTION_MAPPING, [row["count"] for row in rows])
+            
             # Query messages for current hour
-            current_hour_messages = list(self.messages.find({
-                "created_at": {
-                    "$gte": current_hour_start.isoformat(),
-                    "$lt": next_hour.isoformat()
+            current_hour_messages = self._analytics_find("current_hour", {
+                "occurred_at": {
+                    "$gte": current_hour_start,
+                    "$lt": next_hour
                 }
-            }))
-            
-            # Count emotions
-            emotion_counts = {'anger': 0, 'confusion': 0, 'joy': 0, 'neutral': 0}
-            
-            for msg in current_hour_messages:
-                emotion = msg.get('sentiment', msg.get('emotion', 'neutral')).lower()
-                if emotion in ['angry', 'frustrated', 'upset']:
-                    emotion_counts['anger'] += 1
-                elif emotion in ['confused', 'uncertain']:
-                    emotion_counts['confusion'] += 1
-                elif emotion in ['happy', 'joy', 'satisfied']:
-                    emotion_counts['joy'] += 1
-                else:
-                    emotion_counts['neutral'] += 1
+            }, LABEL_PROJECTION)
             
-            return emotion_counts
+            return count_emotions((msg.get('sentiment') for msg in current_hour_messages), CURRENT_HOUR_EMOTION_MAPPING)
+        except AnalyticsTimeoutError:
+            raise
         except Exception as e:
             print(f"❌ Error getting current hour stats: {e}")
-            return {'anger': 0, 'confusion': 0, 'joy': 0, 'neutral': 0}
+            return empty_emotion_counts()
+    
+    def get_dashboard_summary(self, recent_limit=10, negative_limit=5, projection=None):
+        """
+        Total, counts by source and sentiment, recent messages and negative messages
+        in one $facet aggregation (one round trip; only counts and the short lists are returned).
+        A limit of 0 leaves that list out.
+        """
+        try:
+            if self.rollups_ready:
+                return self._rollup_dashboard_summary(recent_limit, negative_limit, projection)
+            
+            newest_first = {"$sort": {"occurred_at": -1, "_id": -1}}
+            list_projection = [{"$project": projection}] if projection else []
+            facets = {
+                "total": [{"$count": "count"}],
+                "by_source": [{"$group": {"_id": "$source", "count": {"$sum": 1}}}],
+                "by_sentiment": [
+                    {"$match": {"sentiment": {"$ne": None}}},
+                    {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}}
+                ],
+            }
+            if recent_limit:
+                facets["recent_messages"] = [newest_first, {"$limit": recent_limit}] + list_projection
+            if negative_limit:
+                facets["negative_alerts"] = [
+                    {"$match": {"sentiment": {"$in": NEGATIVE_MESSAGE_SENTIMENTS}}},
+                    newest_first, {"$limit": negative_limit}
+                ] + list_projection
+            
+            result = self._analytics_aggregate("dashboard_summary", [{"$facet": facets}])[0]
+            return {
+                "total_messages": result["total"][0]["count"] if result["total"] else 0,
+                "by_source": {row["_id"]: row["count"] for row in result["by_source"] if row["_id"] is not None},
+                "by_sentiment": {row["_id"]: row["count"] for row in result["by_sentiment"]},
+                "recent_messages": result.get("recent_messages", []),
+                "negative_alerts": result.get("negative_alerts", []),
+            }
+        except AnalyticsTimeoutError:
+            raise
+        except Exception as e:
+            print(f"❌ Error getting dashboard summary: {e}")
+            raise
+    
+    def _rollup_dashboard_summary(self, recent_limit, negative_limit, projection):
+        """Counts from the rollups; the lists are indexed keyset reads of `limit` messages"""
+        count = {"$sum": "$count"}
+        result = self._rollup_aggregate("dashboard_summary", [{"$facet": {
+            "total": [{"$group": {"_id": None, "count": count}}],
+            "by_source": [{"$group": {"_id": "$source", "count": count}}],
+            "by_sentiment": [{"$group": {"_id": "$sentiment", "count": count}}],
+        }}])[0]
+        return {
+            "total_messages": result["total"][0]["count"] if result["total"] else 0,
+            "by_source": {row["_id"]: row["count"] for row in result["by_source"] if row["_id"] is not None and row["count"]},
+            "by_sentiment": {row["_id"]: row["count"] for row in result["by_sentiment"] if row["_id"] is not None and row["count"]},
+            "recent_messages": self.get_all_messages(limit=recent_limit, projection=projection) if recent_limit else [],
+            "negative_alerts": self.get_negative_sentiment_messages(negative_limit, projection) if negative_limit else [],
+        }
+    
+    def _rollup_counts(self, name, match, group_key):
+        """Sum rollup counts over the buckets matching match, grouped by group_key"""
+        pipeline = [{"$match": match}] if match else []
+        return self._rollup_aggregate(name, pipeline + [
+            {"$group": {"_id": group_key, "count": {"$sum": "$count"}}},
+            {"$match": {"count": {"$gt": 0}}}
+        ])
+    
+    def _analytics_session(self):
+        """
+        Causally consistent session on the analytics client that reads no earlier
+        than the data versions this thread last read (see data_versions.py), so a
+        lagging secondary cannot produce a result older than its cache tag.
+        """
+        read_at = self.data_versions.read_after()
+        if not read_at or read_at[1] is None:  # standalone servers report no operation time
+            return nullcontext()
+        session = self.analytics_client.start_session(causal_consistency=True)
+        if read_at[0] is not None:
+            session.advance_cluster_time(read_at[0])
+        session.advance_operation_time(read_at[1])
+        return session
     
-    def get_negative_sentiment_messages(self, limit=None):
+    def _rollup_aggregate(self, name, pipeline):
+        """aggregate() on the analytics handle of sentiment_rollups within the query's time budget"""
+        budget = analytics_budget_ms(name)
+        try:
+            with self._analytics_session() as session:
+                return list(self.rollups_analytics.aggregate(pipeline, maxTimeMS=budget, session=session))
+        except ExecutionTimeout:
+            raise AnalyticsTimeoutError(name, budget)
+    
+    def _analytics_find(self, name, query, projection=None):
+        """find() on the analytics handle within the query's time budget"""
+        budget = analytics_budget_ms(name)
+        try:
+            with self._analytics_session() as session:
+                return list(self.messages_analytics.find(self.epochs.visible_filter(query), projection,
+                                                         session=session).max_time_ms(budget))
+        except ExecutionTimeout:
+            raise AnalyticsTimeoutError(name, budget)
+    
+    def _analytics_aggregate(self, name, pipeline):
+        """aggregate() on the analytics handle within the query's time budget"""
+        budget = analytics_budget_ms(name)
+        try:
+            with self._analytics_session() as session:
+                return list(self.messages_analytics.aggregate(self.epochs.visible_pipeline(pipeline),
+                                                              maxTimeMS=budget, session=session))
+        except ExecutionTimeout:
+            raise AnalyticsTimeoutError(name, budget)
+    
+    def get_negative_sentiment_messages(self, limit=None, projection=None, after=None):
         """Get messages with negative sentiment (angry, frustrated, upset, etc.)"""
         try:
-            negative_sentiments = ["angry", "frustrated", "upset", "disappointed", "annoyed", "furious", "irritated"]
-            cursor = self.messages.find({
-                "$or": [
-                    {"sentiment": {"$in": negative_sentiments}},
-                    {"emotion": {"$in": negative_sentiments}}
-                ]
-            }).sort("timestamp", -1)
+            cursor = self.messages.find(
+                self.epochs.visible_filter(keyset_filter({"sentiment": {"$in": NEGATIVE_MESSAGE_SENTIMENTS}}, after)), projection
+            ).sort(KEYSET_SORT)
             
             if limit:
                 cursor = cursor.limit(limit)
             
-            messages = []
-            for message in cursor:
-                message['_id'] = str(message['_id'])
-                messages.append(message)
-            
-            return messages
+            return list(cursor)
         except Exception as e:
             print(f"❌ Error getting negative sentiment messages: {e}")
             raise
@@ -449,39 +939,27 @@ class DatabaseManager:
     def _check_and_create_alert(self, message_data, message_id):
         """Create alert for negative sentiment messages"""
         try:
-            sentiment = message_data.get('sentiment', message_data.get('emotion', '')).lower()
-            negative_sentiments = ['angry', 'frustrated', 'upset', 'disappointed', 'furious', 'irritated']
-            
-            if sentiment in negative_sentiments:
-                alert_data = {
-                    "message_id": message_data.get('id', message_id),
-                    "alert_type": "negative_sentiment",
-                    "severity": "high" if sentiment in ['angry', 'furious'] else "medium",
-                    "sentiment": sentiment,
-                    "description": f"Negative sentiment detected: {sentiment}",
-                    "status": "active",
-                    "created_at": datetime.now().isoformat()
-                }
-                
-                self.alerts.insert_one(alert_data)
-                print(f"🚨 Alert created for negative sentiment: {sentiment}")
+            alert_data = build_alert(message_data, message_id)
+            if alert_data:
+                # High-severity alerts are written immediately; others may be buffered
+                if ALERTS_WRITE_BEHIND and alert_data["severity"] != "high":
+                    get_write_buffer().add(self.alerts, alert_data)
+                else:
+                    self.alerts.insert_one(alert_data)
+                get_live_updates().publish_alert(alert_data, message_data.get('user_id'))
+                print(f"🚨 Alert created for negative sentiment: {alert_data['sentiment']}")
                 
         except Exception as e:
             print(f"⚠️ Warning: Could not create alert: {e}")
     
-    def get_active_alerts(self, limit=None):
+    def get_active_alerts(self, limit=None, projection=None):
         """Get active alerts"""
         try:
-            cursor = self.alerts.find({"status": "active"}).sort("created_at", -1)
+            cursor = self.alerts.find({"status": "active"}, projection).sort("created_at", -1)
             if limit:
                 cursor = cursor.limit(limit)
             
-            alerts = []
-            for alert in cursor:
-                alert['_id'] = str(alert['_id'])
-                alerts.append(alert)
-            
-            return alerts
+            return list(cursor)
         except Exception as e:
             print(f"❌ Error getting active alerts: {e}")
             raise
@@ -492,7 +970,7 @@ class DatabaseManager:
             query = {"category": category} if category else {}
             settings = {}
             
-            for setting in self.settings.find(query):
+            for setting in self.settings.find(query, {"key": 1, "value": 1}):
                 settings[setting['key']] = setting['value']
             
             return settings
@@ -500,109 +978,40 @@ class DatabaseManager:
             print(f"❌ Error getting settings: {e}")
             return {}
     
-    def save_sentiment_history(self, message_data, sentiment, confidence_score=None, processing_time=None):
-        """Save sentiment analysis history for tracking and ML training"""
-        try:
-            history_entry = {
-                "message_id": message_data.get('id'),
-                "timestamp": datetime.now().isoformat(),
-                "original_text": message_data.get('text', '')[:200],  # First 200 chars
-                "sentiment": sentiment,
-                "confidence_score": confidence_score or 0.85,  # Default confidence
-                "source": message_data.get('source', 'unknown'),
-                "sender": message_data.get('sender', 'unknown'),
-                "model_version": "gemini-1.5",
-                "processing_time_ms": processing_time or 1200,
-                "created_at": datetime.now().isoformat()
-            }
-            
-            result = self.history.insert_one(history_entry)
-            return str(result.inserted_id)
-        except Exception as e:
-            print(f"❌ Error saving sentiment history: {e}")
-            raise
-    
     def generate_weekly_analytics(self, week_start_date=None):
         """Generate and save weekly sentiment analytics"""
         try:
-            from datetime import datetime, timedelta
-            
             if not week_start_date:
                 # Default to current week (Monday to Sunday)
-                today = datetime.now()
-                days_since_monday = today.weekday()
-                week_start = today - timedelta(days=days_since_monday)
-                week_start_date = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
+                week_start_date = default_week_start()
             
             week_end_date = week_start_date + timedelta(days=7)
             
-            # Query messages from this week
-            week_messages = list(self.messages.find({
-                "created_at": {
-                    "$gte": week_start_date.isoformat(),
-                    "$lt": week_end_date.isoformat()
+            # Query messages from this week (local week boundaries)
+            week_messages = self._analytics_find("weekly_analytics", {
+                "occurred_at": {
+                    "$gte": local_to_utc(week_start_date),
+                    "$lt": local_to_utc(week_end_date)
                 }
-            }))
+            }, {"sentiment": 1, "source": 1, "priority": 1, "occurred_at": 1})
             
             if not week_messages:
                 print(f"No messages found for week starting {week_start_date.date()}")
                 return None
             
-            # Calculate analytics
-            total_messages = len(week_messages)
-            sentiment_counts = {}
-            source_counts = {}
-            daily_counts = {}
-            priority_counts = {}
-            
-            for msg in week_messages:
-                # Sentiment breakdown
-                sentiment = msg.get('sentiment', msg.get('emotion', 'unknown'))
-                sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
-                
-                # Source breakdown
-                source = msg.get('source', 'unknown')
-                source_counts[source] = source_counts.get(source, 0) + 1
-                
-                # Priority breakdown
-                priority = msg.get('priority', 'low')
-                priority_counts[priority] = priority_counts.get(priority, 0) + 1
-                
-                # Daily breakdown
-                msg_date = msg.get('created_at', '')[:10]  # Get date part
-                daily_counts[msg_date] = daily_counts.get(msg_date, 0) + 1
-            
             # Get alerts for this week
             week_alerts = list(self.alerts.find({
                 "created_at": {
                     "$gte": week_start_date.isoformat(),
                     "$lt": week_end_date.isoformat()
                 }
-            }))
-            
-            # Create weekly analytics document
-            weekly_analytics = {
-                "week_start": week_start_date.isoformat(),
-                "week_end": week_end_date.isoformat(),
-                "total_messages": total_messages,
-                "sentiment_breakdown": sentiment_counts,
-                "source_breakdown": source_counts,
-                "priority_breakdown": priority_counts,
-                "daily_message_counts": daily_counts,
-                "total_alerts": len(week_alerts),
-                "alert_breakdown": {
-                    "high_priority": len([a for a in week_alerts if a.get('severity') == 'high']),
-                    "medium_priority": len([a for a in week_alerts if a.get('severity') == 'medium'])
-                },
-                "average_messages_per_day": round(total_messages / 7, 2),
-                "negative_sentiment_ratio": round(
-                    sum(sentiment_counts.get(s, 0) for s in ['angry', 'frustrated', 'upset', 'disappointed']) / total_messages * 100, 2
-                ) if total_messages > 0 else 0,
-                "created_at": datetime.now().isoformat(),
-                "report_type": "weekly_summary"
-            }
+            }, {"severity": 1}))
+            
+            weekly_analytics = build_weekly_report(week_messages, week_alerts, week_start_date, week_end_date)
+            total_messages = weekly_analytics["total_messages"]
             
             # Save to analytics collection
+            weekly_analytics["epoch"] = self.epochs.current()
             result = self.analytics.insert_one(weekly_analytics)
             print(f"✅ Weekly analytics saved for week {week_start_date.date()}")
             print(f"📊 Total messages: {total_messages}, Alerts: {len(week_alerts)}")
@@ -621,47 +1030,21 @@ class DatabaseManager:
             
             next_day = target_date + timedelta(days=1)
             
-            # Query messages from this day
-            day_messages = list(self.messages.find({
-                "created_at": {
-                    "$gte": target_date.isoformat(),
-                    "$lt": next_day.isoformat()
+            # Query messages from this day (local day boundaries)
+            day_messages = self._analytics_find("daily_analytics", {
+                "occurred_at": {
+                    "$gte": local_to_utc(target_date),
+                    "$lt": local_to_utc(next_day)
                 }
-            }))
+            }, {"sentiment": 1, "source": 1, "occurred_at": 1})
             
             if not day_messages:
                 print(f"No messages found for {target_date.date()}")
                 return None
             
-            # Calculate daily analytics similar to weekly
-            total_messages = len(day_messages)
-            sentiment_counts = {}
-            source_counts = {}
-            hourly_counts = {}
-            
-            for msg in day_messages:
-                sentiment = msg.get('sentiment', msg.get('emotion', 'unknown'))
-                sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
-                
-                source = msg.get('source', 'unknown')
-                source_counts[source] = source_counts.get(source, 0) + 1
-                
-                # Hourly breakdown
-                msg_time = msg.get('created_at', '')
-                if len(msg_time) >= 13:
-                    hour = msg_time[11:13]  # Extract hour
-                    hourly_counts[hour] = hourly_counts.get(hour, 0) + 1
-            
-            daily_analytics = {
-                "date": target_date.date().isoformat(),
-                "total_messages": total_messages,
-                "sentiment_breakdown": sentiment_counts,
-                "source_breakdown": source_counts,
-                "hourly_breakdown": hourly_counts,
-                "created_at": datetime.now().isoformat(),
-                "report_type": "daily_summary"
-            }
+            daily_analytics = build_daily_report(day_messages, target_date)
             
+            daily_analytics["epoch"] = self.epochs.current()
             result = self.analytics.insert_one(daily_analytics)
             print(f"✅ Daily analytics saved for {target_date.date()}")
             return str(result.inserted_id)
@@ -673,42 +1056,53 @@ class DatabaseManager:
     def get_analytics_by_period(self, report_type="weekly", limit=10):
         """Get analytics reports by period (daily, weekly, monthly)"""
         try:
-            cursor = self.analytics.find({"report_type": f"{report_type}_summary"}).sort("created_at", -1)
+            cursor = self.analytics.find(
+                self.epochs.visible_filter({"report_type": f"{report_type}_summary"})
+            ).sort("created_at", -1)
             if limit:
                 cursor = cursor.limit(limit)
             
-            analytics = []
-            for record in cursor:
-                record['_id'] = str(record['_id'])
-                analytics.append(record)
-            
-            return analytics
+            return list(cursor)
         except Exception as e:
             print(f"❌ Error getting analytics: {e}")
             return []
     
-    def get_sentiment_history(self, limit=None, message_id=None):
-        """Get sentiment analysis history"""
+    def get_sentiment_history(self, limit=None, message_id=None, projection=None):
+        """Get sentiment analysis history, derived from classified messages"""
         try:
-            query = {"message_id": message_id} if message_id else {}
-            cursor = self.history.find(query).sort("timestamp", -1)
+            query = dict(HISTORY_FILTER)
+            if message_id:
+                query["id"] = message_id
+            pipeline = [{"$match": query}, {"$sort": {"occurred_at": -1, "_id": -1}}]
             if limit:
-                cursor = cursor.limit(limit)
-            
-            history = []
-            for record in cursor:
-                record['_id'] = str(record['_id'])
-                history.append(record)
+                pipeline.append({"$limit": limit})
+            pipeline.append({"$project": HISTORY_PROJECTION})
+            if projection:
+                pipeline.append({"$project": projection})
             
-            return history
+            return list(self.messages.aggregate(self.epochs.visible_pipeline(pipeline)))
         except Exception as e:
             print(f"❌ Error getting sentiment history: {e}")
             return []
     
+    def reset_tenant_data(self, user_id=None):
+        """
+        Logically reset messages and analytics for one user (or everyone) in constant time.
+        Old documents are hidden immediately and deleted by the background reaper.
+        """
+        floor = self.epochs.reset(user_id)
+        # Rollups are small (one document per bucket), so they are cleared directly
+        self.rollups.delete_many({"user_id": user_id} if user_id else {})
+        self.bump_data_version([user_id])
+        print(f"🔄 Data reset for {'user ' + user_id if user_id else 'all users'} (epoch {floor}), reaping in background")
+        return floor
+    
     def close_connection(self):
         """Close database connection"""
         if self.client:
-            self.client.close()
+            get_write_buffer().flush()
+            close_all_clients()
+            self.client = None
             print("✅ Database connection closed")
     
     def save_email_config(self, config_data, user_id=None):
@@ -744,6 +1138,7 @@ class DatabaseManager:
                     upsert=True
                 )
             
+            self.bump_data_version([user_id])
             if result.upserted_id:
                 return str(result.upserted_id)
             else:
@@ -770,11 +1165,7 @@ class DatabaseManager:
                 if not config:
                     config = self.email_configs.find_one({"active": True})
             
-            if config:
-                # Convert ObjectId to string for JSON serialization
-                config["_id"] = str(config["_id"])
-                return config
-            return None
+            return config
         except Exception as e:
             print(f"❌ Error retrieving email config: {e}")
             raise
@@ -782,10 +1173,7 @@ class DatabaseManager:
     def get_all_email_configs(self):
         """Get all active email configurations"""
         try:
-            configs = list(self.email_configs.find({"active": True}))
-            for config in configs:
-                config["_id"] = str(config["_id"])
-            return configs
+            return list(self.email_configs.find({"active": True}))
         except Exception as e:
             print(f"❌ Error retrieving all email configs: {e}")
             raise
@@ -794,8 +1182,12 @@ class DatabaseManager:
 db_manager = None
 
 def get_database_manager():
-    """Get or create database manager instance"""
+    """Get or create the repository selected by STORAGE_BACKEND (mongo or sqlite)"""
     global db_manager
     if db_manager is None:
-        db_manager = DatabaseManager()
+        if STORAGE_BACKEND == 'sqlite':
+            from sqlite_repository import SQLiteRepository
+            db_manager = SQLiteRepository()
+        else:
+            db_manager = DatabaseManager()
     return db_manager
@@ -0,0 +1,81 @@
+# emotion_taxonomy.py
+# Mapping from raw sentiment labels to the four dashboard emotions, usable both
+# in Python (count_emotions) and inside an aggregation (emotion_expression), so
+# MongoDB can group by emotion without shipping labels back to the client.
+
+EMOTIONS = ('anger', 'confusion', 'joy', 'neutral')
+DEFAULT_EMOTION = 'neutral'
+
+# Raw sentiment label -> dashboard emotion used by the hourly trends
+TREND_EMOTION_MAPPING = {
+    'angry': 'anger',
+    'frustrated': 'anger',
+    'furious': 'anger',
+    'irritated': 'anger',
+    'disgusted': 'anger',
+    'upset': 'anger',
+    'livid': 'anger',
+    'mad': 'anger',
+    'confused': 'confusion',
+    'uncertain': 'confusion',
+    'puzzled': 'confusion',
+    'bewildered': 'confusion',
+    'unclear': 'confusion',
+    'happy': 'joy',
+    'joy': 'joy',
+    'grateful': 'joy',
+    'thrilled': 'joy',
+    'delighted': 'joy',
+    'pleased': 'joy',
+    'satisfied': 'joy',
+    'excellent': 'joy',
+    'amazing': 'joy',
+    'wonderful': 'joy',
+    'fantastic': 'joy',
+    'great': 'joy',
+    'outstanding': 'joy',
+    'neutral': 'neutral',
+    'unknown': 'neutral',
+    'informational': 'neutral'
+}
+
+# Narrower mapping used by the current-hour card
+CURRENT_HOUR_EMOTION_MAPPING = {
+    'angry': 'anger', 'frustrated': 'anger', 'upset': 'anger',
+    'confused': 'confusion', 'uncertain': 'confusion',
+    'happy': 'joy', 'joy': 'joy', 'satisfied': 'joy',
+}
+
+
+def empty_emotion_counts():
+    return {emotion: 0 for emotion in EMOTIONS}
+
+
+def count_emotions(labels, mapping, counts=None):
+    """
+    Count raw sentiment labels into the four dashboard emotions (unmapped labels are neutral).
+    With counts, labels[i] occurred counts[i] times (pre-aggregated input).
+    """
+    emotion_counts = empty_emotion_counts()
+    for index, label in enumerate(labels):
+        emotion = (label or DEFAULT_EMOTION).lower()
+        emotion_counts[mapping.get(emotion, DEFAULT_EMOTION)] += counts[index] if counts else 1
+    return emotion_counts
+
+
+def emotion_expression(mapping, field="$sentiment"):
+    """Aggregation expression evaluating to the dashboard emotion of field"""
+    labels = {}
+    for label, emotion in mapping.items():
+        if emotion != DEFAULT_EMOTION:
+            labels.setdefault(emotion, []).append(label)
+    return {"$let": {
+        "vars": {"label": {"$toLower": {"$ifNull": [field, ""]}}},
+        "in": {"$switch": {
+            "branches": [
+                {"case": {"$in": ["$$label", labels[emotion]]}, "then": emotion}
+                for emotion in EMOTIONS if emotion in labels
+            ],
+            "default": DEFAULT_EMOTION
+        }}
+    }}
@@ -1,13 +1,93 @@
 # historical_sentiment_routes.py
 from flask import Blueprint, jsonify, request
-from datetime import datetime, timedelta
-from database import get_database_manager
+from datetime import datetime, timedelta, timezone
+from database import get_database_manager, trends_timezone, utc_now
+from emotion_taxonomy import EMOTIONS, empty_emotion_counts
 from chat_ticket_sentiment_analyzer import analyze_chat_ticket_sentiment, get_detailed_sentiment
-from dateutil import parser as date_parser
+from classification_worker import get_classification_worker
+from chat_ticket_routes import get_chat_collection, get_ticket_collection
 import os
 
 historical_sentiment_bp = Blueprint("historical_sentiment", __name__)
 
+# Labels the classifier has not (usefully) assigned yet
+PENDING_LABELS = ["none", "unknown", "informational", ""]
+
+# Map to dashboard categories with fallback
+HISTORICAL_EMOTION_MAPPING = {
+    'angry': 'anger', 'frustrated': 'anger', 'furious': 'anger',
+    'irritated': 'anger', 'disgusted': 'anger', 'upset': 'anger',
+    'confused': 'confusion', 'uncertain': 'confusion',
+    'puzzled': 'confusion', 'bewildered': 'confusion',
+    'happy': 'joy', 'joy': 'joy', 'grateful': 'joy',
+    'thrilled': 'joy', 'delighted': 'joy', 'pleased': 'joy',
+    'satisfied': 'joy',
+    'neutral': 'neutral', 'unknown': 'neutral', 'informational': 'neutral'
+}
+
+
+def dashboard_category(sentiment):
+    """Dashboard category of a stored label, or None while it is pending classification"""
+    sentiment_lower = str(sentiment).lower() if sentiment else ""
+    if sentiment_lower in PENDING_LABELS:
+        return None
+    # First try direct match (new analyzer returns dashboard categories)
+    if sentiment_lower in EMOTIONS:
+        return sentiment_lower
+    # Fallback to emotion mapping (old analyzer or unexpected results)
+    return HISTORICAL_EMOTION_MAPPING.get(sentiment_lower, 'neutral')
+
+
+# resolution query value -> ($dateTrunc unit, binSize); bins divide the next larger unit evenly
+TREND_RESOLUTIONS = {
+    '5m': ('minute', 5), '15m': ('minute', 15), '30m': ('minute', 30),
+    'hour': ('hour', 1), '3h': ('hour', 3), '6h': ('hour', 6), '12h': ('hour', 12),
+    'day': ('day', 1), 'week': ('week', 1),
+}
+TREND_STEPS = {'minute': timedelta(minutes=1), 'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+HISTORICAL_TRENDS_MAX_BUCKETS = int(os.getenv('HISTORICAL_TRENDS_MAX_BUCKETS', '1000'))
+
+
+def parse_time_param(value, tz):
+    """ISO 8601 query value as naive UTC (naive input is local to tz), or None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid ISO 8601 time: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(value, unit, bin_size):
+    """Local start of the bucket containing an aware local datetime, as $dateTrunc computes it"""
+    if unit == 'minute':
+        return value.replace(minute=value.minute - value.minute % bin_size, second=0, microsecond=0)
+    if unit == 'hour':
+        return value.replace(hour=value.hour - value.hour % bin_size, minute=0, second=0, microsecond=0)
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday()) if unit == 'week' else day
+
+
+def bucket_grid(start_time, end_time, unit, bin_size, tz):
+    """Naive UTC start of every bucket overlapping [start_time, end_time), so empty buckets show as zeros"""
+    step = TREND_STEPS[unit] * bin_size
+    local = bucket_start(start_time.replace(tzinfo=timezone.utc).astimezone(tz), unit, bin_size)
+    end_local = end_time.replace(tzinfo=timezone.utc).astimezone(tz)
+    grid = []
+    while local < end_local:
+        if len(grid) >= HISTORICAL_TRENDS_MAX_BUCKETS:
+            raise ValueError(f"Range spans more than {HISTORICAL_TRENDS_MAX_BUCKETS} buckets, use a coarser resolution")
+        grid.append(local.astimezone(timezone.utc).replace(tzinfo=None))
+        # Days and weeks follow the wall clock across DST changes; shorter bins are fixed durations
+        if unit in ('day', 'week'):
+            local = local + step
+        else:
+            local = (local.astimezone(timezone.utc) + step).astimezone(tz)
+    return grid
+
 db_manager = None
 try:
     db_manager = get_database_manager()
@@ -25,8 +105,8 @@ def analyze_missing_sentiments():
     try:
         # Get collections
         try:
-            chat_coll = db_manager.db.get_collection('chat_messages')
-            tix_coll = db_manager.db.get_collection('tickets')
+            chat_coll = get_chat_collection()
+            tix_coll = get_ticket_collection()
             collections = [chat_coll, tix_coll]
         except Exception as e:
             print(f"❌ Error getting collections: {e}")
@@ -103,83 +183,19 @@ def historical_overview():
 
     try:
         # Get collections
-        chat_coll = db_manager.db.get_collection('chat_messages')
-        tix_coll = db_manager.db.get_collection('tickets')
+        chat_coll = get_chat_collection()
+        tix_coll = get_ticket_collection()
 
         if chat_coll is None or tix_coll is None:
             return jsonify({"error": "Collections not found"}), 500
 
-        def fetch_all(coll):
-            try:
-                return list(coll.find({}))
-            except Exception as e:
-                print(f"❌ Error fetching from {coll.name}: {e}")
-                return []
-
-        # Fetch all documents
-        chat_docs = fetch_all(chat_coll)
-        tix_docs = fetch_all(tix_coll)
-        all_docs = chat_docs + tix_docs
-
-        print(f"📊 Found {len(all_docs)} total documents ({len(chat_docs)} chats, {len(tix_docs)} tickets)")
-
-        # Count sentiments and classify missing ones
-        sentiment_counts = {}
-        classification_count = 0
-
-        for doc in all_docs:
-            try:
-                # Extract text
-                text = ""
-                if 'message' in doc:
-                    text = doc.get('message', '').strip()
-                elif 'description' in doc:
-                    subject = doc.get('subject', '').strip()
-                    description = doc.get('description', '').strip()
-                    text = f"{subject} {description}".strip()
-
-                if not text:
-                    continue
-
-                sentiment = doc.get("sentiment", "").lower() if doc.get("sentiment") else ""
-
-                # Classify if sentiment is missing or invalid
-                if not sentiment or sentiment in ["none", "unknown", "informational", ""]:
-                    print(f"🔍 Classifying text: '{text[:50]}...'")
-                    sentiment = analyze_chat_ticket_sentiment(text)
-                    print(f"✅ Classification result: {sentiment}")
-                    classification_count += 1
-
-                    # Update the document in database
-                    coll = chat_coll if 'message' in doc else tix_coll
-                    try:
-                        coll.update_one(
-                            {"_id": doc["_id"]},
-                            {"$set": {"sentiment": sentiment}}
-                        )
-                    except Exception as e:
-                        print(f"⚠️ Could not update document {doc['_id']}: {e}")
-
-                # Count the sentiment
-                sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
-
-            except Exception as e:
-                print(f"❌ Error processing document: {e}")
-                continue
-
-        print(f"🎯 Classified {classification_count} documents, sentiment counts: {sentiment_counts}")
-
-        # Map to dashboard categories with fallback
-        emotion_mapping = {
-            'angry': 'anger', 'frustrated': 'anger', 'furious': 'anger',
-            'irritated': 'anger', 'disgusted': 'anger', 'upset': 'anger',
-            'confused': 'confusion', 'uncertain': 'confusion',
-            'puzzled': 'confusion', 'bewildered': 'confusion',
-            'happy': 'joy', 'joy': 'joy', 'grateful': 'joy',
-            'thrilled': 'joy', 'delighted': 'joy', 'pleased': 'joy',
-            'satisfied': 'joy',
-            'neutral': 'neutral', 'unknown': 'neutral', 'informational': 'neutral'
-        }
+        # Count stored labels across both collections on the server; only one row per label comes back
+        pipeline = [
+            {"$project": {"_id": 0, "sentiment": 1}},
+            {"$unionWith": {"coll": tix_coll.name, "pipeline": [{"$project": {"_id": 0, "sentiment": 1}}]}},
+            {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}}
+        ]
+        label_counts = list(chat_coll.aggregate(pipeline))
 
         dashboard = {
             'anger': {'count': 0},
@@ -188,16 +204,16 @@ def historical_overview():
             'neutral': {'count': 0}
         }
 
-        for sentiment, count in sentiment_counts.items():
-            sentiment_lower = str(sentiment).lower()
-            
-            # First try direct match (new analyzer returns dashboard categories)
-            if sentiment_lower in dashboard:
-                dashboard[sentiment_lower]['count'] += count
+        # Unlabeled documents are still queued for classification and reported as pending
+        pending_count = 0
+        for row in label_counts:
+            category = dashboard_category(row["_id"])
+            if category is None:
+                pending_count += row["count"]
             else:
-                # Fallback to emotion mapping (old analyzer or unexpected results)
-                mapped = emotion_mapping.get(sentiment_lower, 'neutral')
-                dashboard[mapped]['count'] += count
+                dashboard[category]['count'] += row["count"]
+
+        print(f"🎯 Sentiment counts from {len(label_counts)} labels, {pending_count} pending classification")
 
         total = sum(v['count'] for v in dashboard.values())
         if total == 0:
@@ -207,7 +223,9 @@ def historical_overview():
             pct = round((dashboard[key]['count'] / total) * 100)
             dashboard[key]['percentage_text'] = f"{dashboard[key]['count']}/{total} ({pct}%)"
 
-        return jsonify(dashboard)
+        response = jsonify(dashboard)
+        response.headers['X-Pending-Classification'] = str(pending_count)
+        return response
 
     except Exception as e:
         print(f"❌ Error in historical_overview: {str(e)}")
@@ -216,123 +234,82 @@ def historical_overview():
 
 @historical_sentiment_bp.route('/api/historical/trends', methods=['GET'])
 def historical_trends():
-    """Hourly emotion trends using chat_messages and tickets"""
+    """
+    Emotion trends across chat_messages and tickets, bucketed on the server.
+    Query params: hours (default 12) or start/end (ISO 8601; naive values are in
+    TRENDS_TIMEZONE), and resolution (see TREND_RESOLUTIONS, default hour).
+    """
     if db_manager is None:
         return jsonify({"error": "Database connection not available"}), 500
 
     try:
+        tz, tz_name = trends_timezone()
+        resolution = request.args.get('resolution', 'hour')
         hours = request.args.get('hours', 12, type=int)
-        end_time = datetime.now()
-        start_time = end_time - timedelta(hours=hours)
+        try:
+            if resolution not in TREND_RESOLUTIONS:
+                raise ValueError(f"resolution must be one of {', '.join(TREND_RESOLUTIONS)}")
+            unit, bin_size = TREND_RESOLUTIONS[resolution]
+            end_time = parse_time_param(request.args.get('end'), tz) or utc_now()
+            start_time = parse_time_param(request.args.get('start'), tz) or end_time - timedelta(hours=hours)
+            if start_time >= end_time:
+                raise ValueError("start must be before end")
+            grid = bucket_grid(start_time, end_time, unit, bin_size, tz)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         # Get collections
-        chat_coll = db_manager.db.get_collection('chat_messages')
-        tix_coll = db_manager.db.get_collection('tickets')
+        chat_coll = get_chat_collection()
+        tix_coll = get_ticket_collection()
 
         if chat_coll is None or tix_coll is None:
             return jsonify({"error": "Collections not found"}), 500
 
-        def fetch_docs(coll):
-            try:
-                return list(coll.find({
-                    "timestamp": {
-                        "$gte": start_time,
-                        "$lt": end_time
-                    }
-                }))
-            except Exception as e:
-                print(f"❌ Error fetching time-based docs from {coll.name}: {e}")
-                return []
-
-        chat_docs = fetch_docs(chat_coll)
-        tix_docs = fetch_docs(tix_coll)
-        all_docs = chat_docs + tix_docs
-
-        print(f"📈 Found {len(all_docs)} documents in the last {hours} hours")
-
-        # Build hourly buckets
-        from collections import OrderedDict
-        buckets = OrderedDict()
-        cursor = start_time.replace(minute=0, second=0, microsecond=0)
-
-        while cursor <= end_time:
-            hour_key = cursor.strftime("%H:00")
-            buckets[hour_key] = {'anger': 0, 'confusion': 0, 'joy': 0, 'neutral': 0}
-            cursor += timedelta(hours=1)
-
-        # Map to dashboard categories with fallback
-        emotion_mapping = {
-            'angry': 'anger', 'frustrated': 'anger', 'furious': 'anger',
-            'irritated': 'anger', 'disgusted': 'anger', 'upset': 'anger',
-            'confused': 'confusion', 'uncertain': 'confusion',
-            'puzzled': 'confusion', 'bewildered': 'confusion',
-            'happy': 'joy', 'joy': 'joy', 'grateful': 'joy',
-            'thrilled': 'joy', 'delighted': 'joy', 'pleased': 'joy',
-            'satisfied': 'joy',
-            'neutral': 'neutral', 'unknown': 'neutral', 'informational': 'neutral'
-        }
-
-        for doc in all_docs:
-            try:
-                # Parse timestamp
-                ts = doc.get('timestamp')
-                if isinstance(ts, str):
-                    ts = date_parser.parse(ts)
-
-                if not isinstance(ts, datetime):
-                    continue
-
-                hour_key = ts.strftime("%H:00")
-                if hour_key not in buckets:
-                    continue
-
-                # Extract text
-                text = ""
-                if 'message' in doc:
-                    text = doc.get('message', '').strip()
-                elif 'description' in doc:
-                    subject = doc.get('subject', '').strip()
-                    description = doc.get('description', '').strip()
-                    text = f"{subject} {description}".strip()
-
-                if not text:
-                    continue
-
-                sentiment = doc.get("sentiment", "").lower() if doc.get("sentiment") else ""
-
-                # Classify if needed
-                if not sentiment or sentiment in ["none", "unknown", "informational", ""]:
-                    print(f"🔍 Classifying text for trends: '{text[:50]}...'")
-                    sentiment = analyze_chat_ticket_sentiment(text)
-                    print(f"✅ Trends classification result: {sentiment}")
-
-                    # Update the document
-                    coll = chat_coll if 'message' in doc else tix_coll
-                    try:
-                        coll.update_one(
-                            {"_id": doc["_id"]},
-                            {"$set": {"sentiment": sentiment}}
-                        )
-                    except Exception as e:
-                        print(f"⚠️ Could not update document {doc['_id']}: {e}")
-
-                # Map sentiment to dashboard category with fallback
-                sentiment_lower = str(sentiment).lower()
-                
-                # First try direct match (new analyzer returns dashboard categories)
-                if sentiment_lower in buckets[hour_key]:
-                    buckets[hour_key][sentiment_lower] += 1
-                else:
-                    # Fallback to emotion mapping (old analyzer or unexpected results)
-                    mapped = emotion_mapping.get(sentiment_lower, 'neutral')
-                    buckets[hour_key][mapped] += 1
-
-            except Exception as e:
-                print(f"❌ Error processing trend document: {e}")
+        # Both collections in one aggregation; one row per (bucket, stored label) comes back
+        branch = [
+            {"$match": {"timestamp": {"$gte": start_time, "$lt": end_time}}},
+            {"$project": {"_id": 0, "timestamp": 1, "sentiment": 1}}
+        ]
+        bucket = {"date": "$timestamp", "unit": unit, "binSize": bin_size, "timezone": tz_name}
+        if unit == 'week':
+            bucket["startOfWeek"] = "monday"
+        pipeline = branch + [
+            {"$unionWith": {"coll": tix_coll.name, "pipeline": branch}},
+            {"$group": {"_id": {"bucket": {"$dateTrunc": bucket}, "sentiment": "$sentiment"}, "count": {"$sum": 1}}}
+        ]
+        rows = list(chat_coll.aggregate(pipeline))
+
+        buckets = {start: empty_emotion_counts() for start in grid}
+        pending_count = 0
+        for row in rows:
+            category = dashboard_category(row["_id"]["sentiment"])
+            # Unlabeled documents are still queued for classification
+            if category is None:
+                pending_count += row["count"]
                 continue
-
-        trends_list = [{"time": k, **v} for k, v in buckets.items()]
-        return jsonify({"trends": trends_list, "time_range_hours": hours})
+            buckets.setdefault(row["_id"]["bucket"], empty_emotion_counts())[category] += row["count"]
+
+        print(f"📈 {sum(row['count'] for row in rows)} documents in {len(buckets)} {resolution} buckets")
+
+        if unit in ('day', 'week'):
+            label_format = "%Y-%m-%d"
+        else:
+            label_format = "%m-%d %H:%M" if end_time - start_time >= timedelta(hours=24) else "%H:%M"
+        trends_list = [
+            {"time": start.replace(tzinfo=timezone.utc).astimezone(tz).strftime(label_format),
+             "start": start.isoformat() + "Z", **counts}
+            for start, counts in sorted(buckets.items())
+        ]
+        response = jsonify({
+            "trends": trends_list,
+            "time_range_hours": round((end_time - start_time).total_seconds() / 3600, 2),
+            "resolution": resolution,
+            "start": start_time.isoformat() + "Z",
+            "end": end_time.isoformat() + "Z",
+            "pending_classification": pending_count
+        })
+        response.headers['X-Pending-Classification'] = str(pending_count)
+        return response
 
     except Exception as e:
         print(f"❌ Error in historical_trends: {str(e)}")
@@ -346,16 +323,16 @@ def debug_info():
         return jsonify({"status": "database_not_connected"})
 
     try:
-        chat_coll = db_manager.db.get_collection('chat_messages')
-        tix_coll = db_manager.db.get_collection('tickets')
+        chat_coll = get_chat_collection()
+        tix_coll = get_ticket_collection()
 
-        chat_count = chat_coll.count_documents({}) if chat_coll else 0
-        tix_count = tix_coll.count_documents({}) if tix_coll else 0
+        chat_count = chat_coll.count_documents({}) if chat_coll is not None else 0
+        tix_count = tix_coll.count_documents({}) if tix_coll is not None else 0
 
         # Count documents with different sentiment values
         sentiment_stats = {}
         for coll in [chat_coll, tix_coll]:
-            if coll:
+            if coll is not None:
                 pipeline = [
                     {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}}
                 ]
@@ -370,6 +347,7 @@ def debug_info():
             "tickets_count": tix_count,
             "total_documents": chat_count + tix_count,
             "sentiment_stats": sentiment_stats,
+            "classification_queue": get_classification_worker().get_stats(),
             "gemini_api_key_set": bool(os.getenv('GEMINI_API_KEY'))
         })
 
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Bulk importer for historical email archives (mbox files or directories of .eml files).
+
+Parses in a multiprocessing pool, classifies in batches (deduplicated through an
+in-process cache) and writes with unordered bulk inserts. Progress is checkpointed
+after every committed batch so an interrupted import resumes where it stopped.
+
+Usage:
+    python import_email_archive.py archive.mbox --user-id user_123
+    python import_email_archive.py exported_mail/ --user-id user_123 --workers 8 --batch-size 500
+"""
+
+import argparse
+import email
+import hashlib
+import json
+import mailbox
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email import policy
+from multiprocessing import Pool
+from bson import ObjectId
+from cachetools import LRUCache
+from dateutil import parser as date_parser
+from database import get_database_manager
+from gemini_emotion_classifier import classify_emotion_with_gemini, classify_emotion_by_keywords
+from ingest_email import clean_subject, extract_text_body
+
+
+def iter_archive(path):
+    """Yield (source_key, raw_bytes) for every message under path, in a stable order"""
+    if os.path.isdir(path):
+        eml_files = []
+        for root, _, files in os.walk(path):
+            eml_files.extend(os.path.join(root, name) for name in files if name.lower().endswith('.eml'))
+        source_key = os.path.abspath(path)
+        for file_path in sorted(eml_files):
+            with open(file_path, 'rb') as f:
+                yield source_key, f.read()
+    else:
+        source_key = os.path.abspath(path)
+        box = mailbox.mbox(path, create=False)
+        try:
+            for key in box.iterkeys():
+                yield source_key, box.get_bytes(key)
+        finally:
+            box.close()
+
+
+def parse_raw_email(raw_bytes):
+    """Parse and normalize one raw email (runs in a worker process); {"skipped": reason} for empty emails"""
+    try:
+        msg = email.message_from_bytes(raw_bytes, policy=policy.compat32)
+        subject = clean_subject(msg.get("Subject", ""))
+        sender = str(msg.get("From", ""))
+        message_id = str(msg.get("Message-ID", "")).strip()
+        body = extract_text_body(msg)
+        if not body.strip() and not subject.strip():
+            return {"skipped": "empty"}
+
+        try:
+            email_timestamp = date_parser.parse(msg.get("Date", ""))
+        except Exception:
+            email_timestamp = None
+
+        full_text = f"Subject: {subject}\n\n{body.strip()}"
+        fingerprint = hashlib.sha1((message_id or full_text).encode('utf-8', errors='ignore')).hexdigest()
+
+        return {
+            "message_id": message_id,
+            "fingerprint": fingerprint,
+            "timestamp": email_timestamp.isoformat() if email_timestamp else None,
+            "epoch_seconds": int(email_timestamp.timestamp()) if email_timestamp else 0,
+            "sender": sender,
+            "text": full_text
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def deterministic_object_id(epoch_seconds, fingerprint, user_id):
+    """ObjectId built from the email date and a content hash so re-imports hit duplicate keys"""
+    digest = hashlib.sha1(f"{user_id}:{fingerprint}".encode('utf-8')).digest()
+    seconds = max(0, min(epoch_seconds, 0xFFFFFFFF))
+    return ObjectId(struct.pack('>I', seconds) + digest[:8])
+
+
+class ArchiveImporter:
+    def __init__(self, user_id=None, email_account=None, batch_size=200, workers=None,
+                 classifier='gemini', classify_threads=8, checkpoint_path=None):
+        self.db_manager = get_database_manager()
+        self.user_id = user_id
+        self.email_account = email_account
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 2
+        self.classify = classify_emotion_with_gemini if classifier == 'gemini' else classify_emotion_by_keywords
+        self.classify_threads = classify_threads
+        self.checkpoint_path = checkpoint_path or '.import_checkpoint.json'
+        self.checkpoint = self._load_checkpoint()
+        self.cache = LRUCache(maxsize=50000)
+        self.stats = {"parsed": 0, "inserted": 0, "duplicates": 0, "skipped": 0, "errors": 0, "cache_hits": 0}
+
+    def _load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_checkpoint(self):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _classify_batch(self, parsed_emails):
+        """Classify a batch, calling the classifier once per distinct text"""
+        pending = {}
+        for parsed in parsed_emails:
+            key = hashlib.sha1(parsed["text"].encode('utf-8', errors='ignore')).hexdigest()
+            parsed["text_hash"] = key
+            if key in self.cache:
+                self.stats["cache_hits"] += 1
+            else:
+                pending.setdefault(key, parsed["text"])
+
+        if pending:
+            keys = list(pending.keys())
+            with ThreadPoolExecutor(max_workers=self.classify_threads) as executor:
+                for key, emotion in zip(keys, executor.map(self._safe_classify, [pending[k] for k in keys])):
+                    self.cache[key] = emotion
+
+        return [self.cache.get(parsed["text_hash"], 'neutral') for parsed in parsed_emails]
+
+    def _safe_classify(self, text):
+        try:
+            return self.classify(text)
+        except Exception as e:
+            print(f"⚠️ Classification failed, using keywords: {e}")
+            return classify_emotion_by_keywords(text)
+
+    def _flush(self, source_key, batch, position):
+        """Classify and insert one batch, then advance the checkpoint"""
+        emotions = self._classify_batch(batch)
+        documents = []
+        for parsed, emotion in zip(batch, emotions):
+            documents.append({
+                "_id": deterministic_object_id(parsed["epoch_seconds"], parsed["fingerprint"], self.user_id),
+                "id": f"email_import_{parsed['fingerprint'][:16]}",
+                "timestamp": parsed["timestamp"] or datetime.now().isoformat(),
+                "source": "email",
+                "sender": parsed["sender"],
+                "text": parsed["text"],
+                "emotion": emotion,
+                "sentiment": emotion,
+                "user_id": self.user_id,
+                "email_account": self.email_account,
+                "imported": True
+            })
+
+        inserted, duplicates = self.db_manager.insert_messages_bulk(documents)
+        self.stats["inserted"] += inserted
+        self.stats["duplicates"] += duplicates
+
+        self.checkpoint[source_key] = position
+        self._save_checkpoint()
+
+    def import_path(self, path):
+        source_key = os.path.abspath(path)
+        resume_from = self.checkpoint.get(source_key, 0)
+        if resume_from:
+            print(f"⏩ Resuming {path} after {resume_from} messages")
+
+        def raw_messages():
+            for index, (_, raw) in enumerate(iter_archive(path)):
+                if index < resume_from:
+                    continue
+                yield raw
+
+        position = resume_from
+        batch = []
+        started = time.time()
+
+        with Pool(processes=self.workers) as pool:
+            # imap keeps archive order so the checkpoint always marks a contiguous prefix
+            for parsed in pool.imap(parse_raw_email, raw_messages(), chunksize=32):
+                position += 1
+                if "error" in parsed:
+                    self.stats["errors"] += 1
+                    continue
+                if "skipped" in parsed:
+                    self.stats["skipped"] += 1
+                    continue
+
+                self.stats["parsed"] += 1
+                batch.append(parsed)
+
+                if len(batch) >= self.batch_size:
+                    self._flush(source_key, batch, position)
+                    batch = []
+                    rate = (position - resume_from) / max(time.time() - started, 0.001)
+                    print(f"📨 {path}: {position} messages ({rate:.0f}/s), {self.stats['inserted']} inserted")
+
+            if batch:
+                self._flush(source_key, batch, position)
+            else:
+                self.checkpoint[source_key] = position
+                self._save_checkpoint()
+
+        print(f"✅ Finished {path}: {position} messages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import historical email archives into the messages collection")
+    parser.add_argument('paths', nargs='+', help="mbox files or directories containing .eml files")
+    parser.add_argument('--user-id', help="Associate imported messages with this user")
+    parser.add_argument('--email-account', help="Email account the archive belongs to")
+    parser.add_argument('--batch-size', type=int, default=200, help="Messages per classify/insert batch")
+    parser.add_argument('--workers', type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument('--classifier', choices=['gemini', 'keyword'], default='gemini',
+                        help="Gemini with keyword fallback, or keyword-only for fast offline imports")
+    parser.add_argument('--classify-threads', type=int, default=8, help="Concurrent classifier calls per batch")
+    parser.add_argument('--checkpoint', default='.import_checkpoint.json', help="Checkpoint file for resuming")
+    args = parser.parse_args()
+
+    importer = ArchiveImporter(
+        user_id=args.user_id,
+        email_account=args.email_account,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        classifier=args.classifier,
+        classify_threads=args.classify_threads,
+        checkpoint_path=args.checkpoint
+    )
+
+    for path in args.paths:
+        importer.import_path(path)
+
+    print(f"📊 Import summary: {importer.stats}")
+
+
+if __name__ == "__main__":
+    main()
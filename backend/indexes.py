@@ -0,0 +1,97 @@
+# indexes.py
+# Declarative index specification, one entry per collection.
+# Each index matches a query shape issued by DatabaseManager; bump INDEX_SPEC_VERSION
+# whenever INDEX_SPECS changes so the index migration is re-applied once.
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+INDEX_SPEC_VERSION = 7
+INDEX_MIGRATION_VERSION = f"indexes_v{INDEX_SPEC_VERSION}"
+# TTL indexes are configured at runtime by retention.py and left alone here
+TTL_INDEX_PREFIX = "ttl_"
+
+INDEX_SPECS = {
+    "messages": [
+        # Keyset pages of get_all_messages, comparison window, current hour, daily/weekly analytics
+        IndexModel([("occurred_at", DESCENDING), ("_id", DESCENDING)], name="occurred_at_id"),
+        # Keyset pages of get_messages_by_source, /stats source counts
+        IndexModel([("source", ASCENDING), ("occurred_at", DESCENDING), ("_id", DESCENDING)], name="source_occurred_at_id"),
+        # Keyset pages of get_messages_by_sender
+        IndexModel([("sender", ASCENDING), ("occurred_at", DESCENDING), ("_id", DESCENDING)], name="sender_occurred_at_id"),
+        # Keyset pages of get_messages_by_sentiment / get_negative_sentiment_messages, sentiment stats
+        IndexModel([("sentiment", ASCENDING), ("occurred_at", DESCENDING), ("_id", DESCENDING)], name="sentiment_occurred_at_id"),
+        # get_sentiment_history(message_id)
+        IndexModel([("id", ASCENDING)], name="message_id"),
+        # hourly trends per user and per-user resets
+        IndexModel([("user_id", ASCENDING), ("occurred_at", DESCENDING)], name="user_occurred_at"),
+        IndexModel([("user_id", ASCENDING), ("source", ASCENDING), ("occurred_at", DESCENDING)], name="user_source_occurred_at"),
+        # epoch reaper: documents below a tenant's (or the global) reset floor
+        IndexModel([("user_id", ASCENDING), ("epoch", ASCENDING)], name="user_epoch"),
+        IndexModel([("epoch", ASCENDING)], name="epoch"),
+    ],
+    "message_bodies": [
+        # epoch reaper and retention archiver (bodies follow their message)
+        IndexModel([("user_id", ASCENDING), ("epoch", ASCENDING)], name="user_epoch"),
+        IndexModel([("epoch", ASCENDING)], name="epoch"),
+        IndexModel([("occurred_at", ASCENDING)], name="occurred_at"),
+    ],
+    "alerts": [
+        IndexModel([("message_id", ASCENDING)], name="message_id"),
+        # get_active_alerts
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+        # weekly analytics alert window
+        IndexModel([("created_at", DESCENDING)], name="created_at_desc"),
+    ],
+    "email_configs": [
+        # get_email_config(user_id) and save_email_config upsert
+        IndexModel([("user_id", ASCENDING), ("active", ASCENDING)], name="user_active"),
+        # get_all_email_configs and the global-config lookup
+        IndexModel([("active", ASCENDING)], name="active"),
+    ],
+    "sentiment_analytics": [
+        # get_analytics_by_period
+        IndexModel([("report_type", ASCENDING), ("created_at", DESCENDING)], name="report_type_created_at"),
+    ],
+    "sentiment_rollups": [
+        # $inc upsert key; hour-range reads (trends, comparison window, current hour)
+        IndexModel([("hour", ASCENDING), ("user_id", ASCENDING), ("source", ASCENDING), ("sentiment", ASCENDING)],
+                   name="rollup_key", unique=True),
+        # per-user trends and per-user resets
+        IndexModel([("user_id", ASCENDING), ("hour", ASCENDING)], name="user_hour"),
+    ],
+    "settings": [
+        IndexModel([("category", ASCENDING)], name="category"),
+    ],
+}
+
+# Collections in CHAT_TICKET_DATABASE_NAME; created by migration 0007 without dropping anything
+CHAT_TICKET_INDEX_SPECS = {
+    # /api/historical/trends: time-range match covered together with the label it groups by
+    "chat_messages": [
+        IndexModel([("timestamp", ASCENDING), ("sentiment", ASCENDING)], name="timestamp_sentiment"),
+    ],
+    "tickets": [
+        IndexModel([("timestamp", ASCENDING), ("sentiment", ASCENDING)], name="timestamp_sentiment"),
+    ],
+}
+
+
+def apply_index_specs(db, drop_undeclared=True, specs=None):
+    """Create every declared index and drop undeclared ones on managed collections"""
+    summary = {}
+    for collection_name, models in (specs or INDEX_SPECS).items():
+        collection = db[collection_name]
+        declared = {model.document["name"] for model in models}
+        existing = {index["name"] for index in collection.list_indexes()}
+
+        dropped = []
+        if drop_undeclared:
+            for name in existing - declared - {"_id_"}:
+                if name.startswith(TTL_INDEX_PREFIX):
+                    continue
+                collection.drop_index(name)
+                dropped.append(name)
+
+        created = collection.create_indexes(models) if models else []
+        summary[collection_name] = {"created": sorted(set(created) - existing), "dropped": dropped}
+        print(f"  ↳ {collection_name}: {len(declared)} indexes declared, dropped {dropped or 'none'}")
+    return summary
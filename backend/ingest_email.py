@@ -6,7 +6,7 @@ import time
 from datetime import datetime
 from dateutil import parser as date_parser
 from gemini_emotion_classifier import classify_emotion_with_gemini
-from database import get_database_manager
+from database import get_database_manager, POST_INSERT_PROCESSING
 from telegram_alert import send_telegram_alert
 
 def clean_subject(subject):
@@ -20,6 +20,28 @@ def clean_subject(subject):
     except Exception:
         return str(subject)
 
+def extract_text_body(msg):
+    """Return the first text/plain part of an email.message.Message"""
+    body = ""
+    if msg.is_multipart():
+        for part in msg.walk():
+            if part.get_content_type() == "text/plain":
+                try:
+                    payload = part.get_payload(decode=True)
+                    if payload:
+                        body = payload.decode(errors="ignore")
+                        break
+                except Exception:
+                    continue
+    else:
+        try:
+            payload = msg.get_payload(decode=True)
+            if payload:
+                body = payload.decode(errors="ignore")
+        except Exception:
+            body = ""
+    return body
+
 def get_email_config(user_id=None):
     """Get email configuration from database for specific user or globally"""
     try:
@@ -164,24 +186,7 @@ def fetch_and_forward_emails(specific_email=None, specific_password=None, user_i
                 date = msg.get("Date", "")
 
                 # Get message body
-                body = ""
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        if part.get_content_type() == "text/plain":
-                            try:
-                                payload = part.get_payload(decode=True)
-                                if payload:
-                                    body = payload.decode(errors="ignore")
-                                    break
-                            except Exception:
-                                continue
-                else:
-                    try:
-                        payload = msg.get_payload(decode=True)
-                        if payload:
-                            body = payload.decode(errors="ignore")
-                    except Exception:
-                        body = ""
+                body = extract_text_body(msg)
 
                 full_text = f"Subject: {subject}\n\n{body.strip()}"
 
@@ -204,7 +209,8 @@ def fetch_and_forward_emails(specific_email=None, specific_password=None, user_i
                     print(f"📊 Fallback classified emotion: {emotion}")
 
                 # Send Telegram alert for angry or frustrated emails
-                if emotion.lower() in ['angry', 'frustrated']:
+                # (the change-stream TelegramConsumer sends it when enabled)
+                if emotion.lower() in ['angry', 'frustrated'] and POST_INSERT_PROCESSING == 'inline':
                     alert_message = f"🚨 Alert: {emotion.title()} email detected!\nSubject: {subject}\nFrom: {sender}"
                     send_telegram_alert(alert_message)
 
@@ -0,0 +1,89 @@
+# json_provider.py
+# Flask JSON provider built on orjson. ObjectId is encoded as its hex string and
+# datetimes as ISO 8601 (naive datetimes are the UTC values pymongo returns), so
+# documents can be returned straight from the cursor without per-document fixups.
+#
+# Responses holding a large array (top level, or a top-level field such as
+# "messages") are streamed in chunks instead of being encoded into one buffer.
+import os
+import orjson
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from flask.json.provider import JSONProvider
+
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+STREAM_MIN_ITEMS = int(os.getenv('JSON_STREAM_MIN_ITEMS', '1000'))
+STREAM_CHUNK_ITEMS = int(os.getenv('JSON_STREAM_CHUNK_ITEMS', '500'))
+
+
+def _default(value):
+    """Types orjson does not encode natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+
+
+def _is_large_list(value):
+    return isinstance(value, list) and len(value) >= STREAM_MIN_ITEMS
+
+
+def _iter_list(items):
+    yield b"["
+    for start in range(0, len(items), STREAM_CHUNK_ITEMS):
+        if start:
+            yield b","
+        # Encode a slice as an array and drop its brackets
+        yield dumps_bytes(items[start:start + STREAM_CHUNK_ITEMS])[1:-1]
+    yield b"]"
+
+
+def iter_encode(obj):
+    """Encode obj as a sequence of byte chunks, splitting large arrays"""
+    if _is_large_list(obj):
+        yield from _iter_list(obj)
+        return
+    yield b"{"
+    for position, (key, value) in enumerate(obj.items()):
+        if position:
+            yield b","
+        yield dumps_bytes(str(key)) + b":"
+        if _is_large_list(value):
+            yield from _iter_list(value)
+        else:
+            yield dumps_bytes(value)
+    yield b"}"
+
+
+def should_stream(obj):
+    if _is_large_list(obj):
+        return True
+    return isinstance(obj, dict) and any(_is_large_list(value) for value in obj.values())
+
+
+class OrjsonProvider(JSONProvider):
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+
+        if should_stream(obj):
+            return self._app.response_class(iter_encode(obj), mimetype=self.mimetype)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
@@ -0,0 +1,35 @@
+# live_server.py
+# Standalone Socket.IO server for live dashboard updates (see live_updates.py).
+#
+# It runs as its own process so the API keeps its regular multi-worker gunicorn
+# setup; one worker with many threads serves the long-lived connections:
+#   gunicorn --workers 1 --threads 100 live_server:app
+# API workers and change_stream_consumers.py publish through
+# SOCKETIO_MESSAGE_QUEUE (Redis) and this process relays the events to the
+# connected dashboards. Nothing here touches the database.
+import os
+from dotenv import load_dotenv
+
+# Load environment variables before live_updates reads its settings
+load_dotenv()
+
+from flask import Flask, jsonify
+from live_updates import SOCKETIO_MESSAGE_QUEUE, get_live_updates, init_socketio
+
+app = Flask(__name__)
+socketio = init_socketio(app)
+
+if not SOCKETIO_MESSAGE_QUEUE:
+    print("⚠️ Warning: SOCKETIO_MESSAGE_QUEUE is not set, so events from the API workers will not reach this server")
+
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({"status": "healthy", "live_updates": get_live_updates().get_stats()}), 200
+
+
+if __name__ == '__main__':
+    host = os.getenv('FLASK_HOST', '0.0.0.0')
+    port = int(os.getenv('LIVE_UPDATES_PORT', '5001'))
+    print(f"📡 Starting live update server on {host}:{port}")
+    socketio.run(app, host=host, port=port, allow_unsafe_werkzeug=True)
@@ -0,0 +1,199 @@
+# live_updates.py
+# Push channel for live dashboard updates over Socket.IO.
+#
+# Right after ingest the storage layer publishes per-tenant deltas:
+#   message  - one stored message: id, source, sentiment and dashboard category
+#   buckets  - emotion count increments per UTC hour, to add to the trend chart
+#   alert    - a newly created negative-sentiment alert
+# Events for a message go only to the room of its user_id; there is no room that
+# receives every tenant. A client connects with a Clerk session token in its auth
+# payload (see clerk_auth.py) and joins the room of the user the token was signed
+# for; connections without a valid token are refused, as are `subscribe` events
+# whose token does not verify, so tenants never receive each other's events.
+# Browsers may connect only from SOCKETIO_CORS_ORIGINS.
+#
+# Only the WebSocket transport is served (use-live-updates.ts speaks the framing
+# over the browser's WebSocket). A client that is not connected keeps polling the
+# REST endpoints, whose ETags (see response_cache.py) keep idle polls cheap.
+# Processes that do not serve clients (API workers, change_stream_consumers.py,
+# scripts) only emit when SOCKETIO_MESSAGE_QUEUE points at a broker shared with
+# live_server.py; otherwise their events are dropped and dashboards catch up on
+# their next poll.
+import os
+import threading
+from collections import Counter, defaultdict
+from clerk_auth import AuthenticationError, verify_session_token
+from emotion_taxonomy import DEFAULT_EMOTION, TREND_EMOTION_MAPPING, count_emotions
+
+LIVE_UPDATES_ENABLED = os.getenv('LIVE_UPDATES_ENABLED', 'true').lower() == 'true'
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+# Comma-separated frontend origins; unset allows same-origin browsers only
+SOCKETIO_CORS_ORIGINS = [origin.strip() for origin in os.getenv('SOCKETIO_CORS_ORIGINS', '').split(',')
+                         if origin.strip()] or None
+if SOCKETIO_CORS_ORIGINS == ['*']:
+    SOCKETIO_CORS_ORIGINS = '*'
+# Bulk inserts send at most this many message events per tenant (bucket deltas cover all)
+LIVE_UPDATES_MAX_MESSAGES = int(os.getenv('LIVE_UPDATES_MAX_MESSAGES', '50'))
+
+
+def room(tenant):
+    return f"tenant:{tenant}"
+
+
+def _iso(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def message_event(message_data):
+    sentiment = message_data.get('sentiment')
+    return {
+        "_id": str(message_data.get('_id')),
+        "id": message_data.get('id'),
+        "user_id": message_data.get('user_id'),
+        "source": message_data.get('source'),
+        "sentiment": sentiment,
+        "category": TREND_EMOTION_MAPPING.get((sentiment or DEFAULT_EMOTION).lower(), DEFAULT_EMOTION),
+        "occurred_at": _iso(message_data.get('occurred_at')),
+    }
+
+
+def bucket_deltas(messages):
+    """[{hour, counts}] emotion increments per UTC hour for a batch of messages"""
+    labels = defaultdict(list)
+    for message_data in messages:
+        occurred_at = message_data.get('occurred_at')
+        if occurred_at is not None:
+            labels[occurred_at.replace(minute=0, second=0, microsecond=0)].append(message_data.get('sentiment'))
+    return [{"hour": _iso(hour), "counts": count_emotions(hour_labels, TREND_EMOTION_MAPPING)}
+            for hour, hour_labels in sorted(labels.items())]
+
+
+class LiveUpdates:
+    """Publishes deltas to tenant rooms; a no-op until a Socket.IO server or queue is available"""
+
+    def __init__(self):
+        self.socketio = None
+        self._lock = threading.Lock()
+        self._external_checked = False
+        self.stats = Counter()
+        self.clients = 0
+
+    def attach(self, socketio):
+        self.socketio = socketio
+
+    def _emitter(self):
+        if self.socketio is not None or not SOCKETIO_MESSAGE_QUEUE:
+            return self.socketio
+        with self._lock:
+            if not self._external_checked:
+                self._external_checked = True
+                try:
+                    from flask_socketio import SocketIO
+                    # Write-only emitter: events travel through the queue to the web workers
+                    self.socketio = SocketIO(message_queue=SOCKETIO_MESSAGE_QUEUE)
+                except Exception as e:
+                    print(f"⚠️ Warning: Live updates disabled, could not reach {SOCKETIO_MESSAGE_QUEUE}: {e}")
+        return self.socketio
+
+    def emit(self, event, payload, tenants):
+        """Send payload to the rooms of tenants; events without a tenant are not pushed"""
+        tenants = {tenant for tenant in tenants if tenant}
+        if not LIVE_UPDATES_ENABLED or not tenants:
+            return
+        socketio = self._emitter()
+        if socketio is None:
+            return
+        try:
+            for tenant in tenants:
+                socketio.emit(event, payload, to=room(tenant))
+            self.stats[event] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️ Warning: Could not publish {event} update: {e}")
+
+    def publish_messages(self, messages):
+        """Message and bucket events for newly stored messages, one batch per tenant"""
+        if not LIVE_UPDATES_ENABLED or not messages or self._emitter() is None:
+            return
+        by_tenant = defaultdict(list)
+        for message_data in messages:
+            by_tenant[message_data.get('user_id')].append(message_data)
+        for tenant, tenant_messages in by_tenant.items():
+            for message_data in tenant_messages[-LIVE_UPDATES_MAX_MESSAGES:]:
+                self.emit('message', message_event(message_data), [tenant])
+            self.emit('buckets', {"user_id": tenant, "buckets": bucket_deltas(tenant_messages),
+                                  "inserted": len(tenant_messages)}, [tenant])
+
+    def publish_alert(self, alert_data, user_id=None):
+        """Alert event for the tenant of the message that raised it"""
+        payload = {key: _iso(value) for key, value in alert_data.items() if key != '_id'}
+        if '_id' in alert_data:
+            payload['_id'] = str(alert_data['_id'])
+        payload['user_id'] = user_id
+        self.emit('alert', payload, [user_id])
+
+    def get_stats(self):
+        return {"enabled": LIVE_UPDATES_ENABLED and self.socketio is not None,
+                "message_queue": bool(SOCKETIO_MESSAGE_QUEUE), "clients": self.clients,
+                "published": dict(self.stats)}
+
+
+def init_socketio(app):
+    """Attach a Socket.IO server to app with authenticated tenant-room handlers"""
+    from flask_socketio import ConnectionRefusedError, SocketIO, emit, join_room, leave_room, rooms
+
+    # WebSocket only: the dashboards speak the framing directly, and without long-polling
+    # a session never spans requests, so several workers need no sticky sessions
+    socketio = SocketIO(app, cors_allowed_origins=SOCKETIO_CORS_ORIGINS, async_mode=SOCKETIO_ASYNC_MODE,
+                        message_queue=SOCKETIO_MESSAGE_QUEUE, transports=['websocket'])
+    live_updates = get_live_updates()
+    live_updates.attach(socketio)
+
+    def subscribe_to(tenant):
+        for joined in rooms():
+            if joined.startswith("tenant:"):
+                leave_room(joined)
+        join_room(room(tenant))
+        emit('subscribed', {"user_id": tenant})
+
+    def verified_tenant(data):
+        return verify_session_token(data.get('token') if isinstance(data, dict) else None)
+
+    @socketio.on('connect')
+    def on_connect(auth=None):
+        try:
+            tenant = verified_tenant(auth)
+        except AuthenticationError as e:
+            print(f"🔒 Refused live update connection: {e}")
+            raise ConnectionRefusedError('unauthorized')
+        with live_updates._lock:
+            live_updates.clients += 1
+        subscribe_to(tenant)
+
+    @socketio.on('disconnect')
+    def on_disconnect():
+        with live_updates._lock:
+            live_updates.clients -= 1
+
+    @socketio.on('subscribe')
+    def on_subscribe(data=None):
+        """Switch to the room of another signed-in user (e.g. after an account switch)"""
+        try:
+            subscribe_to(verified_tenant(data))
+        except AuthenticationError as e:
+            print(f"🔒 Refused live update subscription: {e}")
+            emit('subscribe_error', {"error": "unauthorized"})
+
+    return socketio
+
+
+# Global publisher instance
+live_updates = None
+
+def get_live_updates():
+    """Get or create the live update publisher"""
+    global live_updates
+    if live_updates is None:
+        live_updates = LiveUpdates()
+    return live_updates
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Versioned, resumable database migrations.
+
+Applied migrations are recorded in the `schema_migrations` collection. Data
+backfills walk the collection in _id order and checkpoint the last processed
+_id, so an interrupted run continues where it stopped.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --list     # show migration status
+"""
+
+import argparse
+from datetime import datetime
+from pymongo import UpdateOne
+from database import (get_database_manager, to_utc_datetime, utc_now, canonical_sentiment,
+                      HISTORY_VIEW, HISTORY_VIEW_PIPELINE)
+from indexes import CHAT_TICKET_INDEX_SPECS, INDEX_MIGRATION_VERSION, INDEX_SPEC_VERSION, apply_index_specs
+from body_store import BODY_STORE_THRESHOLD, detach_body
+from rollups import ROLLUPS_MIGRATION_VERSION, rebuild_rollups
+
+MIGRATIONS_COLLECTION = 'schema_migrations'
+
+# Ordered registry of (version, description, function)
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration function under a version id"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def backfill(db_manager, version, collection, query, build_update, projection=None, batch_size=1000, target=None):
+    """
+    Apply build_update(doc) -> update document (or None to skip) to every document
+    matching query, in _id order, checkpointing progress under the migration version.
+    With a target collection, build_update returns a write operation (e.g. UpdateOne)
+    to run against target instead.
+    """
+    state = db_manager.db[MIGRATIONS_COLLECTION]
+    checkpoint = state.find_one({"_id": version}) or {}
+    last_id = checkpoint.get('last_id')
+    processed = checkpoint.get('processed', 0)
+
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        docs = list(collection.find(batch_query, projection).sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+
+        operations = []
+        for doc in docs:
+            update = build_update(doc)
+            if update and target is not None:
+                operations.append(update)
+            elif update:
+                operations.append(UpdateOne({"_id": doc["_id"]}, update))
+        if operations:
+            (target if target is not None else collection).bulk_write(operations, ordered=False)
+
+        last_id = docs[-1]["_id"]
+        processed += len(docs)
+        state.update_one(
+            {"_id": version},
+            {"$set": {"status": "running", "last_id": last_id, "processed": processed,
+                      "updated_at": datetime.now().isoformat()}},
+            upsert=True
+        )
+        print(f"  ↳ {collection.name}: {processed} documents processed")
+
+    return processed
+
+
+@migration('0001_canonical_timestamp', "Backfill occurred_at (UTC datetime) and drop timestamp_parsed/timestamp_iso")
+def migrate_canonical_timestamp(db_manager):
+    def build_update(doc):
+        occurred_at = (
+            to_utc_datetime(doc.get('timestamp'))
+            or to_utc_datetime(doc.get('timestamp_iso'))
+            or to_utc_datetime(doc.get('created_at'))
+            or doc.get('timestamp_parsed')
+            or doc['_id'].generation_time.replace(tzinfo=None)
+        )
+        return {"$set": {"occurred_at": occurred_at}, "$unset": {"timestamp_parsed": "", "timestamp_iso": ""}}
+
+    return backfill(
+        db_manager, '0001_canonical_timestamp', db_manager.messages,
+        {"occurred_at": {"$exists": False}},
+        build_update,
+        projection={"timestamp": 1, "timestamp_iso": 1, "timestamp_parsed": 1, "created_at": 1}
+    )
+
+
+@migration('0002_canonical_sentiment', "Fill the canonical sentiment label from the legacy emotion field")
+def migrate_canonical_sentiment(db_manager):
+    def build_update(doc):
+        label = canonical_sentiment(doc)
+        if label == doc.get('sentiment'):
+            return None
+        return {"$set": {"sentiment": label}}
+
+    return backfill(
+        db_manager, '0002_canonical_sentiment', db_manager.messages,
+        {"$or": [{"sentiment": {"$exists": False}}, {"sentiment": None}, {"sentiment": {"$regex": "[A-Z]|^\\s|\\s$"}}]},
+        build_update,
+        projection={"sentiment": 1, "emotion": 1}
+    )
+
+
+@migration('0003_sentiment_history_view', "Move sentiment_history metadata onto messages and replace the collection with a view")
+def migrate_sentiment_history_view(db_manager):
+    legacy = db_manager.db['sentiment_history']
+
+    def build_update(doc):
+        if not doc.get('message_id'):
+            return None
+        classification = {
+            "classified_at": doc.get('timestamp') or doc.get('created_at'),
+            "model_version": doc.get('model_version'),
+            "confidence_score": doc.get('confidence_score'),
+            "processing_time_ms": doc.get('processing_time_ms'),
+        }
+        # The earliest history entry wins; messages classified since already carry metadata
+        return UpdateOne(
+            {"id": doc['message_id'], "classification": {"$exists": False}},
+            {"$set": {"classification": classification}}
+        )
+
+    processed = backfill(
+        db_manager, '0003_sentiment_history_view', legacy, {}, build_update,
+        projection={"message_id": 1, "timestamp": 1, "created_at": 1, "model_version": 1,
+                    "confidence_score": 1, "processing_time_ms": 1},
+        target=db_manager.messages
+    )
+
+    if HISTORY_VIEW not in db_manager.db.list_collection_names():
+        db_manager.db.command('create', HISTORY_VIEW, viewOn='messages', pipeline=HISTORY_VIEW_PIPELINE)
+    legacy.drop()
+    return processed
+
+
+@migration('0004_reset_epoch', "Stamp existing messages and analytics with reset epoch 0")
+def migrate_reset_epoch(db_manager):
+    processed = 0
+    for collection in (db_manager.messages, db_manager.analytics):
+        processed += backfill(
+            db_manager, f'0004_reset_epoch:{collection.name}', collection,
+            {"epoch": {"$exists": False}},
+            lambda doc: {"$set": {"epoch": 0}},
+            projection={"_id": 1}
+        )
+    return processed
+
+
+@migration('0005_split_message_bodies', f"Move message texts over {BODY_STORE_THRESHOLD} characters to message_bodies")
+def migrate_split_message_bodies(db_manager):
+    def build_update(doc):
+        body = detach_body(doc)
+        if not body:
+            return None
+        # Idempotent: a rerun after an interruption overwrites the same body
+        db_manager.bodies.replace_one({"_id": body["_id"]}, body, upsert=True)
+        return {"$set": {"text": doc["text"], "text_length": doc["text_length"], "body_ref": doc["body_ref"]}}
+
+    return backfill(
+        db_manager, '0005_split_message_bodies', db_manager.messages,
+        {"body_ref": {"$exists": False},
+         "$expr": {"$gt": [{"$strLenCP": {"$ifNull": ["$text", ""]}}, BODY_STORE_THRESHOLD]}},
+        build_update,
+        projection={"text": 1, "user_id": 1, "epoch": 1, "occurred_at": 1},
+        batch_size=200
+    )
+
+
+@migration(ROLLUPS_MIGRATION_VERSION, "Build hourly sentiment rollups from messages")
+def migrate_sentiment_rollups(db_manager):
+    return rebuild_rollups(db_manager)
+
+
+@migration('0007_chat_ticket_indexes', "Index chat_messages and tickets for historical trends")
+def migrate_chat_ticket_indexes(db_manager):
+    from chat_ticket_routes import get_chat_ticket_db
+    return apply_index_specs(get_chat_ticket_db(), drop_undeclared=False, specs=CHAT_TICKET_INDEX_SPECS)
+
+
+@migration(INDEX_MIGRATION_VERSION, f"Apply declarative index spec v{INDEX_SPEC_VERSION}")
+def migrate_indexes(db_manager):
+    return db_manager.create_indexes()
+
+
+def get_migration_status(db_manager):
+    return {doc["_id"]: doc for doc in db_manager.db[MIGRATIONS_COLLECTION].find()}
+
+
+def run_migrations(db_manager=None):
+    """Apply every registered migration that has not completed yet"""
+    db_manager = db_manager or get_database_manager()
+    status = get_migration_status(db_manager)
+    applied = 0
+
+    for version, description, func in MIGRATIONS:
+        if status.get(version, {}).get('status') == 'applied':
+            continue
+        print(f"🔧 Applying migration {version}: {description}")
+        started = utc_now()
+        result = func(db_manager)
+        db_manager.db[MIGRATIONS_COLLECTION].update_one(
+            {"_id": version},
+            {"$set": {"status": "applied", "description": description, "result": result,
+                      "started_at": started, "applied_at": utc_now()}},
+            upsert=True
+        )
+        applied += 1
+        print(f"✅ Migration {version} applied")
+
+    if not applied:
+        print("✅ Database schema is up to date")
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument('--list', action='store_true', help="Show migration status and exit")
+    args = parser.parse_args()
+
+    db_manager = get_database_manager()
+    if args.list:
+        status = get_migration_status(db_manager)
+        for version, description, _ in MIGRATIONS:
+            print(f"{status.get(version, {}).get('status', 'pending'):>8}  {version}  {description}")
+        return
+
+    run_migrations(db_manager)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# mongo_connection.py
+# Process-wide MongoClient registry shared by the app, blueprints and scripts.
+# Each connection profile gets its own client and pool: 'default' serves the
+# write path, 'analytics' serves dashboard aggregations from secondaries so a
+# heavy report cannot starve message inserts of connections.
+import os
+import threading
+from pymongo import MongoClient, monitoring
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Track connection pool activity per server address"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pools = {}
+
+    def _pool(self, address):
+        key = f"{address[0]}:{address[1]}"
+        if key not in self.pools:
+            self.pools[key] = {
+                "open": 0, "checked_out": 0, "created": 0, "closed": 0,
+                "checkout_failures": 0, "cleared": 0
+            }
+        return self.pools[key]
+
+    def _update(self, address, **changes):
+        with self._lock:
+            pool = self._pool(address)
+            for field, delta in changes.items():
+                pool[field] += delta
+
+    def pool_created(self, event):
+        self._update(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event.address, open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1, closed=1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._update(event.address, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._update(event.address, checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, checked_out=-1)
+
+    def snapshot(self):
+        with self._lock:
+            return {address: dict(stats) for address, stats in self.pools.items()}
+
+
+PROFILES = ('default', 'analytics')
+
+
+def get_client_options(profile='default'):
+    """Connection pool options from the environment for a connection profile"""
+    options = {
+        "maxPoolSize": int(os.getenv('MONGO_MAX_POOL_SIZE', '50')),
+        "minPoolSize": int(os.getenv('MONGO_MIN_POOL_SIZE', '0')),
+        "maxIdleTimeMS": int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '300000')),
+        "waitQueueTimeoutMS": int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+        "serverSelectionTimeoutMS": int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        "connectTimeoutMS": int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '10000')),
+    }
+    compressors = os.getenv('MONGO_COMPRESSORS', 'zlib').strip()
+    if compressors:
+        options["compressors"] = compressors
+    if profile == 'analytics':
+        options.update({
+            "maxPoolSize": int(os.getenv('MONGO_ANALYTICS_MAX_POOL_SIZE', '10')),
+            # Fail fast when every analytics connection is busy
+            "waitQueueTimeoutMS": int(os.getenv('MONGO_ANALYTICS_WAIT_QUEUE_TIMEOUT_MS', '1000')),
+            "readPreference": os.getenv('MONGO_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred'),
+        })
+    elif profile != 'default':
+        raise ValueError(f"Unknown connection profile: {profile}")
+    return options
+
+
+# Registry state: clients are only valid in the process that created them
+_lock = threading.Lock()
+_clients = {}  # (uri, profile) -> MongoClient
+_pid = os.getpid()
+pool_stats = {profile: PoolStatsListener() for profile in PROFILES}
+
+
+def _reset_after_fork():
+    """Drop inherited clients in a forked child; MongoClient is not fork-safe"""
+    global _clients, _pid, pool_stats, _lock
+    _lock = threading.Lock()
+    _clients = {}
+    _pid = os.getpid()
+    pool_stats = {profile: PoolStatsListener() for profile in PROFILES}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_mongo_client(uri=None, profile='default'):
+    """Get the shared MongoClient for a URI and profile, creating it on first use in this process"""
+    uri = uri or os.getenv('MONGODB_URI')
+    if not uri:
+        raise ValueError("MONGODB_URI not found in environment variables")
+
+    if _pid != os.getpid():
+        # Fork happened without register_at_fork support
+        _reset_after_fork()
+
+    key = (uri, profile)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                options = get_client_options(profile)
+                client = MongoClient(uri, event_listeners=[pool_stats[profile]], **options)
+                _clients[key] = client
+    return client
+
+
+def get_database(name=None, uri=None, profile='default'):
+    """Get a database handle from the shared client"""
+    name = name or os.getenv('DATABASE_NAME', 'sentiment_sentinel')
+    return get_mongo_client(uri, profile)[name]
+
+
+def get_pool_stats(profile='default'):
+    """Pool configuration and live connection counts for this process"""
+    options = get_client_options(profile)
+    return {
+        "pid": os.getpid(),
+        "clients": sum(1 for _, client_profile in _clients if client_profile == profile),
+        "max_pool_size": options["maxPoolSize"],
+        "min_pool_size": options["minPoolSize"],
+        "wait_queue_timeout_ms": options["waitQueueTimeoutMS"],
+        "read_preference": options.get("readPreference", "primary"),
+        "compressors": options.get("compressors", ""),
+        "servers": pool_stats[profile].snapshot()
+    }
+
+
+def close_all_clients():
+    """Close every client created by this process"""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,151 @@
+# query_plan_check.py
+# Test mode (DB_EXPLAIN_CHECK=true): every DatabaseManager query is explained before it
+# runs and a winning plan containing COLLSCAN is reported as a failure.
+#
+# A filterless, unsorted read (e.g. a full-collection $group) is an intentional scan
+# and is allowed; anything with a filter or a sort must be served by an index.
+
+
+class CollectionScanError(AssertionError):
+    """Raised when a filtered or sorted query would scan the whole collection"""
+
+
+def find_stages(plan, stage_name):
+    """Recursively collect plan stages with the given name from explain() output"""
+    found = []
+    if isinstance(plan, dict):
+        if plan.get('stage') == stage_name:
+            found.append(plan)
+        for value in plan.values():
+            found.extend(find_stages(value, stage_name))
+    elif isinstance(plan, list):
+        for item in plan:
+            found.extend(find_stages(item, stage_name))
+    return found
+
+
+def winning_plans(explain_output):
+    """Winning plans from a find explain or from each $cursor stage of an aggregate explain"""
+    plans = []
+    if isinstance(explain_output, dict):
+        for key, value in explain_output.items():
+            if key == 'winningPlan':
+                plans.append(value)
+            else:
+                plans.extend(winning_plans(value))
+    elif isinstance(explain_output, list):
+        for item in explain_output:
+            plans.extend(winning_plans(item))
+    return plans
+
+
+class QueryPlanChecker:
+    def __init__(self, raise_on_scan=True):
+        self.raise_on_scan = raise_on_scan
+        self.checked = []
+        self.violations = []
+
+    def check(self, label, explain_output, intentional_scan=False):
+        scans = [stage for plan in winning_plans(explain_output) for stage in find_stages(plan, 'COLLSCAN')]
+        self.checked.append(label)
+        if scans and not intentional_scan:
+            self.violations.append(label)
+            message = f"COLLSCAN in query plan: {label}"
+            print(f"❌ {message}")
+            if self.raise_on_scan:
+                raise CollectionScanError(message)
+        return not scans or intentional_scan
+
+
+class CheckedCursor:
+    """Wraps a pymongo Cursor; explains the final query shape on first iteration"""
+
+    def __init__(self, cursor, checker, label, filter_doc):
+        self._cursor = cursor
+        self._checker = checker
+        self._label = label
+        self._filter = filter_doc or {}
+        self._sorted = False
+        self._explained = False
+
+    def sort(self, *args, **kwargs):
+        self._sorted = True
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, *args, **kwargs):
+        self._cursor = self._cursor.skip(*args, **kwargs)
+        return self
+
+    def limit(self, *args, **kwargs):
+        self._cursor = self._cursor.limit(*args, **kwargs)
+        return self
+
+    def max_time_ms(self, *args, **kwargs):
+        self._cursor = self._cursor.max_time_ms(*args, **kwargs)
+        return self
+
+    def _explain(self):
+        if not self._explained:
+            self._explained = True
+            intentional = not self._filter and not self._sorted
+            self._checker.check(f"{self._label} {self._filter}", self._cursor.clone().explain(), intentional)
+
+    def __iter__(self):
+        self._explain()
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CheckedCollection:
+    """Collection proxy that explains find/find_one/aggregate/count_documents calls"""
+
+    def __init__(self, collection, checker):
+        self._collection = collection
+        self._checker = checker
+
+    def find(self, filter=None, *args, **kwargs):
+        return CheckedCursor(self._collection.find(filter, *args, **kwargs), self._checker,
+                             f"{self._collection.name}.find", filter)
+
+    def find_one(self, filter=None, *args, **kwargs):
+        cursor = self.find(filter, *args, **kwargs).limit(1)
+        for doc in cursor:
+            return doc
+        return None
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        explain_output = self._collection.database.command(
+            'explain', {'aggregate': self._collection.name, 'pipeline': pipeline, 'cursor': {}},
+            verbosity='queryPlanner'
+        )
+        first_stage = next(iter(pipeline[0])) if pipeline else None
+        intentional = first_stage not in ('$match', '$sort')
+        self._checker.check(f"{self._collection.name}.aggregate {pipeline[:1]}", explain_output, intentional)
+        return self._collection.aggregate(pipeline, *args, **kwargs)
+
+    def count_documents(self, filter, *args, **kwargs):
+        if filter:
+            self._checker.check(f"{self._collection.name}.count_documents {filter}",
+                                self._collection.find(filter).explain())
+        return self._collection.count_documents(filter, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+CHECKED_COLLECTIONS = ['messages', 'messages_analytics', 'alerts', 'analytics', 'settings', 'email_configs',
+                       'rollups', 'rollups_analytics']
+
+
+def enable_explain_check(db_manager, raise_on_scan=True):
+    """Wrap the DatabaseManager collection handles with explain-checking proxies"""
+    checker = QueryPlanChecker(raise_on_scan=raise_on_scan)
+    for attribute in CHECKED_COLLECTIONS:
+        setattr(db_manager, attribute, CheckedCollection(getattr(db_manager, attribute), checker))
+    db_manager.collection = db_manager.messages
+    db_manager.query_plan_checker = checker
+    print("🔬 Query plan check enabled: COLLSCAN will fail queries")
+    return checker
@@ -0,0 +1,132 @@
+# repository.py
+# Storage interface shared by the MongoDB DatabaseManager and the embedded
+# SQLite backend. Routes only call these methods, so either backend can serve them.
+# Documents are plain dicts in both backends: `_id` is an ObjectId and
+# `occurred_at` a naive UTC datetime, as pymongo returns them.
+from abc import ABC, abstractmethod
+
+
+class SentimentRepository(ABC):
+    """Storage operations used by the API and the ingestion scripts"""
+
+    # -- messages --------------------------------------------------------------
+
+    @abstractmethod
+    def insert_message(self, message_data):
+        """Insert one message (alerts created inline); returns its id as a string"""
+
+    @abstractmethod
+    def insert_messages_bulk(self, messages):
+        """Insert many messages without alerts; returns (inserted_count, duplicate_count)"""
+
+    @abstractmethod
+    def reclassify_message(self, message_id, sentiment, confidence_score=None):
+        """Replace a message's sentiment label; returns False if the message does not exist"""
+
+    @abstractmethod
+    def get_all_messages(self, limit=None, skip=None, sort_by="occurred_at", sort_order=-1, projection=None, after=None):
+        pass
+
+    @abstractmethod
+    def get_message_body(self, message_id):
+        """Full text of a message, or None if it does not exist"""
+
+    @abstractmethod
+    def get_message_count(self):
+        pass
+
+    @abstractmethod
+    def get_messages_by_source(self, source, limit=None, projection=None, after=None):
+        pass
+
+    @abstractmethod
+    def get_messages_by_sender(self, sender, limit=None, projection=None, after=None):
+        pass
+
+    @abstractmethod
+    def get_messages_by_sentiment(self, sentiment, limit=None, projection=None, after=None):
+        pass
+
+    @abstractmethod
+    def get_negative_sentiment_messages(self, limit=None, projection=None, after=None):
+        pass
+
+    # -- dashboard analytics ---------------------------------------------------
+
+    @abstractmethod
+    def get_sentiment_stats(self):
+        """{sentiment label: count}"""
+
+    @abstractmethod
+    def get_sentiment_stats_comparison(self, hours_ago=24):
+        """{sentiment label: count} for messages older than hours_ago"""
+
+    @abstractmethod
+    def get_hourly_emotion_trends(self, hours=6, user_id=None):
+        """{"HH:MM" local bucket: {anger, confusion, joy, neutral}}"""
+
+    @abstractmethod
+    def get_current_hour_stats(self):
+        """{anger, confusion, joy, neutral} for the current UTC hour"""
+
+    @abstractmethod
+    def get_dashboard_summary(self, recent_limit=10, negative_limit=5, projection=None):
+        """{total_messages, by_source, by_sentiment, recent_messages, negative_alerts}"""
+
+    # -- alerts, settings, reports ---------------------------------------------
+
+    @abstractmethod
+    def get_active_alerts(self, limit=None, projection=None):
+        pass
+
+    @abstractmethod
+    def get_settings(self, category=None):
+        pass
+
+    @abstractmethod
+    def generate_weekly_analytics(self, week_start_date=None):
+        pass
+
+    @abstractmethod
+    def generate_daily_analytics(self, target_date=None):
+        pass
+
+    @abstractmethod
+    def get_analytics_by_period(self, report_type="weekly", limit=10):
+        pass
+
+    @abstractmethod
+    def get_sentiment_history(self, limit=None, message_id=None, projection=None):
+        pass
+
+    @abstractmethod
+    def reset_tenant_data(self, user_id=None):
+        pass
+
+    # -- cache invalidation ----------------------------------------------------
+
+    @abstractmethod
+    def bump_data_version(self, user_ids=None):
+        """Mark data of these tenants (and global aggregates) as changed"""
+
+    @abstractmethod
+    def get_data_version(self, user_id=None):
+        """Hashable version that changes whenever data visible to user_id (or everyone) changes"""
+
+    # -- email configuration ---------------------------------------------------
+
+    @abstractmethod
+    def save_email_config(self, config_data, user_id=None):
+        pass
+
+    @abstractmethod
+    def get_email_config(self, user_id=None):
+        pass
+
+    @abstractmethod
+    def get_all_email_configs(self):
+        pass
+
+    @abstractmethod
+    def close_connection(self):
+        pass
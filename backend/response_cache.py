@@ -0,0 +1,147 @@
+# response_cache.py
+# In-process cache of serialized JSON responses for the polled dashboard endpoints.
+#
+# Entries are keyed by endpoint name, query parameters and tenant, and tagged
+# with the data version (data_versions.py) read before the response was
+# computed. A lookup is a hit only while the current version still matches, so
+# writes invalidate without any explicit purge; RESPONSE_CACHE_TTL_SECONDS
+# bounds how long time-dependent responses (trend buckets, current hour) live.
+#
+# Endpoints decorated with etag=True also answer conditional requests: the ETag
+# is a hash of the cache key, data version and current TTL window, so a matching
+# If-None-Match gets 304 Not Modified without running the view or serializing
+# anything, and no 304 outlives RESPONSE_CACHE_TTL_SECONDS. Without a
+# data version the ETag falls back to a hash of the body.
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, make_response, request
+
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '300'))
+
+
+class ResponseCache:
+    """Bounded LRU of (version, body, mimetype, expires) entries"""
+
+    def __init__(self, max_entries=None, ttl_seconds=None):
+        self.max_entries = max_entries or RESPONSE_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or RESPONSE_CACHE_TTL_SECONDS
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "not_modified": 0}
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if entry[0] != version or entry[3] < time.monotonic():
+                del self.entries[key]
+                self.stats["stale"] += 1
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def set(self, key, version, body, mimetype):
+        with self._lock:
+            self.entries[key] = (version, body, mimetype, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def count_not_modified(self):
+        with self._lock:
+            self.stats["not_modified"] += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "entries": len(self.entries), "max_entries": self.max_entries,
+                "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else None}
+
+
+def version_etag(key, version):
+    """Strong ETag for a cache key computed under a data version within the current TTL window"""
+    window = int(time.time() // RESPONSE_CACHE_TTL_SECONDS)
+    return hashlib.sha1(repr((key, version, window)).encode()).hexdigest()
+
+
+def _body_etag(response):
+    """Fall back to hashing the body; answers 304 itself when the client's copy matches"""
+    if response.status_code == 200 and not response.is_streamed:
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        response.make_conditional(request)
+    return response
+
+
+def cached_response(name, version_func, tenant_arg='user_id', vary=None, etag=False):
+    """
+    Serve a view from the cache while version_func(tenant) is unchanged.
+    vary() adds a key component for responses that also depend on the clock.
+    Only 200 GET responses that are not streamed are stored; version_func returning
+    None (e.g. no database) bypasses the cache. With etag=True, responses carry an
+    ETag and matching If-None-Match requests get 304 Not Modified.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            tenant = request.args.get(tenant_arg)
+            version = version_func(tenant)
+            if version is None:
+                response = make_response(view(*args, **kwargs))
+                return _body_etag(response) if etag else response
+
+            cache = get_response_cache()
+            key = (name, tenant, tuple(sorted(request.args.items(multi=True))), tuple(sorted(kwargs.items())),
+                   vary() if vary else None)
+            tag = version_etag(key, version) if etag else None
+            if tag and tag in request.if_none_match:
+                cache.count_not_modified()
+                response = current_app.response_class(status=304)
+                response.set_etag(tag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+
+            entry = cache.get(key, version) if RESPONSE_CACHE_ENABLED else None
+            if entry:
+                response = current_app.response_class(entry[1], mimetype=entry[2])
+                response.headers['X-Cache'] = 'HIT'
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return _body_etag(response) if etag else response
+                if RESPONSE_CACHE_ENABLED:
+                    cache.set(key, version, response.get_data(), response.mimetype)
+                    response.headers['X-Cache'] = 'MISS'
+            if tag:
+                response.set_etag(tag)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+# Global cache instance
+response_cache = None
+
+def get_response_cache():
+    """Get or create the response cache"""
+    global response_cache
+    if response_cache is None:
+        response_cache = ResponseCache()
+    return response_cache
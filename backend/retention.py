@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Per-collection retention: archive expired documents to compressed JSONL, then let
+a TTL index delete them.
+
+Documents older than the collection's retention period are streamed to
+date-partitioned files under ARCHIVE_DIR (<collection>/<YYYY>/<MM>/<YYYY-MM-DD>.jsonl.gz)
+and stamped with `archived_at`. The TTL index on `archived_at` removes them after
+ARCHIVE_DELETE_GRACE_HOURS, so nothing is deleted that has not been archived first.
+A crash between writing and stamping only means a document is archived twice;
+restore skips duplicates.
+
+Archived messages are subtracted from sentiment_rollups before they are stamped,
+so dashboard counts follow the data that is kept (messages already hidden by a
+reset are not counted there and are skipped). Each message is first claimed by
+setting `rollup_removed`, and only messages this run claimed are subtracted, so
+a rerun after a crash never subtracts a message twice. A crash between the claim
+and the subtraction leaves that batch counted until `python rollups.py rebuild`,
+which skips claimed messages.
+
+Retention is off (documents kept forever) for any collection whose
+RETENTION_<COLLECTION>_DAYS is 0, the default.
+
+Usage:
+    python retention.py archive                     # archive expired docs, apply TTL indexes
+    python retention.py status                      # show policies and pending counts
+    python retention.py restore messages --from 2024-01-01 --to 2024-02-01
+    python retention.py restore alerts --target alerts   # back into the live collection
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import uuid
+from datetime import datetime, timedelta
+from bson.json_util import dumps, loads
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import BulkWriteError
+from database import get_database_manager, utc_now
+from indexes import TTL_INDEX_PREFIX
+from data_versions import DataVersions
+from rollups import ROLLUPS_COLLECTION, SENTIMENT_ROLLUPS, apply_rollups
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', './archive')
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '1000'))
+ARCHIVE_DELETE_GRACE_HOURS = int(os.getenv('ARCHIVE_DELETE_GRACE_HOURS', '24'))
+TTL_INDEX_NAME = f"{TTL_INDEX_PREFIX}archived_at"
+
+# Time field that ages each collection. occurred_at is a UTC datetime; alerts and
+# analytics keep created_at as a local-time ISO string, which sorts chronologically.
+RETENTION_POLICIES = {
+    "messages": {"field": "occurred_at", "utc_datetime": True},
+    "message_bodies": {"field": "occurred_at", "utc_datetime": True, "days_from": "messages"},
+    "alerts": {"field": "created_at", "utc_datetime": False},
+    "sentiment_analytics": {"field": "created_at", "utc_datetime": False},
+}
+# sentiment_history is a view over messages and follows the messages policy
+
+
+def retention_days(collection_name):
+    policy = RETENTION_POLICIES.get(collection_name, {})
+    name = policy.get("days_from", collection_name)
+    return int(os.getenv(f"RETENTION_{name.upper()}_DAYS", '0'))
+
+
+def archive_cutoff(collection_name, now=None):
+    """Documents whose time field is below this value are expired"""
+    days = retention_days(collection_name)
+    if days <= 0:
+        return None
+    if RETENTION_POLICIES[collection_name]["utc_datetime"]:
+        return (now or utc_now()) - timedelta(days=days)
+    return ((now or datetime.now()) - timedelta(days=days)).isoformat()
+
+
+def partition_key(value):
+    """YYYY-MM-DD of a datetime or ISO string time field"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, str) and len(value) >= 10:
+        return value[:10]
+    return 'undated'
+
+
+def partition_path(collection_name, day, archive_dir=None):
+    year, month = (day[:4], day[5:7]) if day != 'undated' else ('undated', 'undated')
+    return os.path.join(archive_dir or ARCHIVE_DIR, collection_name, year, month, f"{day}.jsonl.gz")
+
+
+def apply_ttl_indexes(db):
+    """Create, update (collMod) or drop the archived_at TTL index to match the policies"""
+    expire_after = ARCHIVE_DELETE_GRACE_HOURS * 3600
+    for collection_name in RETENTION_POLICIES:
+        collection = db[collection_name]
+        existing = {index["name"]: index for index in collection.list_indexes()}
+        current = existing.get(TTL_INDEX_NAME)
+
+        if retention_days(collection_name) <= 0:
+            if current:
+                collection.drop_index(TTL_INDEX_NAME)
+                print(f"  ↳ {collection_name}: retention off, TTL index dropped")
+            continue
+
+        if current is None:
+            collection.create_indexes([
+                IndexModel([("archived_at", ASCENDING)], name=TTL_INDEX_NAME, expireAfterSeconds=expire_after)
+            ])
+        elif current.get("expireAfterSeconds") != expire_after:
+            db.command('collMod', collection_name,
+                       index={"name": TTL_INDEX_NAME, "expireAfterSeconds": expire_after})
+        print(f"  ↳ {collection_name}: keep {retention_days(collection_name)} days, "
+              f"delete {ARCHIVE_DELETE_GRACE_HOURS}h after archiving")
+
+
+class Archiver:
+    """Streams expired documents into gzip JSONL partitions and stamps them archived"""
+
+    def __init__(self, db, archive_dir=None, batch_size=None, epochs=None):
+        self.db = db
+        self.epochs = epochs  # DataEpochs, to skip messages a reset already removed from the rollups
+        self.archive_dir = archive_dir or ARCHIVE_DIR
+        self.batch_size = batch_size or ARCHIVE_BATCH_SIZE
+        self.stats = {}
+
+    def archive_collection(self, collection_name):
+        cutoff = archive_cutoff(collection_name)
+        if cutoff is None:
+            return 0
+        field = RETENTION_POLICIES[collection_name]["field"]
+        collection = self.db[collection_name]
+        query = {field: {"$lt": cutoff}, "archived_at": {"$exists": False}}
+
+        archived = 0
+        while True:
+            docs = list(collection.find(query).sort(field, ASCENDING).limit(self.batch_size))
+            if not docs:
+                break
+
+            partitions = {}
+            for doc in docs:
+                partitions.setdefault(partition_key(doc.get(field)), []).append(doc)
+            for day, partition_docs in partitions.items():
+                path = partition_path(collection_name, day, self.archive_dir)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Appending writes a new gzip member; readers see one continuous stream
+                with open(path, 'ab') as raw_file:
+                    with gzip.GzipFile(fileobj=raw_file, mode='ab') as archive_file:
+                        archive_file.write("".join(dumps(doc) + "\n" for doc in partition_docs).encode('utf-8'))
+                    raw_file.flush()
+                    os.fsync(raw_file.fileno())
+
+            if collection_name == "messages" and SENTIMENT_ROLLUPS:
+                self.remove_from_rollups(collection, [doc["_id"] for doc in docs])
+
+            # Only stamped (and therefore TTL-deletable) once the files are on disk
+            collection.update_many({"_id": {"$in": [doc["_id"] for doc in docs]}},
+                                   {"$set": {"archived_at": utc_now()}})
+            archived += len(docs)
+            print(f"  ↳ {collection_name}: {archived} documents archived")
+
+        self.stats[collection_name] = archived
+        return archived
+
+    def remove_from_rollups(self, collection, ids):
+        """Subtract expiring messages from sentiment_rollups, at most once per message"""
+        # Claim first: messages claimed by an earlier (crashed) run keep their flag and are skipped
+        claim = uuid.uuid4().hex
+        collection.update_many({"_id": {"$in": ids}, "rollup_removed": {"$exists": False}},
+                               {"$set": {"rollup_removed": claim}})
+        query = {"_id": {"$in": ids}, "rollup_removed": claim}
+        if self.epochs is not None:
+            query = self.epochs.visible_filter(query)
+        docs = list(collection.find(query, {"user_id": 1, "source": 1, "sentiment": 1, "occurred_at": 1}))
+        if docs:
+            apply_rollups(self.db[ROLLUPS_COLLECTION], docs, sign=-1)
+            # Cached dashboard responses were computed from the old counts
+            DataVersions(self.db).bump({doc.get("user_id") for doc in docs})
+
+    def run(self):
+        apply_ttl_indexes(self.db)
+        for collection_name in RETENTION_POLICIES:
+            self.archive_collection(collection_name)
+        return self.stats
+
+
+def restore(db, collection_name, date_from=None, date_to=None, target=None, archive_dir=None, batch_size=1000):
+    """
+    Load archived documents for [date_from, date_to) back into target
+    (default <collection>_restored, so the next archive run does not pick them up again).
+    """
+    target_collection = db[target or f"{collection_name}_restored"]
+    pattern = os.path.join(archive_dir or ARCHIVE_DIR, collection_name, '*', '*', '*.jsonl.gz')
+    restored = duplicates = 0
+
+    def insert(batch):
+        try:
+            return len(target_collection.insert_many(batch, ordered=False).inserted_ids), 0
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != 11000 for error in errors):
+                raise
+            return e.details.get('nInserted', 0), len(errors)
+
+    for path in sorted(glob.glob(pattern)):
+        day = os.path.basename(path)[:-len('.jsonl.gz')]
+        if (date_from and day < date_from) or (date_to and day >= date_to):
+            continue
+        batch = []
+        with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+            for line in archive_file:
+                if not line.strip():
+                    continue
+                doc = loads(line)
+                doc.pop('archived_at', None)
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    inserted, dups = insert(batch)
+                    restored, duplicates, batch = restored + inserted, duplicates + dups, []
+        if batch:
+            inserted, dups = insert(batch)
+            restored, duplicates = restored + inserted, duplicates + dups
+        print(f"  ↳ {path}: restored {restored} so far")
+
+    print(f"✅ Restored {restored} documents into {target_collection.name} ({duplicates} already present)")
+    if target_collection.name == "messages" and restored and SENTIMENT_ROLLUPS:
+        print("ℹ️ Run `python rollups.py rebuild` to count the restored messages in the dashboard rollups")
+    return restored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive expired documents and manage retention")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('archive', help="Archive expired documents and apply TTL indexes")
+    subparsers.add_parser('status', help="Show retention policies and expired document counts")
+    restore_parser = subparsers.add_parser('restore', help="Load archived documents back into MongoDB")
+    restore_parser.add_argument('collection', choices=sorted(RETENTION_POLICIES))
+    restore_parser.add_argument('--from', dest='date_from', help="First partition day (YYYY-MM-DD)")
+    restore_parser.add_argument('--to', dest='date_to', help="Partition day to stop before (YYYY-MM-DD)")
+    restore_parser.add_argument('--target', help="Target collection (default <collection>_restored)")
+    parser.add_argument('--archive-dir', default=None, help=f"Archive root (default {ARCHIVE_DIR})")
+    args = parser.parse_args()
+
+    db_manager = get_database_manager()
+    db = db_manager.db
+    if args.command == 'archive':
+        print(f"📦 Archiving expired documents to {args.archive_dir or ARCHIVE_DIR}")
+        stats = Archiver(db, archive_dir=args.archive_dir, epochs=db_manager.epochs).run()
+        print(f"📊 Archive summary: {stats}")
+    elif args.command == 'status':
+        for collection_name, policy in RETENTION_POLICIES.items():
+            cutoff = archive_cutoff(collection_name)
+            if cutoff is None:
+                print(f"{collection_name:>20}  retention off")
+                continue
+            expired = db[collection_name].count_documents({policy["field"]: {"$lt": cutoff}, "archived_at": {"$exists": False}})
+            archived = db[collection_name].count_documents({"archived_at": {"$exists": True}})
+            print(f"{collection_name:>20}  keep {retention_days(collection_name)} days, "
+                  f"{expired} to archive, {archived} awaiting TTL delete")
+    else:
+        restore(db, args.collection, args.date_from, args.date_to, args.target, args.archive_dir)
+
+
+if __name__ == "__main__":
+    main()
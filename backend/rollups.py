@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Hourly sentiment rollups.
+
+`sentiment_rollups` holds one document per (user_id, source, UTC hour, sentiment)
+with the number of messages in it. Inserts add to it with $inc upserts (inline,
+or from RollupConsumer in change-stream mode) and reclassify_message moves a
+count between sentiments, so the dashboard reads O(buckets) rollup documents
+instead of O(messages) messages.
+
+Dashboard reads switch to the rollups once they have been built, i.e. once
+migration 0006_sentiment_rollups (or `rebuild`) has been recorded. Resets delete
+the tenant's rollups, and retention.py subtracts messages as it archives them.
+Counts can drift after a crash between a message write and its increment (or
+an archive claim and its decrement); rebuild to recompute from the visible
+messages that retention has not subtracted.
+
+Usage:
+    python rollups.py rebuild     # regenerate sentiment_rollups from messages
+    python rollups.py status      # compare rollup totals with the message count
+"""
+
+import argparse
+import os
+from collections import Counter
+from pymongo import UpdateOne
+
+ROLLUPS_COLLECTION = 'sentiment_rollups'
+ROLLUPS_MIGRATION_VERSION = '0006_sentiment_rollups'
+ROLLUP_KEY_FIELDS = ('user_id', 'source', 'hour', 'sentiment')
+SENTIMENT_ROLLUPS = os.getenv('SENTIMENT_ROLLUPS', 'true').lower() == 'true'
+
+
+def hour_bucket(value):
+    """Start of the UTC hour containing a naive UTC datetime"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_key(message_data, sentiment=None):
+    return {
+        "user_id": message_data.get('user_id'),
+        "source": message_data.get('source'),
+        "hour": hour_bucket(message_data['occurred_at']),
+        "sentiment": sentiment if sentiment is not None else message_data.get('sentiment'),
+    }
+
+
+def rollup_updates(messages, sign=1):
+    """One $inc upsert per distinct rollup key among messages"""
+    counts = Counter()
+    for message_data in messages:
+        if message_data.get('occurred_at') is None:
+            continue
+        key = rollup_key(message_data)
+        counts[tuple(key[field] for field in ROLLUP_KEY_FIELDS)] += sign
+    return [
+        UpdateOne(dict(zip(ROLLUP_KEY_FIELDS, key)), {"$inc": {"count": delta}}, upsert=True)
+        for key, delta in counts.items() if delta
+    ]
+
+
+def apply_rollups(collection, messages, sign=1):
+    """Add (or with sign=-1 remove) messages to the rollups"""
+    updates = rollup_updates(messages, sign)
+    if updates:
+        collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def move_rollup(collection, message_data, old_sentiment, new_sentiment):
+    """Move one message's count from its old sentiment to the new one"""
+    if old_sentiment == new_sentiment or message_data.get('occurred_at') is None:
+        return
+    collection.bulk_write([
+        UpdateOne(rollup_key(message_data, old_sentiment), {"$inc": {"count": -1}}, upsert=True),
+        UpdateOne(rollup_key(message_data, new_sentiment), {"$inc": {"count": 1}}, upsert=True),
+    ], ordered=False)
+
+
+def rebuild_rollups(db_manager):
+    """
+    Recompute every rollup from the visible messages that retention has not
+    already subtracted (`rollup_removed`). $out swaps the result in
+    atomically and keeps the collection's indexes; increments made while the
+    aggregation runs are lost, so run it when insert traffic is low (or rerun it).
+    """
+    from indexes import INDEX_SPECS
+    pipeline = db_manager.epochs.visible_pipeline([
+        {"$match": {"occurred_at": {"$type": "date"}, "rollup_removed": {"$exists": False}}},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "source": "$source",
+                "hour": {"$dateTrunc": {"date": "$occurred_at", "unit": "hour"}},
+                "sentiment": "$sentiment",
+            },
+            "count": {"$sum": 1}
+        }},
+        {"$project": {"_id": 0, "user_id": "$_id.user_id", "source": "$_id.source",
+                      "hour": "$_id.hour", "sentiment": "$_id.sentiment", "count": 1}},
+        {"$out": ROLLUPS_COLLECTION},
+    ])
+    db_manager.messages.aggregate(pipeline, allowDiskUse=True)
+
+    db_manager.rollups.create_indexes(INDEX_SPECS[ROLLUPS_COLLECTION])
+    buckets = db_manager.rollups.estimated_document_count()
+    print(f"✅ Rebuilt {ROLLUPS_COLLECTION}: {buckets} buckets")
+    return buckets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the hourly sentiment rollups")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('rebuild', help="Regenerate sentiment_rollups from messages")
+    subparsers.add_parser('status', help="Compare rollup totals with the message count")
+    args = parser.parse_args()
+
+    from database import get_database_manager, utc_now
+    db_manager = get_database_manager()
+    if args.command == 'rebuild':
+        started = utc_now()
+        buckets = rebuild_rollups(db_manager)
+        # Reads switch to the rollups once they have been built
+        db_manager.db['schema_migrations'].update_one(
+            {"_id": ROLLUPS_MIGRATION_VERSION},
+            {"$set": {"status": "applied", "description": "Build hourly sentiment rollups",
+                      "result": buckets, "started_at": started, "applied_at": utc_now()}},
+            upsert=True
+        )
+    else:
+        totals = list(db_manager.rollups.aggregate([{"$group": {"_id": None, "buckets": {"$sum": 1}, "count": {"$sum": "$count"}}}]))
+        summary = totals[0] if totals else {"buckets": 0, "count": 0}
+        messages = db_manager.messages.count_documents(db_manager.epochs.visible_filter({"rollup_removed": {"$exists": False}}))
+        print(f"{ROLLUPS_COLLECTION}: {summary['buckets']} buckets counting {summary['count']} messages; "
+              f"{messages} visible messages; reads {'enabled' if db_manager.rollups_ready else 'disabled (not built)'}")
+
+
+if __name__ == "__main__":
+    main()
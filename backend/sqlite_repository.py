@@ -0,0 +1,615 @@
+# sqlite_repository.py
+# Embedded single-node storage backend (STORAGE_BACKEND=sqlite).
+#
+# Each table keeps the full document as Extended JSON in `doc` and copies the
+# fields that are filtered, sorted or grouped on into indexed columns, so list
+# queries are index range scans and the dashboard stats are SQL GROUP BYs.
+# Documents come back in the same shape DatabaseManager returns: ObjectId `_id`,
+# naive UTC `occurred_at`. Times are stored as fixed-width ISO strings, which
+# sort chronologically.
+#
+# Connections are opened per thread in WAL mode, so readers never block the
+# writer. Resets delete directly; there is no background reaper here.
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.json_util import JSONOptions, dumps, loads
+from database import (
+    CLASSIFIER_MODEL_VERSION, CURRENT_HOUR_EMOTION_MAPPING, HISTORY_PROJECTION, NEGATIVE_MESSAGE_SENTIMENTS,
+    POST_INSERT_PROCESSING, TREND_EMOTION_MAPPING, build_alert, build_daily_report, build_weekly_report,
+    canonical_sentiment, count_emotions, decode_page_cursor, default_week_start, empty_emotion_counts,
+    hourly_buckets, local_to_utc, prepare_message, trends_timezone, utc_now
+)
+from data_epochs import ALL_TENANTS
+from live_updates import get_live_updates
+from repository import SentimentRepository
+
+SQLITE_PATH = os.getenv('SQLITE_PATH', './sentiment_sentinel.db')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+JSON_OPTIONS = JSONOptions(tz_aware=False)
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    _id TEXT PRIMARY KEY,
+    id TEXT,
+    user_id TEXT,
+    source TEXT,
+    sender TEXT,
+    sentiment TEXT,
+    occurred_at TEXT,
+    epoch INTEGER,
+    classified INTEGER NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_occurred_at_id ON messages (occurred_at DESC, _id DESC);
+CREATE INDEX IF NOT EXISTS messages_source_occurred_at_id ON messages (source, occurred_at DESC, _id DESC);
+CREATE INDEX IF NOT EXISTS messages_sender_occurred_at_id ON messages (sender, occurred_at DESC, _id DESC);
+CREATE INDEX IF NOT EXISTS messages_sentiment_occurred_at_id ON messages (sentiment, occurred_at DESC, _id DESC);
+CREATE INDEX IF NOT EXISTS messages_message_id ON messages (id);
+CREATE INDEX IF NOT EXISTS messages_user_occurred_at ON messages (user_id, occurred_at DESC);
+CREATE INDEX IF NOT EXISTS messages_user_epoch ON messages (user_id, epoch);
+CREATE INDEX IF NOT EXISTS messages_classified_occurred_at ON messages (classified, occurred_at DESC, _id DESC);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    _id TEXT PRIMARY KEY,
+    message_id TEXT,
+    status TEXT,
+    severity TEXT,
+    created_at TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alerts_status_created_at ON alerts (status, created_at DESC);
+CREATE INDEX IF NOT EXISTS alerts_created_at ON alerts (created_at DESC);
+
+CREATE TABLE IF NOT EXISTS sentiment_analytics (
+    _id TEXT PRIMARY KEY,
+    report_type TEXT,
+    created_at TEXT,
+    epoch INTEGER,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analytics_report_type_created_at ON sentiment_analytics (report_type, created_at DESC);
+
+CREATE TABLE IF NOT EXISTS settings (
+    _id TEXT PRIMARY KEY,
+    key TEXT,
+    category TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS settings_category ON settings (category);
+
+CREATE TABLE IF NOT EXISTS email_configs (
+    _id TEXT PRIMARY KEY,
+    user_id TEXT,
+    active INTEGER,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS email_configs_user_active ON email_configs (user_id, active);
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    tenant TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+SORTABLE_COLUMNS = {"occurred_at", "id", "user_id", "source", "sender", "sentiment", "epoch"}
+MISSING = object()
+
+
+def encode_doc(doc):
+    return dumps(doc, json_options=JSON_OPTIONS)
+
+
+def decode_doc(text):
+    return loads(text, json_options=JSON_OPTIONS)
+
+
+def to_column_time(value):
+    """Fixed-width ISO string for a naive UTC datetime column, at BSON (millisecond) precision"""
+    if not isinstance(value, datetime):
+        return None
+    return value.replace(microsecond=value.microsecond // 1000 * 1000).strftime(TIME_FORMAT)
+
+
+def _resolve(doc, path):
+    value = doc
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+
+def _evaluate(expression, doc):
+    """The projection expressions used by the list views: "$field", $ifNull, $substrCP"""
+    if isinstance(expression, str) and expression.startswith('$'):
+        return _resolve(doc, expression[1:])
+    if isinstance(expression, dict) and len(expression) == 1:
+        operator, args = next(iter(expression.items()))
+        if operator == '$ifNull':
+            value = _evaluate(args[0], doc)
+            return _evaluate(args[1], doc) if value in (None, MISSING) else value
+        if operator == '$substrCP':
+            value = _evaluate(args[0], doc)
+            text = '' if value in (None, MISSING) else str(value)
+            return text[args[1]:args[1] + args[2]]
+    return expression
+
+
+def project_document(doc, projection):
+    """Apply a MongoDB find() projection to a decoded document"""
+    if not projection:
+        return doc
+    fields = {key: spec for key, spec in projection.items() if key != '_id'}
+    if fields and all(spec in (0, False) for spec in fields.values()):
+        return {key: value for key, value in doc.items() if key not in fields or projection.get(key, 1)}
+
+    result = {}
+    if projection.get('_id', 1) not in (0, False) and '_id' in doc:
+        result['_id'] = doc['_id']
+    for key, spec in fields.items():
+        value = _resolve(doc, key) if spec in (1, True) else _evaluate(spec, doc)
+        if value is not MISSING:
+            result[key] = value
+    return result
+
+
+class SQLiteRepository(SentimentRepository):
+    """SQLite (WAL) repository for single-node deployments, CI and benchmarks"""
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_PATH
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.connect()
+
+    def connect(self):
+        """Open the database file and create the schema"""
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn().executescript(SCHEMA)
+            print(f"✅ Using SQLite storage at {self.path}")
+        except sqlite3.Error as e:
+            print(f"❌ Failed to open SQLite database: {e}")
+            raise
+
+    def _conn(self):
+        """This thread's connection (sqlite3 connections must not be shared across threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _docs(self, sql, params=(), projection=None):
+        rows = self._conn().execute(sql, params).fetchall()
+        return [project_document(decode_doc(row[0]), projection) for row in rows]
+
+    # -- messages --------------------------------------------------------------
+
+    @staticmethod
+    def _message_row(message_data):
+        return (
+            str(message_data['_id']), message_data.get('id'), message_data.get('user_id'),
+            message_data.get('source'), message_data.get('sender'), message_data.get('sentiment'),
+            to_column_time(message_data.get('occurred_at')), message_data.get('epoch'),
+            1 if 'classification' in message_data else 0,
+            encode_doc(message_data)
+        )
+
+    def insert_message(self, message_data):
+        """Insert a single message into the database"""
+        try:
+            prepare_message(message_data)
+            message_data.setdefault('_id', ObjectId())
+            with self._conn() as conn:
+                conn.execute("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._message_row(message_data))
+                self._bump(conn, [message_data.get('user_id')])
+
+            message_id = str(message_data['_id'])
+            get_live_updates().publish_messages([message_data])
+            if POST_INSERT_PROCESSING == 'inline':
+                self._check_and_create_alert(message_data, message_id)
+            return message_id
+        except Exception as e:
+            print(f"❌ Error inserting message: {e}")
+            raise
+
+    def insert_messages_bulk(self, messages):
+        """Insert many messages in one transaction; existing _ids are counted as duplicates"""
+        if not messages:
+            return 0, 0
+        for message_data in messages:
+            prepare_message(message_data)
+            message_data.setdefault('_id', ObjectId())
+        with self._conn() as conn:
+            cursor = conn.executemany("INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                      [self._message_row(message_data) for message_data in messages])
+            if cursor.rowcount:
+                self._bump(conn, {message_data.get('user_id') for message_data in messages})
+        # With duplicates it is unknown which rows were ignored; clients catch up on their next poll
+        if cursor.rowcount == len(messages):
+            get_live_updates().publish_messages(messages)
+        return cursor.rowcount, len(messages) - cursor.rowcount
+
+    def reclassify_message(self, message_id, sentiment, confidence_score=None):
+        """Replace a message's sentiment label; returns False if not found"""
+        if not ObjectId.is_valid(message_id):
+            return False
+        conn = self._conn()
+        with conn:
+            row = conn.execute("SELECT doc FROM messages WHERE _id = ?", (str(ObjectId(message_id)),)).fetchone()
+            if not row:
+                return False
+            message_data = decode_doc(row[0])
+            message_data['sentiment'] = canonical_sentiment({"sentiment": sentiment})
+            message_data['classification'] = {"classified_at": datetime.now().isoformat(), "model_version": CLASSIFIER_MODEL_VERSION}
+            if confidence_score is not None:
+                message_data['classification']['confidence_score'] = confidence_score
+            conn.execute("UPDATE messages SET sentiment = ?, classified = 1, doc = ? WHERE _id = ?",
+                         (message_data['sentiment'], encode_doc(message_data), str(message_data['_id'])))
+            self._bump(conn, [message_data.get('user_id')])
+        return True
+
+    @staticmethod
+    def _keyset(where, params, after):
+        """Add the keyset position of a page cursor to a WHERE clause"""
+        if not after:
+            return where, params
+        occurred_at, last_id = decode_page_cursor(after)
+        if occurred_at is None:
+            where.append("occurred_at IS NULL AND _id < ?")
+            params.append(str(last_id))
+        else:
+            where.append("(occurred_at < ? OR (occurred_at = ? AND _id < ?))")
+            params.extend([to_column_time(occurred_at), to_column_time(occurred_at), str(last_id)])
+        return where, params
+
+    def _find_messages(self, where, params, limit=None, projection=None, after=None, order="occurred_at DESC, _id DESC", skip=None):
+        where, params = self._keyset(list(where), list(params), after)
+        sql = "SELECT doc FROM messages"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order}"
+        if limit or skip:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit or -1, skip or 0])
+        return self._docs(sql, params, projection)
+
+    def get_all_messages(self, limit=None, skip=None, sort_by="occurred_at", sort_order=-1, projection=None, after=None):
+        """Retrieve messages with optional pagination, sorting and projection (keyset via `after`)"""
+        try:
+            if sort_by in ("timestamp", "created_at"):
+                sort_by = "occurred_at"
+            if after or (sort_by == "occurred_at" and sort_order == -1):
+                order = "occurred_at DESC, _id DESC"
+            else:
+                column = sort_by if sort_by in SORTABLE_COLUMNS else "_id"
+                order = f"{column} {'DESC' if sort_order == -1 else 'ASC'}"
+            return self._find_messages([], [], limit, projection, after, order=order, skip=skip)
+        except Exception as e:
+            print(f"❌ Error retrieving messages: {e}")
+            raise
+
+    def get_message_body(self, message_id):
+        """Full text of a message (bodies are stored inline in SQLite)"""
+        if not ObjectId.is_valid(message_id):
+            return None
+        row = self._conn().execute("SELECT doc FROM messages WHERE _id = ?", (str(ObjectId(message_id)),)).fetchone()
+        return decode_doc(row[0]).get('text', '') if row else None
+
+    def get_message_count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def get_messages_by_source(self, source, limit=None, projection=None, after=None):
+        return self._find_messages(["source = ?"], [source], limit, projection, after)
+
+    def get_messages_by_sender(self, sender, limit=None, projection=None, after=None):
+        return self._find_messages(["sender = ?"], [sender], limit, projection, after)
+
+    def get_messages_by_sentiment(self, sentiment, limit=None, projection=None, after=None):
+        return self._find_messages(["sentiment = ?"], [sentiment], limit, projection, after)
+
+    def get_negative_sentiment_messages(self, limit=None, projection=None, after=None):
+        placeholders = ", ".join("?" for _ in NEGATIVE_MESSAGE_SENTIMENTS)
+        return self._find_messages([f"sentiment IN ({placeholders})"], NEGATIVE_MESSAGE_SENTIMENTS, limit, projection, after)
+
+    # -- dashboard analytics ---------------------------------------------------
+
+    def _label_counts(self, where="", params=()):
+        sql = "SELECT sentiment, COUNT(*) FROM messages WHERE sentiment IS NOT NULL"
+        if where:
+            sql += " AND " + where
+        return dict(self._conn().execute(sql + " GROUP BY sentiment", params).fetchall())
+
+    def get_sentiment_stats(self):
+        """Get sentiment distribution statistics"""
+        try:
+            return self._label_counts()
+        except Exception as e:
+            print(f"❌ Error getting sentiment stats: {e}")
+            return {}
+
+    def get_sentiment_stats_comparison(self, hours_ago=24):
+        """Get sentiment stats from previous period for comparison"""
+        try:
+            cutoff_time = utc_now() - timedelta(hours=hours_ago)
+            return self._label_counts("occurred_at < ?", (to_column_time(cutoff_time),))
+        except Exception as e:
+            print(f"❌ Error getting sentiment stats comparison: {e}")
+            return {}
+
+    def get_hourly_emotion_trends(self, hours=6, user_id=None):
+        """Hourly emotion counts with one GROUP BY over (clock hour, sentiment)"""
+        try:
+            buckets = hourly_buckets(hours, trends_timezone()[0])
+            start_utc = to_column_time(buckets[0][0])
+            end_utc = to_column_time(buckets[-1][0] + timedelta(hours=1))
+
+            # Bucket starts are whole hours apart in UTC: whole milliseconds since the first, integer-divided
+            sql = ("SELECT CAST(ROUND((julianday(occurred_at) - julianday(?)) * 86400000) AS INTEGER) / 3600000 AS bucket, "
+                   "sentiment, COUNT(*) FROM messages WHERE occurred_at >= ? AND occurred_at < ?")
+            params = [start_utc, start_utc, end_utc]
+            if user_id:
+                sql += " AND user_id = ?"
+                params.append(user_id)
+            rows = self._conn().execute(sql + " GROUP BY bucket, sentiment", params).fetchall()
+
+            labels = {}
+            for bucket, sentiment, count in rows:
+                labels.setdefault(bucket, ([], []))
+                labels[bucket][0].append(sentiment)
+                labels[bucket][1].append(count)
+
+            hourly_data = {}
+            for index, (_, label) in enumerate(buckets):
+                sentiments, counts = labels.get(index, ([], []))
+                hourly_data[label] = count_emotions(sentiments, TREND_EMOTION_MAPPING, counts)
+            return hourly_data
+        except Exception as e:
+            print(f"❌ Error getting hourly emotion trends: {e}")
+            return {}
+
+    def get_current_hour_stats(self):
+        """Get emotion statistics for the current hour"""
+        try:
+            current_hour_start = utc_now().replace(minute=0, second=0, microsecond=0)
+            counts = self._conn().execute(
+                "SELECT sentiment, COUNT(*) FROM messages WHERE occurred_at >= ? AND occurred_at < ? GROUP BY sentiment",
+                (to_column_time(current_hour_start), to_column_time(current_hour_start + timedelta(hours=1)))
+            ).fetchall()
+            return count_emotions([row[0] for row in counts], CURRENT_HOUR_EMOTION_MAPPING, [row[1] for row in counts])
+        except Exception as e:
+            print(f"❌ Error getting current hour stats: {e}")
+            return empty_emotion_counts()
+
+    def get_dashboard_summary(self, recent_limit=10, negative_limit=5, projection=None):
+        """Dashboard counts and lists, read in one transaction so they are consistent"""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            by_source = dict(conn.execute(
+                "SELECT source, COUNT(*) FROM messages WHERE source IS NOT NULL GROUP BY source").fetchall())
+            summary = {
+                "total_messages": self.get_message_count(),
+                "by_source": by_source,
+                "by_sentiment": self._label_counts(),
+                "recent_messages": self.get_all_messages(limit=recent_limit, projection=projection) if recent_limit else [],
+                "negative_alerts": self.get_negative_sentiment_messages(negative_limit, projection) if negative_limit else [],
+            }
+        return summary
+
+    # -- alerts, settings, reports ---------------------------------------------
+
+    def _check_and_create_alert(self, message_data, message_id):
+        """Create alert for negative sentiment messages"""
+        try:
+            alert_data = build_alert(message_data, message_id)
+            if alert_data:
+                alert_data['_id'] = ObjectId()
+                with self._conn() as conn:
+                    conn.execute("INSERT INTO alerts VALUES (?, ?, ?, ?, ?, ?)", (
+                        str(alert_data['_id']), alert_data['message_id'], alert_data['status'],
+                        alert_data['severity'], alert_data['created_at'], encode_doc(alert_data)
+                    ))
+                get_live_updates().publish_alert(alert_data, message_data.get('user_id'))
+                print(f"🚨 Alert created for negative sentiment: {alert_data['sentiment']}")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not create alert: {e}")
+
+    def get_active_alerts(self, limit=None, projection=None):
+        sql = "SELECT doc FROM alerts WHERE status = 'active' ORDER BY created_at DESC"
+        params = []
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._docs(sql, params, projection)
+
+    def get_settings(self, category=None):
+        """Get system settings"""
+        try:
+            if category:
+                docs = self._docs("SELECT doc FROM settings WHERE category = ?", (category,))
+            else:
+                docs = self._docs("SELECT doc FROM settings")
+            return {doc['key']: doc.get('value') for doc in docs}
+        except Exception as e:
+            print(f"❌ Error getting settings: {e}")
+            return {}
+
+    def _save_report(self, report):
+        report['_id'] = ObjectId()
+        with self._conn() as conn:
+            conn.execute("INSERT INTO sentiment_analytics VALUES (?, ?, ?, ?, ?)", (
+                str(report['_id']), report['report_type'], report['created_at'], report.get('epoch'), encode_doc(report)
+            ))
+        return str(report['_id'])
+
+    def _messages_between(self, start_local, end_local):
+        return self._docs(
+            "SELECT doc FROM messages WHERE occurred_at >= ? AND occurred_at < ?",
+            (to_column_time(local_to_utc(start_local)), to_column_time(local_to_utc(end_local))),
+            {"sentiment": 1, "source": 1, "priority": 1, "occurred_at": 1}
+        )
+
+    def generate_weekly_analytics(self, week_start_date=None):
+        """Generate and save weekly sentiment analytics"""
+        try:
+            week_start_date = week_start_date or default_week_start()
+            week_end_date = week_start_date + timedelta(days=7)
+            week_messages = self._messages_between(week_start_date, week_end_date)
+            if not week_messages:
+                print(f"No messages found for week starting {week_start_date.date()}")
+                return None
+
+            week_alerts = [{"severity": row[0]} for row in self._conn().execute(
+                "SELECT severity FROM alerts WHERE created_at >= ? AND created_at < ?",
+                (week_start_date.isoformat(), week_end_date.isoformat())
+            )]
+            report_id = self._save_report(build_weekly_report(week_messages, week_alerts, week_start_date, week_end_date))
+            print(f"✅ Weekly analytics saved for week {week_start_date.date()}")
+            return report_id
+        except Exception as e:
+            print(f"❌ Error generating weekly analytics: {e}")
+            raise
+
+    def generate_daily_analytics(self, target_date=None):
+        """Generate and save daily sentiment analytics"""
+        try:
+            target_date = target_date or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            day_messages = self._messages_between(target_date, target_date + timedelta(days=1))
+            if not day_messages:
+                print(f"No messages found for {target_date.date()}")
+                return None
+
+            report_id = self._save_report(build_daily_report(day_messages, target_date))
+            print(f"✅ Daily analytics saved for {target_date.date()}")
+            return report_id
+        except Exception as e:
+            print(f"❌ Error generating daily analytics: {e}")
+            raise
+
+    def get_analytics_by_period(self, report_type="weekly", limit=10):
+        """Get analytics reports by period (daily, weekly, monthly)"""
+        try:
+            sql = "SELECT doc FROM sentiment_analytics WHERE report_type = ? ORDER BY created_at DESC"
+            params = [f"{report_type}_summary"]
+            if limit:
+                sql += " LIMIT ?"
+                params.append(limit)
+            return self._docs(sql, params)
+        except Exception as e:
+            print(f"❌ Error getting analytics: {e}")
+            return []
+
+    def get_sentiment_history(self, limit=None, message_id=None, projection=None):
+        """Get sentiment analysis history, derived from classified messages"""
+        try:
+            where, params = ["classified = 1"], []
+            if message_id:
+                where.append("id = ?")
+                params.append(message_id)
+            history = [project_document(doc, HISTORY_PROJECTION) for doc in self._find_messages(where, params, limit)]
+            return [project_document(row, projection) for row in history]
+        except Exception as e:
+            print(f"❌ Error getting sentiment history: {e}")
+            return []
+
+    def reset_tenant_data(self, user_id=None):
+        """
+        Delete messages (and, for a global reset, analytics) committed before now.
+        Writers serialize on the database file, so the transaction itself orders
+        the reset against concurrent inserts; no clock is involved. Returns the
+        tenant's new data version.
+        """
+        with self._conn() as conn:
+            if user_id:
+                conn.execute("DELETE FROM messages WHERE user_id = ?", (user_id,))
+            else:
+                conn.execute("DELETE FROM messages")
+                conn.execute("DELETE FROM sentiment_analytics")
+            self._bump(conn, [user_id])
+        version = self.get_data_version(user_id)[-1]
+        print(f"🔄 Data reset for {'user ' + user_id if user_id else 'all users'} (version {version})")
+        return version
+
+    # -- cache invalidation ----------------------------------------------------
+
+    @staticmethod
+    def _bump(conn, user_ids):
+        """Increment tenant and global versions inside the caller's transaction"""
+        conn.executemany("INSERT INTO data_versions VALUES (?, 1) ON CONFLICT (tenant) DO UPDATE SET version = version + 1",
+                         [(tenant,) for tenant in {ALL_TENANTS} | {user_id for user_id in user_ids or [] if user_id}])
+
+    def bump_data_version(self, user_ids=None):
+        with self._conn() as conn:
+            self._bump(conn, user_ids)
+
+    def get_data_version(self, user_id=None):
+        """The file is shared by every worker, so versions are read without caching"""
+        tenants = [ALL_TENANTS, user_id] if user_id else [ALL_TENANTS]
+        found = dict(self._conn().execute(
+            f"SELECT tenant, version FROM data_versions WHERE tenant IN ({', '.join('?' * len(tenants))})", tenants).fetchall())
+        return tuple(found.get(tenant, 0) for tenant in tenants)
+
+    # -- email configuration ---------------------------------------------------
+
+    def _active_email_configs(self, user_id):
+        if user_id:
+            sql = "SELECT doc FROM email_configs WHERE user_id = ? AND active = 1"
+            return self._docs(sql + " LIMIT 1", (user_id,))
+        return self._docs("SELECT doc FROM email_configs WHERE user_id IS NULL AND active = 1 LIMIT 1")
+
+    def save_email_config(self, config_data, user_id=None):
+        """Save or update email configuration for a specific user or globally"""
+        try:
+            config_data['updated_at'] = datetime.now().isoformat()
+            config_data['created_at'] = config_data.get('created_at', datetime.now().isoformat())
+
+            existing = self._active_email_configs(user_id)
+            doc = {**(existing[0] if existing else {"_id": ObjectId()}), **config_data, "active": True}
+            if user_id:
+                doc['user_id'] = user_id
+            with self._conn() as conn:
+                conn.execute("INSERT OR REPLACE INTO email_configs VALUES (?, ?, ?, ?)",
+                             (str(doc['_id']), doc.get('user_id'), 1, encode_doc(doc)))
+                self._bump(conn, [user_id])
+            return str(doc['_id'])
+        except Exception as e:
+            print(f"❌ Error saving email config: {e}")
+            raise
+
+    def get_email_config(self, user_id=None):
+        """Get email configuration for a specific user or the global active configuration"""
+        try:
+            configs = self._active_email_configs(user_id)
+            if not configs and not user_id:
+                configs = self._docs("SELECT doc FROM email_configs WHERE active = 1 LIMIT 1")
+            return configs[0] if configs else None
+        except Exception as e:
+            print(f"❌ Error retrieving email config: {e}")
+            raise
+
+    def get_all_email_configs(self):
+        """Get all active email configurations"""
+        return self._docs("SELECT doc FROM email_configs WHERE active = 1")
+
+    def close_connection(self):
+        """Close every thread's connection"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+        print("✅ Database connection closed")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test change-stream post-insert processing against a local single-node replica set.
+
+    mongod --replSet rs0 --dbpath ./data
+    mongosh --eval "rs.initiate()"
+    MONGODB_URI="mongodb://localhost:27017/?replicaSet=rs0" DATABASE_NAME=sentiment_cs_test \\
+        POST_INSERT_PROCESSING=change_stream python test_change_stream_consumers.py
+"""
+
+import time
+from datetime import datetime
+from bson import ObjectId
+from database import get_database_manager, POST_INSERT_PROCESSING
+from change_stream_consumers import AlertConsumer, RollupConsumer, run_consumers
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def insert_test_message(db_manager, label, **extra):
+    return db_manager.insert_message({
+        **extra,
+        "id": f"cs_test_{label}_{int(time.time() * 1000)}",
+        "timestamp": datetime.now().isoformat(),
+        "source": "chat",
+        "sender": "cs-test@example.com",
+        "text": "This is terrible, I am furious",
+        "sentiment": "angry"
+    })
+
+
+def test_change_stream_consumers():
+    print("🧪 TESTING CHANGE STREAM CONSUMERS")
+    print("=" * 50)
+
+    if POST_INSERT_PROCESSING != 'change_stream':
+        print("❌ Set POST_INSERT_PROCESSING=change_stream to run this test")
+        return False
+
+    db_manager = get_database_manager()
+    consumers = [AlertConsumer, RollupConsumer]
+
+    # 1. Insert path must not create side effects itself
+    runners = run_consumers(consumers, block=False)
+    time.sleep(2)  # let the streams open before inserting
+
+    message_id = insert_test_message(db_manager, "live")
+    alert_ok = wait_for(lambda: db_manager.alerts.find_one({"message_id": {"$regex": "^cs_test_live"}}) is not None)
+    history_ok = bool(db_manager.get_sentiment_history(message_id=db_manager.messages.find_one({"_id": ObjectId(message_id)})["id"]))
+    print(f"{'✅' if alert_ok else '❌'} Alert created by consumer for {message_id}")
+    print(f"{'✅' if history_ok else '❌'} History derived from the message for {message_id}")
+
+    # 2. Stop consumers, insert while they are down, restart and expect catch-up
+    for runner in runners:
+        runner.stop()
+    for runner in runners:
+        runner.join(timeout=5)
+
+    insert_test_message(db_manager, "offline")
+    time.sleep(1)
+    offline_before = db_manager.alerts.find_one({"message_id": {"$regex": "^cs_test_offline"}}) is not None
+    print(f"{'✅' if not offline_before else '❌'} No alert while consumers are stopped")
+
+    runners = run_consumers(consumers, block=False)
+    resumed_ok = wait_for(lambda: db_manager.alerts.find_one({"message_id": {"$regex": "^cs_test_offline"}}) is not None)
+    print(f"{'✅' if resumed_ok else '❌'} Consumer resumed from its token and processed the missed insert")
+
+    # 3. Archive imports are counted into the rollups but never alerted on
+    rollup_filter = {"sentiment": "angry", "source": "chat", "user_id": None}
+    def rollup_total():
+        return sum(doc["count"] for doc in db_manager.rollups.find(rollup_filter))
+    rollups_before = rollup_total()
+    insert_test_message(db_manager, "imported", imported=True)
+    insert_test_message(db_manager, "after_import")
+    # Consumers process inserts in order, so once the later alert exists the import has been seen
+    after_ok = wait_for(lambda: db_manager.alerts.find_one({"message_id": {"$regex": "^cs_test_after_import"}}) is not None)
+    imported_alert = db_manager.alerts.find_one({"message_id": {"$regex": "^cs_test_imported"}}) is not None
+    counted_ok = wait_for(lambda: rollup_total() >= rollups_before + 2)
+    print(f"{'✅' if after_ok and not imported_alert else '❌'} No alert for an imported message")
+    print(f"{'✅' if counted_ok else '❌'} Imported message counted into the rollups")
+
+    for runner in runners:
+        runner.stop()
+
+    # Clean up test documents (rollups are recomputed with `python rollups.py rebuild`)
+    db_manager.messages.delete_many({"id": {"$regex": "^cs_test_"}})
+    db_manager.alerts.delete_many({"message_id": {"$regex": "^cs_test_"}})
+
+    passed = alert_ok and history_ok and not offline_before and resumed_ok and after_ok and not imported_alert and counted_ok
+    print("=" * 50)
+    print("🎉 All change stream checks passed" if passed else "❌ Some change stream checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    test_change_stream_consumers()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Run every DatabaseManager query through explain() and fail on collection scans.
+Point MONGODB_URI/DATABASE_NAME at a database with the index spec applied
+(python migrations.py) and some sample data.
+"""
+
+import os
+import sys
+
+os.environ['DB_EXPLAIN_CHECK'] = 'true'
+
+from database import DatabaseManager
+
+
+def test_query_plans():
+    print("🧪 TESTING QUERY PLANS (no COLLSCAN allowed)")
+    print("=" * 50)
+
+    db_manager = DatabaseManager()
+    checker = db_manager.query_plan_checker
+    checker.raise_on_scan = False  # collect every violation instead of stopping at the first
+
+    queries = [
+        ("get_all_messages", lambda: db_manager.get_all_messages(limit=10)),
+        ("get_messages_by_source", lambda: db_manager.get_messages_by_source('email', limit=10)),
+        ("get_messages_by_sender", lambda: db_manager.get_messages_by_sender('test@example.com', limit=10)),
+        ("get_messages_by_sentiment", lambda: db_manager.get_messages_by_sentiment('angry', limit=10)),
+        ("get_negative_sentiment_messages", lambda: db_manager.get_negative_sentiment_messages(limit=10)),
+        ("get_sentiment_stats", lambda: db_manager.get_sentiment_stats()),
+        ("get_sentiment_stats_comparison", lambda: db_manager.get_sentiment_stats_comparison()),
+        ("get_hourly_emotion_trends", lambda: db_manager.get_hourly_emotion_trends(2)),
+        ("get_hourly_emotion_trends(user)", lambda: db_manager.get_hourly_emotion_trends(2, 'test_user')),
+        ("get_current_hour_stats", lambda: db_manager.get_current_hour_stats()),
+        ("get_dashboard_summary", lambda: db_manager.get_dashboard_summary()),
+        ("get_active_alerts", lambda: db_manager.get_active_alerts(limit=10)),
+        ("get_settings", lambda: db_manager.get_settings('general')),
+        ("get_analytics_by_period", lambda: db_manager.get_analytics_by_period('weekly')),
+        ("get_sentiment_history", lambda: db_manager.get_sentiment_history(limit=10, message_id='test')),
+        ("get_email_config(user)", lambda: db_manager.get_email_config('test_user')),
+        ("get_email_config(global)", lambda: db_manager.get_email_config()),
+        ("get_all_email_configs", lambda: db_manager.get_all_email_configs()),
+    ]
+
+    for name, run in queries:
+        before = len(checker.violations)
+        try:
+            run()
+        except Exception as e:
+            print(f"⚠️ {name} raised: {e}")
+        status = "❌" if len(checker.violations) > before else "✅"
+        print(f"{status} {name}")
+
+    print("=" * 50)
+    print(f"📊 {len(checker.checked)} queries explained, {len(checker.violations)} collection scans")
+    for violation in checker.violations:
+        print(f"   - {violation}")
+    return not checker.violations
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_query_plans() else 1)
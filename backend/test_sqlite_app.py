@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Boot the Flask app on the embedded SQLite backend, with no MongoDB settings,
+and exercise the main endpoints through the test client. Needs no server:
+
+    python test_sqlite_app.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+# Settings are read at import time, so configure the environment first
+os.environ['STORAGE_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='sentiment_sqlite_'), 'app.db')
+os.environ.pop('MONGODB_URI', None)
+os.environ['LIVE_UPDATES_ENABLED'] = 'false'
+
+from app import app
+
+
+def check(label, response, status=200):
+    ok = response.status_code == status
+    print(f"{'✅' if ok else '❌'} {label}: {response.status_code}")
+    return ok
+
+
+def test_sqlite_app():
+    print("🧪 TESTING THE APP ON SQLITE (no MONGODB_URI)")
+    print("=" * 50)
+    client = app.test_client()
+    results = [check("GET /health", client.get('/health'))]
+
+    message = {
+        "id": f"sqlite_test_{int(datetime.now().timestamp() * 1000)}",
+        "timestamp": datetime.now().isoformat(),
+        "source": "chat",
+        "sender": "sqlite-test@example.com",
+        "text": "This is terrible, I am furious",
+        "sentiment": "angry",
+        "user_id": "sqlite_test_user"
+    }
+    results.append(check("POST /message", client.post('/message', json=message), 201))
+    results.append(check("GET /messages", client.get('/messages?limit=5')))
+    results.append(check("GET /stats", client.get('/stats')))
+    results.append(check("GET /alerts", client.get('/alerts')))
+    results.append(check("GET /api/emotion-overview", client.get('/api/emotion-overview')))
+    results.append(check("GET /api/emotion-trends", client.get('/api/emotion-trends?user_id=sqlite_test_user')))
+    results.append(check("POST /api/reset-emotion-data",
+                         client.post('/api/reset-emotion-data', json={"user_id": "sqlite_test_user"})))
+
+    count = client.get('/health').get_json().get('message_count')
+    reset_ok = count == 0
+    print(f"{'✅' if reset_ok else '❌'} Reset removed the test message (message_count={count})")
+
+    passed = all(results) and reset_ok
+    print("=" * 50)
+    print("🎉 The app runs on SQLite without MongoDB" if passed else "❌ Some SQLite app checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_sqlite_app() else 1)
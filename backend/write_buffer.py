@@ -0,0 +1,220 @@
+# write_buffer.py
+# Write-behind buffer for documents nobody reads on the request path (low-severity
+# alerts). Documents are queued in memory and written with insert_many when a size
+# or time threshold is reached, and on exit.
+#
+# With WRITE_BUFFER_SPOOL_DIR set, every buffered document is also appended to a
+# per-process spool file that is truncated after a successful flush. Spool files
+# are named by pid and a per-start token, so a restarted container that gets the
+# same pid does not mistake its predecessor's file for its own. Spool files
+# left behind by a dead process are replayed on startup; documents get their _id
+# when buffered, so a replay after a partial flush cannot insert duplicates.
+import atexit
+import glob
+import os
+import threading
+import uuid
+from bson import ObjectId
+from bson.json_util import dumps, loads
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+ALERTS_WRITE_BEHIND = os.getenv('ALERTS_WRITE_BEHIND', 'false').lower() == 'true'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WriteBehindBuffer:
+    """
+    Bounded in-memory buffer of pending inserts, grouped by collection.
+    add() never blocks on the database unless the buffer is full, in which case
+    the caller flushes inline (backpressure instead of dropping documents).
+    """
+
+    def __init__(self, flush_size=None, flush_interval_ms=None, max_pending=None, spool_dir=None):
+        self.flush_size = flush_size or int(os.getenv('WRITE_BUFFER_FLUSH_SIZE', '200'))
+        self.flush_interval = (flush_interval_ms or int(os.getenv('WRITE_BUFFER_FLUSH_MS', '2000'))) / 1000.0
+        self.max_pending = max_pending or int(os.getenv('WRITE_BUFFER_MAX_PENDING', '10000'))
+        self.spool_dir = spool_dir if spool_dir is not None else os.getenv('WRITE_BUFFER_SPOOL_DIR', '')
+        self.pending = {}      # collection full name -> list of documents
+        self.collections = {}  # collection full name -> Collection
+        self.count = 0
+        self.thread = None
+        self.pid = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._spool = None
+        self.spool_token = uuid.uuid4().hex
+        self.stats = {"buffered": 0, "flushed": 0, "flushes": 0, "errors": 0, "replayed": 0}
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def _ensure_started(self):
+        """Start the flush thread lazily so each forked Gunicorn worker gets its own"""
+        if self.pid == os.getpid() and self.thread:
+            return
+        with self._lock:
+            if self.pid == os.getpid() and self.thread:
+                return
+            # Buffered documents inherited from the parent belong to the parent
+            self.pid = os.getpid()
+            self.pending, self.collections, self.count = {}, {}, 0
+            self._spool = None
+            self.spool_token = uuid.uuid4().hex
+            self.thread = threading.Thread(target=self._run, name="write-behind-flush")
+            self.thread.daemon = True
+            self.thread.start()
+            atexit.register(self.flush)
+            print(f"🧵 Started write-behind buffer (flush at {self.flush_size} docs or {self.flush_interval}s)")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Write-behind flush failed: {e}")
+
+    # -- spool ---------------------------------------------------------------
+
+    def _spool_path(self):
+        return os.path.join(self.spool_dir, f"write_buffer-{os.getpid()}-{self.spool_token}.jsonl")
+
+    def _spool_append(self, collection, doc):
+        if not self.spool_dir:
+            return
+        if self._spool is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._spool = open(self._spool_path(), 'a', encoding='utf-8')
+        self._spool.write(dumps({"db": collection.database.name, "coll": collection.name, "doc": doc}) + "\n")
+        self._spool.flush()
+
+    def _spool_truncate(self):
+        if self._spool is not None:
+            self._spool.seek(0)
+            self._spool.truncate()
+
+    def replay_spool(self, client):
+        """Insert documents from spool files of processes that are no longer running"""
+        if not self.spool_dir:
+            return 0
+        replayed = 0
+        for path in glob.glob(os.path.join(self.spool_dir, "write_buffer-*.jsonl")):
+            if path == self._spool_path():
+                continue
+            try:
+                # write_buffer-<pid>-<token>.jsonl (older files: write_buffer-<pid>.jsonl)
+                pid = int(os.path.basename(path)[len("write_buffer-"):-len(".jsonl")].split("-")[0])
+            except ValueError:
+                continue
+            # Our pid with another token is a previous process that had the same pid
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            # Claim the file atomically so concurrent workers do not replay it twice
+            claimed = f"{path}.replay-{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+
+            batches = {}
+            with open(claimed, encoding='utf-8') as spool:
+                for line in spool:
+                    line = line.strip()
+                    if line:
+                        entry = loads(line)
+                        batches.setdefault((entry["db"], entry["coll"]), []).append(entry["doc"])
+            for (db_name, coll_name), docs in batches.items():
+                replayed += self._insert(client[db_name][coll_name], docs)
+            os.remove(claimed)
+
+        if replayed:
+            self.stats["replayed"] += replayed
+            print(f"♻️ Replayed {replayed} spooled write-behind documents")
+        return replayed
+
+    # -- buffering -----------------------------------------------------------
+
+    def add(self, collection, doc):
+        """Queue a document for insertion; returns its (pre-assigned) _id"""
+        self._ensure_started()
+        doc.setdefault('_id', ObjectId())
+        with self._lock:
+            self.collections[collection.full_name] = collection
+            self.pending.setdefault(collection.full_name, []).append(doc)
+            self.count += 1
+            self.stats["buffered"] += 1
+            self._spool_append(collection, doc)
+            count = self.count
+
+        if count >= self.max_pending:
+            self.flush()
+        elif count >= self.flush_size:
+            self._wakeup.set()
+        return doc['_id']
+
+    def _insert(self, collection, docs):
+        try:
+            return len(collection.insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Already written by an earlier, interrupted flush
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            return e.details.get('nInserted', 0)
+
+    def flush(self):
+        """Write every buffered document; failed batches are put back for the next flush"""
+        with self._flush_lock:
+            with self._lock:
+                if not self.count:
+                    return 0
+                pending, collections = self.pending, self.collections
+                self.pending, self.collections, self.count = {}, {}, 0
+
+            written = 0
+            failed = {}
+            for name, docs in pending.items():
+                try:
+                    written += self._insert(collections[name], docs)
+                except Exception as e:
+                    self.stats["errors"] += len(docs)
+                    failed[name] = docs
+                    print(f"❌ Write-behind insert into {name} failed, will retry: {e}")
+
+            with self._lock:
+                for name, docs in failed.items():
+                    self.pending[name] = docs + self.pending.get(name, [])
+                    self.collections.setdefault(name, collections[name])
+                    self.count += len(docs)
+                if not self.count:
+                    self._spool_truncate()
+
+            self.stats["flushed"] += written
+            self.stats["flushes"] += 1
+            return written
+
+    def get_stats(self):
+        return {**self.stats, "pending": self.count, "spool": bool(self.spool_dir)}
+
+
+# Global buffer instance
+write_buffer = None
+
+def get_write_buffer():
+    """Get or create the write-behind buffer"""
+    global write_buffer
+    if write_buffer is None:
+        write_buffer = WriteBehindBuffer()
+    return write_buffer
@@ -4,6 +4,7 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/com
 import { Button } from "@/components/ui/button";
 import { TrendingUp, Play, Pause, RotateCcw } from "lucide-react";
 import { useUser } from "@clerk/clerk-react";
+import { useLiveUpdates } from "@/hooks/use-live-updates";
 
 interface EmotionDataPoint {
   time: string;
@@ -123,25 +124,18 @@ const InteractiveEmotionChart = () => {
   }, []);
 
   useEffect(() => {
-    let interval: NodeJS.Timeout;
-
     if (isLive) {
       if (!isLiveMonitoring) {
         startLiveMonitoring();
       }
-
-      interval = setInterval(() => {
-        fetchEmotionTrends();
-      }, 10000);
     } else {
       setIsLiveMonitoring(false);
     }
-
-    return () => {
-      if (interval) clearInterval(interval);
-    };
   }, [isLive, isLiveMonitoring]);
 
+  // While live, refresh the trends when new messages are pushed; poll every 10 seconds only if the socket is down
+  useLiveUpdates(fetchEmotionTrends, { enabled: isLive, fallbackMs: 10000 });
+
   const resetData = async () => {
     try {
       setIsLive(false);
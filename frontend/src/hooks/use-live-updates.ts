@@ -0,0 +1,112 @@
+import * as React from "react"
+import { useAuth } from "@clerk/clerk-react"
+
+// live_server.py runs as its own service; `python app.py` also serves it on the API port in development
+const LIVE_UPDATES_URL = import.meta.env.VITE_LIVE_UPDATES_URL || "https://customer-sentiment-te99.onrender.com"
+// The server only accepts the WebSocket transport (Engine.IO v4 / Socket.IO v5 framing)
+const SOCKET_URL = `${LIVE_UPDATES_URL.replace(/^http/, "ws")}/socket.io/?EIO=4&transport=websocket`
+const MAX_RETRY_MS = 30000
+
+export type LiveUpdateEvent = "message" | "buckets" | "alert"
+const LIVE_UPDATE_EVENTS: string[] = ["message", "buckets", "alert"]
+
+interface LiveUpdateOptions {
+  enabled?: boolean
+  // Poll interval while the socket is not connected
+  fallbackMs?: number
+  // Bursts of events (bulk inserts) trigger a single refresh
+  debounceMs?: number
+}
+
+/**
+ * Calls refresh() when the backend pushes a live update for the signed-in user
+ * over a Socket.IO WebSocket, and every fallbackMs while it is disconnected
+ * (polling fallback). The server only joins the socket to the room of the user
+ * its Clerk session token was issued for. Returns whether the push channel is
+ * connected.
+ */
+export function useLiveUpdates(
+  refresh: (event?: LiveUpdateEvent) => void,
+  { enabled = true, fallbackMs = 30000, debounceMs = 500 }: LiveUpdateOptions = {}
+) {
+  const { isSignedIn, userId, getToken } = useAuth()
+  const [connected, setConnected] = React.useState(false)
+  const refreshRef = React.useRef(refresh)
+  refreshRef.current = refresh
+  const getTokenRef = React.useRef(getToken)
+  getTokenRef.current = getToken
+
+  React.useEffect(() => {
+    if (!enabled) return
+
+    let pollTimer: ReturnType<typeof setInterval> | undefined
+    let debounceTimer: ReturnType<typeof setTimeout> | undefined
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined
+    let socket: WebSocket | undefined
+    let retryMs = 1000
+    let closed = false
+
+    const startPolling = () => {
+      if (!pollTimer) pollTimer = setInterval(() => refreshRef.current(), fallbackMs)
+    }
+    const stopPolling = () => {
+      if (pollTimer) clearInterval(pollTimer)
+      pollTimer = undefined
+    }
+    const scheduleRefresh = (event: LiveUpdateEvent) => {
+      if (debounceTimer) clearTimeout(debounceTimer)
+      debounceTimer = setTimeout(() => refreshRef.current(event), debounceMs)
+    }
+
+    const connect = async () => {
+      // Session tokens are short-lived, so fetch a fresh one for every (re)connect
+      const token = await getTokenRef.current().catch(() => null)
+      if (closed) return
+      const ws = new WebSocket(SOCKET_URL)
+      socket = ws
+
+      ws.onmessage = ({ data }) => {
+        if (typeof data !== "string") return
+        if (data === "2") {
+          ws.send("3") // heartbeat
+        } else if (data.startsWith("0")) {
+          ws.send(`40${JSON.stringify({ token })}`) // transport open: join the default namespace
+        } else if (data.startsWith("40")) {
+          retryMs = 1000
+          setConnected(true)
+          stopPolling()
+          // Catch up on anything missed while disconnected
+          refreshRef.current()
+        } else if (data.startsWith("42")) {
+          const [event] = JSON.parse(data.slice(2))
+          if (LIVE_UPDATE_EVENTS.includes(event)) scheduleRefresh(event)
+        } else if (data.startsWith("41") || data.startsWith("44")) {
+          ws.close() // disconnected or refused by the server
+        }
+      }
+      ws.onclose = () => {
+        if (closed || socket !== ws) return
+        setConnected(false)
+        startPolling()
+        reconnectTimer = setTimeout(connect, retryMs)
+        retryMs = Math.min(retryMs * 2, MAX_RETRY_MS)
+      }
+    }
+
+    // Poll until the socket connects, and for good when signed out
+    startPolling()
+    if (!isSignedIn) return stopPolling
+    connect()
+
+    return () => {
+      closed = true
+      stopPolling()
+      if (debounceTimer) clearTimeout(debounceTimer)
+      if (reconnectTimer) clearTimeout(reconnectTimer)
+      socket?.close()
+      setConnected(false)
+    }
+  }, [isSignedIn, userId, enabled, fallbackMs, debounceMs])
+
+  return connected
+}
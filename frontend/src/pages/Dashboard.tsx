@@ -2,9 +2,10 @@ import { BarChart3, Bell, TrendingUp, Users, Activity, MessageCircle, Settings,
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import InteractiveEmotionChart from "@/components/InteractiveEmotionChart";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useCallback } from "react";
 import { SignedIn, SignedOut, RedirectToSignIn, useUser } from "@clerk/clerk-react";
 import { useNavigate } from "react-router-dom";
+import { useLiveUpdates } from "@/hooks/use-live-updates";
 
 const Dashboard = () => {
     const { user } = useUser();
@@ -24,81 +25,82 @@ const Dashboard = () => {
   const navigate = useNavigate();
 
   // Fetch real emotion overview data from backend
-  useEffect(() => {
-    const fetchDashboardData = async () => {
-      try {
-        // Fetch emotion overview
-        const emotionResponse = await fetch('https://customer-sentiment-te99.onrender.com/api/emotion-overview');
-        if (emotionResponse.ok) {
-          const emotionJson = await emotionResponse.json();
+  const fetchDashboardData = useCallback(async () => {
+    try {
+      // Fetch emotion overview
+      const emotionResponse = await fetch('https://customer-sentiment-te99.onrender.com/api/emotion-overview');
+      if (emotionResponse.ok) {
+        const emotionJson = await emotionResponse.json();
 
-          const updatedEmotionData = [
-            {
-              type: "Anger",
-              count: emotionJson.anger?.count || 0,
-              trend: emotionJson.anger?.percentage_text || `${emotionJson.anger?.count || 0}/0 (0%)`,
-              color: "emotion-negative"
-            },
-            {
-              type: "Confusion",
-              count: emotionJson.confusion?.count || 0,
-              trend: emotionJson.confusion?.percentage_text || `${emotionJson.confusion?.count || 0}/0 (0%)`,
-              color: "emotion-negative"
-            },
-            {
-              type: "Joy",
-              count: emotionJson.joy?.count || 0,
-              trend: emotionJson.joy?.percentage_text || `${emotionJson.joy?.count || 0}/0 (0%)`,
-              color: "emotion-positive"
-            },
-            {
-              type: "Neutral",
-              count: emotionJson.neutral?.count || 0,
-              trend: emotionJson.neutral?.percentage_text || `${emotionJson.neutral?.count || 0}/0 (0%)`,
-              color: "emotion-neutral"
-            },
-          ];
-          setEmotionData(updatedEmotionData);
-        }
+        const updatedEmotionData = [
+          {
+            type: "Anger",
+            count: emotionJson.anger?.count || 0,
+            trend: emotionJson.anger?.percentage_text || `${emotionJson.anger?.count || 0}/0 (0%)`,
+            color: "emotion-negative"
+          },
+          {
+            type: "Confusion",
+            count: emotionJson.confusion?.count || 0,
+            trend: emotionJson.confusion?.percentage_text || `${emotionJson.confusion?.count || 0}/0 (0%)`,
+            color: "emotion-negative"
+          },
+          {
+            type: "Joy",
+            count: emotionJson.joy?.count || 0,
+            trend: emotionJson.joy?.percentage_text || `${emotionJson.joy?.count || 0}/0 (0%)`,
+            color: "emotion-positive"
+          },
+          {
+            type: "Neutral",
+            count: emotionJson.neutral?.count || 0,
+            trend: emotionJson.neutral?.percentage_text || `${emotionJson.neutral?.count || 0}/0 (0%)`,
+            color: "emotion-neutral"
+          },
+        ];
+        setEmotionData(updatedEmotionData);
+      }
 
-        // Fetch recent negative sentiment messages for tickets
-        const ticketsResponse = await fetch('https://customer-sentiment-te99.onrender.com/alerts?limit=3');
-        if (ticketsResponse.ok) {
-          const ticketsJson = await ticketsResponse.json();
-          if (ticketsJson.messages && Array.isArray(ticketsJson.messages)) {
-            const formattedTickets = ticketsJson.messages.map((msg: any, index: number) => ({
+      // Fetch recent negative sentiment messages for tickets
+      const ticketsResponse = await fetch('https://customer-sentiment-te99.onrender.com/alerts?limit=3&view=summary');
+      if (ticketsResponse.ok) {
+        const ticketsJson = await ticketsResponse.json();
+        if (ticketsJson.messages && Array.isArray(ticketsJson.messages)) {
+          const formattedTickets = ticketsJson.messages.map((msg: any, index: number) => {
+            const label = msg.category || msg.sentiment || msg.emotion || 'unknown';
+            return {
               id: `#${msg.id || (4521 - index)}`,
               customer: msg.sender || 'Unknown Customer',
-              emotion: (msg.sentiment || msg.emotion || 'unknown').charAt(0).toUpperCase() + (msg.sentiment || msg.emotion || 'unknown').slice(1),
-              severity: msg.sentiment === 'angry' ? 'High' : msg.sentiment === 'confused' ? 'Medium' : 'Low',
+              emotion: label.charAt(0).toUpperCase() + label.slice(1),
+              severity: label === 'angry' ? 'High' : label === 'confused' ? 'Medium' : 'Low',
               time: msg.timestamp ? new Date(msg.timestamp).toLocaleTimeString() : 'Unknown'
-            }));
-            setRecentTickets(formattedTickets);
-          }
-        }
-
-        // Fetch email configuration
-        const configResponse = await fetch(`https://customer-sentiment-te99.onrender.com/api/email-config?user_id=${userId}`);
-        if (configResponse.ok) {
-          const configJson = await configResponse.json();
-          setEmailConfig(configJson);
+            };
+          });
+          setRecentTickets(formattedTickets);
         }
+      }
 
-        setLoading(false);
-      } catch (error) {
-        console.error('Failed to fetch dashboard data:', error);
-        setError('Failed to load dashboard data');
-        setLoading(false);
+      // Fetch email configuration
+      const configResponse = await fetch(`https://customer-sentiment-te99.onrender.com/api/email-config?user_id=${userId}`);
+      if (configResponse.ok) {
+        const configJson = await configResponse.json();
+        setEmailConfig(configJson);
       }
-    };
 
-    fetchDashboardData();
+      setLoading(false);
+    } catch (error) {
+      console.error('Failed to fetch dashboard data:', error);
+      setError('Failed to load dashboard data');
+      setLoading(false);
+    }
+  }, [userId]);
 
-    // Refresh data every 30 seconds for more frequent updates
-    const interval = setInterval(fetchDashboardData, 30000);
+  useEffect(() => {
+    fetchDashboardData();
+  }, [fetchDashboardData]);
 
-    return () => clearInterval(interval);
-  }, [userId]);
+  // Refresh when the backend pushes this user's new messages or alerts; polls every 30 seconds only while disconnected.
+  useLiveUpdates(fetchDashboardData);
 
   return (
     <>